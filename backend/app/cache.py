@@ -0,0 +1,154 @@
+# backend/app/cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from .models import LLMResponsePacket
+
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory")  # memory | sqlite | off
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+def make_cache_key(history: List[dict], system_prompt: str, model: str, tool_schema: str) -> str:
+    """Hashes everything that determines the model's answer for a turn."""
+    normalized = [(msg["role"], _normalize(msg["content"])) for msg in history]
+    payload = json.dumps([normalized, system_prompt, model, tool_schema], separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Base class for response caches; subclasses implement _load and _store."""
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES, ttl_seconds: float = LLM_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[LLMResponsePacket]:
+        packet = self._load(key)
+        if packet is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return packet
+
+    def set(self, key: str, packet: LLMResponsePacket):
+        self._store(key, packet)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self)}
+
+    def _load(self, key: str) -> Optional[LLMResponsePacket]:
+        raise NotImplementedError
+
+    def _store(self, key: str, packet: LLMResponsePacket):
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class MemoryResponseCache(ResponseCache):
+    """In-process LRU cache holding parsed packets."""
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES, ttl_seconds: float = LLM_CACHE_TTL_SECONDS):
+        super().__init__(max_entries, ttl_seconds)
+        self._entries: "OrderedDict[str, Tuple[float, LLMResponsePacket]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, packet = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return packet
+
+    def _store(self, key, packet):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), packet)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteResponseCache(ResponseCache):
+    """On-disk cache that survives restarts and can be shared by several processes."""
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = LLM_CACHE_TTL_SECONDS,
+    ):
+        super().__init__(max_entries, ttl_seconds)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, stored_at REAL NOT NULL,"
+                " used_at REAL NOT NULL, packet TEXT NOT NULL)"
+            )
+
+    def _load(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT stored_at, packet FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[0] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+        return LLMResponsePacket.model_validate_json(row[1])
+
+    def _store(self, key, packet):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, stored_at, used_at, packet) VALUES (?, ?, ?, ?)",
+                (key, now, now, packet.model_dump_json()),
+            )
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+def create_response_cache(backend: str = LLM_CACHE_BACKEND) -> Optional[ResponseCache]:
+    """Builds the cache selected by LLM_CACHE_BACKEND, or None when caching is off."""
+    if backend == "memory":
+        return MemoryResponseCache()
+    if backend == "sqlite":
+        return SQLiteResponseCache()
+    if backend == "off":
+        return None
+    raise ValueError(f"Unknown LLM_CACHE_BACKEND: {backend}")
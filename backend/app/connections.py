@@ -0,0 +1,197 @@
+# backend/app/connections.py
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Optional, Set
+
+from fastapi import WebSocket, WebSocketDisconnect
+from starlette.websockets import WebSocketState
+
+from .metrics import CONNECTIONS_CLOSED, CONNECTIONS_REJECTED
+from .models import ConnectionClosingPacket, PingPacket, TurnRejectedPacket
+from .session import Session
+from .turns import TurnScheduler, _is_turn
+
+# Application-level heartbeat (ASGI exposes no ping frames): a ping every interval,
+# and the connection is considered dead if nothing arrives for interval + timeout. 0 = off
+WS_PING_INTERVAL = float(os.getenv("WS_PING_INTERVAL", "20"))
+WS_PING_TIMEOUT = float(os.getenv("WS_PING_TIMEOUT", "20"))
+# Close connections without user activity (messages or UI events) for this long. 0 = off
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "900"))
+# Upper bound on one connection's lifetime; the session ends with it. 0 = off
+WS_MAX_SESSION_SECONDS = float(os.getenv("WS_MAX_SESSION_SECONDS", "14400"))
+WS_MAX_CONNECTIONS = int(os.getenv("WS_MAX_CONNECTIONS", "1000"))
+# How long a drain waits for turns in flight before closing the connections anyway
+WS_DRAIN_TIMEOUT = float(os.getenv("WS_DRAIN_TIMEOUT", "30"))
+
+# Close codes: normal closure, server error, service restart, try again later
+CLOSE_NORMAL, CLOSE_ERROR, CLOSE_RESTART, CLOSE_TRY_LATER = 1000, 1011, 1012, 1013
+
+
+class Connection:
+    """One open /ws connection and when it was last heard from."""
+
+    def __init__(self, websocket: WebSocket, session: Session, scheduler: TurnScheduler):
+        self.websocket = websocket
+        self.session = session
+        self.scheduler = scheduler
+        now = time.monotonic()
+        self.opened_at = now
+        # Any inbound message, pongs included: proves the socket is alive
+        self.last_heard = now
+        # User messages and UI events only: what the idle timeout looks at
+        self.last_active = now
+        self.last_ping = now
+        self.closed_reason: Optional[str] = None
+
+    @property
+    def busy(self) -> bool:
+        return self.scheduler.current is not None or bool(self.scheduler.pending)
+
+
+class ConnectionManager:
+    """Admission control and lifecycle of the server's /ws connections.
+
+    serve() runs a connection's receive loop next to a watchdog that sends
+    heartbeats and closes the connection once it is dead, idle or too old.
+    drain() stops admitting connections and turns, lets the turns in flight
+    finish, then closes every connection so clients reconnect elsewhere.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = WS_MAX_CONNECTIONS,
+        ping_interval: float = WS_PING_INTERVAL,
+        ping_timeout: float = WS_PING_TIMEOUT,
+        idle_timeout: float = WS_IDLE_TIMEOUT,
+        max_session_seconds: float = WS_MAX_SESSION_SECONDS,
+        tick: float = 1.0,
+    ):
+        self.max_connections = max_connections
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.idle_timeout = idle_timeout
+        self.max_session_seconds = max_session_seconds
+        self.tick = tick
+        self.connections: Set[Connection] = set()
+        # Slots taken by admitted connections, including ones still opening their session
+        self.admitted = 0
+        self.draining = False
+
+    def __len__(self) -> int:
+        return len(self.connections)
+
+    def admission(self) -> Optional[str]:
+        """Why a new connection is turned away, or None once a slot is reserved for it.
+
+        The slot is taken before anything is awaited, so a burst of connects
+        cannot all pass the check; release() gives it back when the connection ends.
+        """
+        if self.draining:
+            return "draining"
+        if self.admitted >= self.max_connections:
+            return "capacity"
+        self.admitted += 1
+        return None
+
+    def release(self):
+        self.admitted -= 1
+
+    async def reject(self, websocket: WebSocket, reason: str):
+        """Turns a connection away with a reason the client can act on instead of a bare refusal."""
+        CONNECTIONS_REJECTED.inc(reason=reason)
+        await websocket.accept()
+        await websocket.send_json(ConnectionClosingPacket(reason=reason).model_dump())
+        await websocket.close(code=CLOSE_RESTART if reason == "draining" else CLOSE_TRY_LATER)
+
+    async def serve(self, connection: Connection, submit: Callable[[dict], Awaitable]) -> str:
+        """Runs the connection until it ends; returns why it ended."""
+        self.connections.add(connection)
+        reader = asyncio.create_task(self._read(connection, submit))
+        watchdog = asyncio.create_task(self._watch(connection))
+        try:
+            await asyncio.wait({reader, watchdog}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (reader, watchdog):
+                task.cancel()
+            await asyncio.gather(reader, watchdog, return_exceptions=True)
+            self.connections.discard(connection)
+        if connection.closed_reason is None:
+            error = reader.exception() if reader.done() and not reader.cancelled() else None
+            if isinstance(error, WebSocketDisconnect) or error is None:
+                connection.closed_reason = "disconnect"
+            else:
+                print(f"WebSocket error: {error}")
+                connection.closed_reason = "error"
+                await self._close_socket(connection, CLOSE_ERROR)
+        CONNECTIONS_CLOSED.inc(reason=connection.closed_reason)
+        return connection.closed_reason
+
+    async def _read(self, connection: Connection, submit):
+        websocket = connection.websocket
+        while True:
+            data = await websocket.receive_json()
+            connection.last_heard = time.monotonic()
+            if not isinstance(data, dict) or data.get("type") == "pong":
+                continue
+            connection.last_active = connection.last_heard
+            if self.draining and _is_turn(data):
+                await connection.session.wire.send(websocket, TurnRejectedPacket(reason="draining").model_dump())
+                continue
+            await submit(data)
+
+    async def _watch(self, connection: Connection):
+        while connection.closed_reason is None:
+            await asyncio.sleep(self.tick)
+            now = time.monotonic()
+            reason = self._expired(connection, now)
+            if reason is not None:
+                await self.close(connection, reason)
+                return
+            if self.ping_interval and now - connection.last_ping >= self.ping_interval:
+                connection.last_ping = now
+                await connection.session.wire.send(connection.websocket, PingPacket().model_dump())
+
+    def _expired(self, connection: Connection, now: float) -> Optional[str]:
+        if self.ping_interval and now - connection.last_heard > self.ping_interval + self.ping_timeout:
+            return "heartbeat_timeout"
+        if self.max_session_seconds and now - connection.opened_at > self.max_session_seconds:
+            return "max_session"
+        # A turn in flight is activity too; the user is waiting for it
+        if self.idle_timeout and now - connection.last_active > self.idle_timeout and not connection.busy:
+            return "idle"
+        return None
+
+    async def close(self, connection: Connection, reason: str, code: int = CLOSE_NORMAL):
+        """Tells the client why and closes the socket; serve() then returns the reason."""
+        connection.closed_reason = reason
+        packet = ConnectionClosingPacket(reason=reason, resumable=reason != "max_session")
+        if reason != "heartbeat_timeout":
+            try:
+                await asyncio.wait_for(connection.session.wire.send(connection.websocket, packet.model_dump()), 1)
+            except Exception:
+                pass
+        await self._close_socket(connection, code)
+
+    @staticmethod
+    async def _close_socket(connection: Connection, code: int):
+        if connection.websocket.application_state != WebSocketState.CONNECTED:
+            return
+        try:
+            # A half-open peer never answers the close handshake; do not wait on it
+            await asyncio.wait_for(connection.websocket.close(code=code), 1)
+        except Exception:
+            pass
+
+    async def drain(self, timeout: float = WS_DRAIN_TIMEOUT) -> int:
+        """Stops admitting work, waits for turns in flight, then closes every connection.
+
+        Returns how many connections were closed.
+        """
+        self.draining = True
+        deadline = time.monotonic() + timeout
+        while any(c.busy for c in self.connections) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        connections = list(self.connections)
+        await asyncio.gather(*(self.close(c, "draining", CLOSE_RESTART) for c in connections))
+        return len(connections)
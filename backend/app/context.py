@@ -0,0 +1,109 @@
+# backend/app/context.py
+import os
+from typing import Callable, List, Optional
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "4000"))
+# Most recent messages that are always sent verbatim
+CONTEXT_KEEP_RECENT = int(os.getenv("CONTEXT_KEEP_RECENT", "6"))
+# Share of the budget the rolling summary may take up
+CONTEXT_SUMMARY_SHARE = float(os.getenv("CONTEXT_SUMMARY_SHARE", "0.25"))
+
+Summarizer = Callable[[str, List[dict], int], str]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+def extractive_summary(previous: str, turns: List[dict], max_tokens: int) -> str:
+    """Folds turns into the running summary without another model call.
+
+    Keeps the start of every user request and the first sentence of every reply,
+    dropping the oldest lines once the summary outgrows max_tokens.
+    """
+    lines = previous.splitlines() if previous else []
+    for msg in turns:
+        content = " ".join(msg["content"].split())
+        if msg["role"] == "user":
+            lines.append(f"User: {content[:200]}")
+        else:
+            lines.append(f"Kai: {content.split('. ')[0][:160]}")
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def describe_ui_state(ui_state: List[dict]) -> str:
+    """One compact line per rendered element, e.g. `ADD_SLIDER budget "Budget" 500..5000=1500`.
+
+    The second column is the element id the model can target with UPDATE/REMOVE/MOVE_ELEMENT.
+    """
+    lines = []
+    for cmd in ui_state:
+        kind = cmd["command"]
+        element_id = cmd.get("element_id") or cmd.get("slider_id") or cmd.get("button_id") or "-"
+        if kind == "ADD_SLIDER":
+            lines.append(
+                f'{kind} {element_id} "{cmd["label"]}" '
+                f'{cmd["min_val"]:g}..{cmd["max_val"]:g}={cmd["default_val"]:g}'
+            )
+        elif kind == "ADD_BUTTON":
+            lines.append(f'{kind} {element_id} "{cmd["text"]}"')
+        elif kind == "ADD_TEXT":
+            lines.append(f'{kind} {element_id} {cmd["style"]} "{cmd["text"][:80]}"')
+        else:
+            lines.append(f"{kind} {element_id}")
+    return "\n".join(lines)
+
+
+class ContextManager:
+    """Keeps the prompt for a session inside a token budget.
+
+    Older turns are compacted into session.summary; the rendered UI is sent
+    as a compact state block instead of the commands that produced it.
+    """
+
+    def __init__(
+        self,
+        budget: int = CONTEXT_TOKEN_BUDGET,
+        keep_recent: int = CONTEXT_KEEP_RECENT,
+        summarizer: Optional[Summarizer] = None,
+    ):
+        self.budget = budget
+        self.keep_recent = keep_recent
+        self.summary_budget = int(budget * CONTEXT_SUMMARY_SHARE)
+        self.summarizer = summarizer or extractive_summary
+
+    def compact(self, session):
+        """Moves turns older than keep_recent into the summary while over budget."""
+        ui_tokens = estimate_tokens(describe_ui_state(session.ui_state)) if session.ui_state else 0
+        used = session.history_tokens + estimate_tokens(session.summary) + ui_tokens
+        if used <= self.budget or len(session.history) <= self.keep_recent:
+            return
+        old = session.pop_oldest(len(session.history) - self.keep_recent)
+        session.summary = self.summarizer(session.summary, old, self.summary_budget)
+
+    def build(self, session) -> List[dict]:
+        """Returns the history to send to the model for the next turn."""
+        self.compact(session)
+        context = []
+        if session.summary:
+            context.append(f"Summary of the earlier conversation:\n{session.summary}")
+        if session.ui_state:
+            context.append(f"Current UI state:\n{describe_ui_state(session.ui_state)}")
+        if session.ui_changes:
+            # Coalesced local interactions since the last turn, sent once as a snapshot
+            changes = ", ".join(f"{k}={v:g}" for k, v in session.ui_changes.items())
+            context.append(f"Changed by the user since the last turn: {changes}")
+            session.ui_changes = {}
+        if not context:
+            return session.history
+        note = {"role": "user", "content": "\n\n".join(context)}
+        # Right before the latest user message: the history before it stays a stable,
+        # cacheable prefix, and the current state is not read as something from the first turn
+        latest = next(
+            (i for i in range(len(session.history) - 1, -1, -1) if session.history[i]["role"] == "user"),
+            len(session.history),
+        )
+        return session.history[:latest] + [note] + session.history[latest:]
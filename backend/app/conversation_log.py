@@ -0,0 +1,315 @@
+# backend/app/conversation_log.py
+import json
+import os
+import queue
+import shutil
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from .events import EventEngine
+from .models import UIEvent
+from .parser import COMMAND_LIST_ADAPTER
+from .session import Session
+
+# Directory of the append-only conversation log; empty = no log
+CONVERSATION_LOG_DIR = os.getenv("CONVERSATION_LOG_DIR", "")
+CONVERSATION_LOG_SEGMENT_BYTES = int(os.getenv("CONVERSATION_LOG_SEGMENT_BYTES", str(8 * 1024 * 1024)))
+# Oldest segments beyond this are deleted, with the sessions that still depend on them
+CONVERSATION_LOG_MAX_SEGMENTS = int(os.getenv("CONVERSATION_LOG_MAX_SEGMENTS", "64"))
+# Records of a session between two snapshots of its full state; bounds replay work
+CONVERSATION_LOG_SNAPSHOT_EVERY = int(os.getenv("CONVERSATION_LOG_SNAPSHOT_EVERY", "32"))
+# Records the writer thread collects into one write before flushing
+CONVERSATION_LOG_BATCH = int(os.getenv("CONVERSATION_LOG_BATCH", "256"))
+CONVERSATION_LOG_FSYNC = os.getenv("CONVERSATION_LOG_FSYNC", "0") == "1"
+
+# Record: payload length, crc32 of session id + payload, unix time written, kind, session id length
+# | session id | JSON payload
+_HEADER = struct.Struct(">IIIBB")
+KINDS = {"user": 1, "assistant": 2, "event": 3, "commands": 4, "snapshot": 5, "drop": 6}
+_KIND_NAMES = {code: name for name, code in KINDS.items()}
+
+# (writer directory, segment number, offset, total record length)
+Position = Tuple[str, int, int, int]
+
+
+def encode_record(session_id: str, kind: str, data, written_at: Optional[float] = None) -> bytes:
+    sid = session_id.encode("utf-8")
+    payload = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    at = int(time.time() if written_at is None else written_at)
+    return _HEADER.pack(len(payload), zlib.crc32(sid + payload), at, KINDS[kind], len(sid)) + sid + payload
+
+
+def read_records(data: bytes, start: int = 0):
+    """Yields (offset, length, kind, session_id, payload bytes, unix time written) up to the first
+    torn or corrupt record."""
+    offset = start
+    while offset + _HEADER.size <= len(data):
+        size, crc, at, kind, sid_len = _HEADER.unpack_from(data, offset)
+        end = offset + _HEADER.size + sid_len + size
+        body = data[offset + _HEADER.size:end]
+        if end > len(data) or zlib.crc32(body) != crc or kind not in _KIND_NAMES:
+            return
+        yield offset, end - offset, _KIND_NAMES[kind], body[:sid_len].decode("utf-8"), body[sid_len:], at
+        offset = end
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ConversationLog:
+    """Append-only, segmented log of what happened in every session.
+
+    Records user and assistant messages, UI events and the UI commands a turn
+    applied, plus a snapshot of the whole session every few records. Appends are
+    encoded on the caller's thread and handed to a writer thread that writes them
+    in batches, so a turn never waits on disk. An in-memory index keeps, per
+    session, the positions of its latest snapshot and the records after it;
+    restoring a session reads and replays only those.
+
+    Every process writes its own subdirectory, named by start time and pid, so
+    workers sharing the directory never append to, truncate or delete each
+    other's segments. At startup a process indexes the directories of earlier
+    and sibling processes read-only, oldest first; records a sibling writes
+    later are not seen, which the shared session store (session_store.py) covers.
+    """
+
+    def __init__(
+        self,
+        directory: str = CONVERSATION_LOG_DIR,
+        segment_bytes: int = CONVERSATION_LOG_SEGMENT_BYTES,
+        max_segments: int = CONVERSATION_LOG_MAX_SEGMENTS,
+        snapshot_every: int = CONVERSATION_LOG_SNAPSHOT_EVERY,
+        batch: int = CONVERSATION_LOG_BATCH,
+        fsync: bool = CONVERSATION_LOG_FSYNC,
+    ):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self.snapshot_every = snapshot_every
+        self.batch = batch
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        self._index: Dict[str, List[Position]] = {}
+        # Records appended per session since its last snapshot, including ones not yet written
+        self._since_snapshot: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._scan()
+        self.writer = f"{time.time_ns():020d}-{os.getpid()}"
+        os.makedirs(os.path.join(directory, self.writer))
+        self._segments = [1]
+        self._file = open(self._path(self.writer, 1), "ab")
+        self._queue: "queue.Queue[Optional[Tuple[str, str, bytes]]]" = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="conversation-log", daemon=True)
+        self._writer.start()
+
+    def _path(self, writer: str, segment: int) -> str:
+        return os.path.join(self.directory, writer, f"{segment:08d}.log")
+
+    def _scan(self):
+        """Indexes the directories of other processes, oldest first, so later records win.
+
+        A torn record ends a segment's scan; the file is left alone, as its
+        writer may still be running. Directories of exited processes that no
+        session depends on any more are deleted.
+        """
+        writers = sorted(
+            name for name in os.listdir(self.directory)
+            if "-" in name and os.path.isdir(os.path.join(self.directory, name))
+        )
+        for writer in writers:
+            folder = os.path.join(self.directory, writer)
+            for segment in sorted(int(name[:-4]) for name in os.listdir(folder) if name.endswith(".log")):
+                try:
+                    with open(self._path(writer, segment), "rb") as f:
+                        data = f.read()
+                except FileNotFoundError:
+                    # Rotated away by its (live) writer since listing
+                    continue
+                for offset, length, kind, session_id, _, _ in read_records(data):
+                    self._index_record(session_id, kind, (writer, segment, offset, length))
+        used = {position[0] for positions in self._index.values() for position in positions}
+        for writer in writers:
+            if writer not in used and not _pid_alive(int(writer.rsplit("-", 1)[1])):
+                shutil.rmtree(os.path.join(self.directory, writer), ignore_errors=True)
+
+    def _index_record(self, session_id: str, kind: str, position: Position):
+        if kind == "drop":
+            self._index.pop(session_id, None)
+        elif kind == "snapshot":
+            self._index[session_id] = [position]
+        elif session_id in self._index:
+            self._index[session_id].append(position)
+        else:
+            # Records without a snapshot before them cannot be replayed on their own
+            return
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._index
+
+    # -- appending (event loop side) --
+
+    def append(self, session: Session, *records: Tuple[str, object]):
+        """Queues (kind, data) records of changes already applied to the session.
+
+        Records are logged once the whole change (e.g. a turn) is applied, so a
+        snapshot taken right after them already includes them. One follows when
+        due, and after the first records of a session this log has no snapshot of.
+        """
+        for kind, data in records:
+            self._put(session.session_id, kind, data)
+        count = self._since_snapshot.get(session.session_id, self.snapshot_every) + len(records)
+        self._since_snapshot[session.session_id] = count
+        if count > self.snapshot_every:
+            self.snapshot(session)
+
+    def snapshot(self, session: Session):
+        self._put(session.session_id, "snapshot", session.to_state())
+        self._since_snapshot[session.session_id] = 0
+
+    def drop(self, session_id: str):
+        """Forgets a session; it will not be restored."""
+        self._put(session_id, "drop", None)
+        self._since_snapshot.pop(session_id, None)
+
+    def _put(self, session_id: str, kind: str, data):
+        self._queue.put((session_id, kind, encode_record(session_id, kind, data)))
+
+    def flush(self):
+        """Blocks until every queued record is written."""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._writer.join()
+        self._file.close()
+
+    # -- writer thread --
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            while item is not None and len(batch) < self.batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+            try:
+                self._write([entry for entry in batch if entry is not None])
+            except Exception as e:
+                print(f"Conversation log write failed: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if batch[-1] is None:
+                return
+
+    def _write(self, batch: List[Tuple[str, str, bytes]]):
+        for session_id, kind, record in batch:
+            if self._file.tell() >= self.segment_bytes:
+                self._rotate()
+            position = (self.writer, self._segments[-1], self._file.tell(), len(record))
+            self._file.write(record)
+            # Readers flush() first, so indexing before the batch is flushed is safe
+            with self._lock:
+                self._index_record(session_id, kind, position)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def _rotate(self):
+        self._file.flush()
+        self._file.close()
+        self._segments.append(self._segments[-1] + 1)
+        self._file = open(self._path(self.writer, self._segments[-1]), "ab")
+        while len(self._segments) > self.max_segments:
+            oldest = self._segments.pop(0)
+            with self._lock:
+                lost = [
+                    sid for sid, positions in self._index.items()
+                    if any(writer == self.writer and segment <= oldest for writer, segment, _, _ in positions)
+                ]
+                for session_id in lost:
+                    del self._index[session_id]
+            os.remove(self._path(self.writer, oldest))
+
+    # -- replay --
+
+    def records(self, session_id: str) -> List[Tuple[str, object]]:
+        """(kind, data) of the session's latest snapshot and everything logged after it."""
+        return [(kind, data) for kind, data, _ in self._read(session_id)]
+
+    def _read(self, session_id: str) -> List[Tuple[str, object, int]]:
+        with self._lock:
+            positions = list(self._index.get(session_id, ()))
+        out = []
+        handles = {}
+        try:
+            for writer, segment, offset, length in positions:
+                f = handles.get((writer, segment))
+                if f is None:
+                    f = handles[writer, segment] = open(self._path(writer, segment), "rb")
+                f.seek(offset)
+                for _, _, kind, record_session, payload, at in read_records(f.read(length)):
+                    # A position must never hand one session another's conversation
+                    if record_session != session_id:
+                        print(f"Conversation log record at {writer}/{segment}:{offset} is not {session_id}; skipped")
+                        continue
+                    out.append((kind, json.loads(payload), at))
+        except FileNotFoundError:
+            # A sibling process rotated the segment away; the session cannot be rebuilt
+            return []
+        finally:
+            for f in handles.values():
+                f.close()
+        return out
+
+    def restore(self, session_id: str, max_history_chars: Optional[int] = None) -> Optional[Session]:
+        """Rebuilds a session (history, summary and rendered UI) from the log, or None if unknown.
+
+        Its last_active is when its latest record was written, so callers can apply their TTL.
+        """
+        if session_id not in self._index:
+            return None
+        # Records still queued for this session must be on disk before reading
+        self.flush()
+        records = self._read(session_id)
+        if not records or records[0][0] != "snapshot":
+            return None
+        kwargs = {} if max_history_chars is None else {"max_history_chars": max_history_chars}
+        session = Session.from_state(session_id, records[0][1], **kwargs)
+        replay(session, [(kind, data) for kind, data, _ in records[1:]])
+        session.last_active = time.monotonic() - max(0.0, time.time() - records[-1][2])
+        self._since_snapshot[session_id] = len(records) - 1
+        return session
+
+
+def replay(session: Session, records: List[Tuple[str, object]]):
+    """Applies logged records to a session in order."""
+    events = EventEngine()
+    for kind, data in records:
+        if kind == "user":
+            session.add_message("user", data["content"])
+            # A logged turn went through the prompt build, which consumed the pending changes
+            session.ui_changes = {}
+        elif kind == "assistant":
+            session.add_message("assistant", data["content"], data.get("reasoning_tokens", 0))
+        elif kind == "event":
+            events.handle(session, UIEvent.model_validate(data))
+        elif kind == "commands":
+            session.apply_commands(COMMAND_LIST_ADAPTER.validate_python(data))
+
+
+def create_conversation_log(directory: str = CONVERSATION_LOG_DIR) -> Optional[ConversationLog]:
+    return ConversationLog(directory) if directory else None
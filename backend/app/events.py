@@ -0,0 +1,43 @@
+# backend/app/events.py
+import math
+from typing import Optional
+
+from .models import UIEvent
+from .session import Session
+
+
+class EventEngine:
+    """Resolves UI events against the session's UI state without calling the model.
+
+    Value changes (sliders) are applied locally and remembered in
+    session.ui_changes, which the next prompt picks up as one snapshot.
+    Only events that need reasoning (button clicks) become an LLM turn.
+    """
+
+    def handle(self, session: Session, event: UIEvent) -> Optional[str]:
+        """Applies the event and returns the user turn to send to the model, if any."""
+        element = session.ui.find(event.element_id, event.container_id)
+        if element is None:
+            print(f"Ignoring {event.event_type} for unknown element {event.element_id}")
+            return None
+        if event.event_type == "slider_change":
+            self._slider_change(session, element, event)
+            return None
+        return f'Clicked the "{element.get("text", event.element_id)}" button ({event.element_id}).'
+
+    def _slider_change(self, session: Session, element: dict, event: UIEvent):
+        if element["command"] != "ADD_SLIDER":
+            print(f"Ignoring slider_change for {event.element_id}, which is not a slider")
+            return
+        try:
+            value = float(event.state.get("value"))
+        except (TypeError, ValueError):
+            value = math.nan
+        # NaN and infinities would end up in the UI state, which is sent back as JSON
+        if not math.isfinite(value):
+            print(f"Ignoring slider_change without a numeric value for {event.element_id}")
+            return
+        value = min(max(value, element["min_val"]), element["max_val"])
+        # The client already shows the new value; only the server copy needs updating
+        element["default_val"] = value
+        session.ui_changes[event.element_id] = value
@@ -0,0 +1,117 @@
+# backend/app/fake_llm.py
+import asyncio
+import json
+import os
+import random
+import time
+from typing import List, Optional
+
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+
+# Scripted offline stand-in for the chat model, selected with LLM_BACKEND=fake.
+LLM_FAKE_SCRIPT = os.getenv("LLM_FAKE_SCRIPT")  # path to a JSON list of turns
+LLM_FAKE_LATENCY = float(os.getenv("LLM_FAKE_LATENCY", "0.05"))  # seconds to first token
+LLM_FAKE_CHUNK_DELAY = float(os.getenv("LLM_FAKE_CHUNK_DELAY", "0.005"))
+LLM_FAKE_CHUNK_CHARS = int(os.getenv("LLM_FAKE_CHUNK_CHARS", "16"))
+LLM_FAKE_ERROR_RATE = float(os.getenv("LLM_FAKE_ERROR_RATE", "0"))
+LLM_FAKE_SEED = int(os.getenv("LLM_FAKE_SEED", "0"))
+
+# Each turn: `match` (substring of the latest user message, or "" for the fallback),
+# the chat text, and the tool calls to replay as {"name", "args"}.
+DEFAULT_SCRIPT = [
+    {
+        "match": "trip",
+        "text": "Great! Let's start with your budget and interests.",
+        "tool_calls": [
+            {"name": "ClearContainerCommand", "args": {"container_id": "main_workspace"}},
+            {"name": "AddTextCommand", "args": {"text": "Tokyo Trip Planner", "style": "header"}},
+            {"name": "AddSliderCommand", "args": {
+                "slider_id": "budget", "label": "Budget ($)",
+                "min_val": 500, "max_val": 5000, "default_val": 1500,
+            }},
+            {"name": "AddButtonCommand", "args": {"button_id": "next", "text": "Next"}},
+        ],
+    },
+    {
+        "match": "",
+        "text": "Here is a form to get started.",
+        "tool_calls": [
+            {"name": "AddTextCommand", "args": {"text": "Tell me more", "style": "header"}},
+            {"name": "AddButtonCommand", "args": {"button_id": "continue", "text": "Continue"}},
+        ],
+    },
+]
+
+
+class FakeLLMError(RuntimeError):
+    """Injected failure, raised with probability LLM_FAKE_ERROR_RATE."""
+
+
+class FakeChatModel:
+    """Replays scripted turns with the invoke/ainvoke/astream surface of a chat model."""
+
+    def __init__(
+        self,
+        script: Optional[List[dict]] = None,
+        latency: float = LLM_FAKE_LATENCY,
+        chunk_delay: float = LLM_FAKE_CHUNK_DELAY,
+        chunk_chars: int = LLM_FAKE_CHUNK_CHARS,
+        error_rate: float = LLM_FAKE_ERROR_RATE,
+        seed: int = LLM_FAKE_SEED,
+    ):
+        self.script = script if script is not None else DEFAULT_SCRIPT
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.chunk_chars = max(1, chunk_chars)
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+
+    @classmethod
+    def from_env(cls) -> "FakeChatModel":
+        script = None
+        if LLM_FAKE_SCRIPT:
+            with open(LLM_FAKE_SCRIPT) as f:
+                script = json.load(f)
+        return cls(script=script)
+
+    def _turn(self, messages: list) -> dict:
+        self.calls += 1
+        if self.error_rate and self.random.random() < self.error_rate:
+            raise FakeLLMError("injected fake LLM failure")
+        user = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        user = user.casefold() if isinstance(user, str) else ""
+        for turn in self.script:
+            if turn.get("match", "").casefold() in user:
+                return turn
+        return self.script[-1]
+
+    @staticmethod
+    def _tool_calls(turn: dict) -> List[dict]:
+        return [
+            {"name": tc["name"], "args": tc["args"], "id": f"call_{i}", "type": "tool_call"}
+            for i, tc in enumerate(turn.get("tool_calls", []))
+        ]
+
+    def invoke(self, messages: list, **kwargs) -> AIMessage:
+        turn = self._turn(messages)
+        time.sleep(self.latency)
+        return AIMessage(content=turn.get("text", ""), tool_calls=self._tool_calls(turn))
+
+    async def ainvoke(self, messages: list, **kwargs) -> AIMessage:
+        turn = self._turn(messages)
+        await asyncio.sleep(self.latency)
+        return AIMessage(content=turn.get("text", ""), tool_calls=self._tool_calls(turn))
+
+    async def astream(self, messages: list, **kwargs):
+        turn = self._turn(messages)
+        await asyncio.sleep(self.latency)
+        text = turn.get("text", "")
+        for start in range(0, len(text), self.chunk_chars):
+            yield AIMessageChunk(content=text[start:start + self.chunk_chars])
+            await asyncio.sleep(self.chunk_delay)
+        for index, tc in enumerate(self._tool_calls(turn)):
+            yield AIMessageChunk(content="", tool_call_chunks=[{
+                "name": tc["name"], "args": json.dumps(tc["args"]), "id": tc["id"], "index": index,
+            }])
+            await asyncio.sleep(self.chunk_delay)
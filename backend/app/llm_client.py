@@ -1,73 +1,35 @@
 # llm_client.py
 import os
+import json
+import asyncio
+import importlib.util
+import itertools
+import threading
+import time
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
-from langchain_core.tools import tool
 from pydantic import BaseModel
-from typing import List
-from .models import LLMResponsePacket 
-
-
-from .models import AddButtonCommand, AddSliderCommand, AddTextCommand, ClearContainerCommand
+from typing import AsyncIterator, List, Optional, Union
+from .models import LLMResponsePacket, ChatDeltaPacket, UICommandPacket, TurnCompletePacket, ToolCallError
+from .cache import ResponseCache, create_response_cache, make_cache_key
+from .metrics import TOOL_CALL_REASKS, span
+from .parser import parse_tool_calls
+from .semantic_cache import SemanticLayoutCache, create_semantic_cache
+from .reasoning import REASONING_MODE, REASONING_MODES, REASONING_RULES, ReasoningFilter, strip_reasoning
+from .singleflight import SingleFlight
+from .registry import TOOL_COMMANDS, tool_declarations, tool_schema
+from .router import LLM_ROUTES, LLMRouter, create_chat_model, parse_routes
 
 load_dotenv()
 
-COMMAND_MODELS = {
-    "ADD_BUTTON": AddButtonCommand,
-    "ADD_SLIDER": AddSliderCommand,
-    "ADD_TEXT": AddTextCommand,
-    "CLEAR_CONTAINER": ClearContainerCommand,
-}
-
-# Define your UI commands using @tool (automatically supports function calling)
-@tool
-def AddButtonCommand(container_id: str, button_id: str, text: str) -> dict:
-    """Adds a button to a UI container."""
-    return {
-        "command": "ADD_BUTTON",
-        "container_id": container_id,
-        "button_id": button_id,
-        "text": text
-    }
-
-@tool
-def AddSliderCommand(container_id: str, slider_id: str, label: str, min_val: int, max_val: int, default_val: int) -> dict:
-    """Adds a button to a UI container."""
-
-    return {
-        "command": "ADD_SLIDER",
-        "container_id": container_id,
-        "slider_id": slider_id,
-        "label": label,
-        "min_val": min_val,
-        "max_val": max_val,
-        "default_val": default_val
-    }
-
-@tool
-def AddTextCommand(container_id: str, text: str, style: str = "body") -> dict:
-    """Adds a button to a UI container."""
-   
-    return {
-        "command": "ADD_TEXT",
-        "container_id": container_id,
-        "text": text,
-        "style": style
-    }
-
-@tool
-def ClearContainerCommand(container_id: str) -> dict:
-    """Adds a button to a UI container."""
-   
-    return {
-        "command": "CLEAR_CONTAINER",
-        "container_id": container_id
-    }
-
-
-# System prompt
-SYSTEM_PROMPT = """
+# Upper bound on blocking LLM calls running in worker threads when the
+# underlying chat model has no native async path.
+LLM_MAX_WORKERS = int(os.getenv("LLM_MAX_WORKERS", "32"))
+
+# System prompt; rule 1 depends on the reasoning mode (see reasoning.py)
+SYSTEM_PROMPT_TEMPLATE = """
 You are an advanced AI assistant named **Kai** (Kreator of Adaptive Interfaces). Your core function is to help users solve complex tasks by **constructing adaptive UIs in real-time** using structured function calls. You are a **collaborator, not a passive chatbot.** Your responses must always be purposeful, contextual, and actionable.
 Never output JSON or describe UI in text.
 Always use the provided tools to add UI elements.
@@ -76,8 +38,7 @@ Respond to the user with a chat message as plain text.
 
 ### **CORE BEHAVIOR RULES**
 
-1. Before building, think step-by-step in a <thinking> block (not shown to the user).
-After thinking, use function calls to add UI elements.
+{reasoning_rule}
 
 2. ### **Always Build with Functions:**
    Do **not** describe interfaces in plain text.
@@ -95,56 +56,582 @@ After thinking, use function calls to add UI elements.
    - Remember previous user answers, selected options, or filled inputs.
    - Update or extend the interface based on what has already been shown or gathered.
 
+5. ### **Edit, Don't Rebuild:**
+   The current UI state lists every element with its id.
+   - To change an element, add it again with the same id; only what changed is sent to the user.
+   - Use RemoveElementCommand and MoveElementCommand for single elements.
+   - Only clear a container when the whole interface changes.
+
 
 """
 
-class LLMClient:
-    def __init__(self):
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash",
-            google_api_key=os.getenv("GEMINI_API_KEY"),
-            model_kwargs={
-                "tools": [
-                    AddButtonCommand,
-                    AddSliderCommand,
-                    AddTextCommand,
-                    ClearContainerCommand,
-                ]
-            }
+
+
+@lru_cache(maxsize=None)
+def system_prompt(reasoning: str = REASONING_MODE) -> str:
+    return SYSTEM_PROMPT_TEMPLATE.format(reasoning_rule=REASONING_RULES[reasoning])
+
+
+SYSTEM_PROMPT = system_prompt()
+
+MODEL_NAME = "gemini-1.5-flash"
+
+# Which chat model backs LLMClient: "gemini", or "fake" for the offline scripted model
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+
+# Generated once from the command classes in models.py
+TOOLS = tool_declarations()
+TOOL_SCHEMA = tool_schema()
+
+# Optional fast tier for simple turns (see tiering.py), as provider:model routes,
+# e.g. "gemini:gemini-1.5-flash-8b". It gets the reduced edit tool set. Empty = one tier.
+LLM_FAST_MODEL = os.getenv("LLM_FAST_MODEL", "")
+
+# Share one model call between concurrent identical requests (same normalized
+# history, model and tool schema), e.g. many users sending a demo's first message
+LLM_SINGLE_FLIGHT = os.getenv("LLM_SINGLE_FLIGHT", "1") == "1"
+
+# Upload the system prompt and tool schema once as a provider-side cached prefix
+# (Gemini context caching). Falls back to sending them inline if unavailable.
+LLM_PREFIX_CACHE = os.getenv("LLM_PREFIX_CACHE", "0") == "1"
+LLM_PREFIX_CACHE_TTL = os.getenv("LLM_PREFIX_CACHE_TTL", "3600s")
+# The cached prefix's TTL is extended once fewer than this many seconds of it remain
+LLM_PREFIX_CACHE_REFRESH_MARGIN = float(os.getenv("LLM_PREFIX_CACHE_REFRESH_MARGIN", "300"))
+
+# Ask the model once more, for just the tool calls that failed validation and could
+# not be repaired locally (see repair.py), instead of dropping them
+LLM_REPAIR_REASK = os.getenv("LLM_REPAIR_REASK", "1") == "1"
+
+# Chat model instances created by warm(); each holds its own HTTP/gRPC client,
+# and calls are spread across them round-robin.
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "2"))
+
+# Provider SDKs (langchain, google-genai) are imported on first use, not at import
+# time, so the app starts fast and a reload does not pay for them until needed.
+
+
+@lru_cache(maxsize=None)
+def prompt_prefix(reasoning: str = REASONING_MODE) -> tuple:
+    """The static head of every prompt.
+
+    Built once per reasoning mode and kept byte-identical across requests so
+    providers with implicit prefix caching can reuse it.
+    """
+    from langchain_core.messages import AIMessage, SystemMessage
+
+    return (
+        SystemMessage(content=system_prompt(reasoning)),
+        AIMessage(content="I understand. I am Kai..."),
+    )
+
+
+def to_message(role: str, content: str):
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    if role == "user":
+        return HumanMessage(content=content)
+    return AIMessage(content=content)
+
+
+def reask_prompt(tool_errors: List[ToolCallError]) -> str:
+    """The follow-up sent for tool calls that failed validation: only the failures, no history."""
+    lines = ["These tool calls were invalid and were not applied:"]
+    for error in tool_errors:
+        problems = "; ".join(
+            f"{'.'.join(str(part) for part in e['loc'][-1:]) or 'call'}: {e['msg']}" for e in error.errors
         )
+        lines.append(f"- {error.tool_name}({json.dumps(error.arguments, default=str)}): {problems}")
+    lines.append("Re-issue only these tool calls, corrected. Do not repeat any other call or write a message.")
+    return "\n".join(lines)
 
-    def get_response(self, history: List[dict]) -> LLMResponsePacket:
-        """Calls Gemini with history and returns parsed function calls + message."""
-        messages = [SystemMessage(content=SYSTEM_PROMPT)]
-        messages.append(AIMessage(content="I understand. I am Kai..."))
 
-        for msg in history:
-            role = msg["role"]
-            content = msg["content"]
-            if role == "user":
-                messages.append(HumanMessage(content=content))
+def validate_config() -> List[str]:
+    """Returns the problems with the LLM settings that would otherwise surface on the first turn."""
+    problems = []
+    if LLM_ROUTES or LLM_FAST_MODEL:
+        try:
+            providers = {provider for provider, _ in parse_routes(f"{LLM_ROUTES},{LLM_FAST_MODEL}")}
+        except ValueError as e:
+            return [str(e)]
+        if not LLM_ROUTES:
+            providers.add(LLM_BACKEND)
+    elif LLM_BACKEND in ("gemini", "fake"):
+        providers = {LLM_BACKEND}
+    else:
+        return [f"Unknown LLM_BACKEND: {LLM_BACKEND}"]
+    for provider, key in (("gemini", "GEMINI_API_KEY"), ("openai", "OPENAI_API_KEY")):
+        if provider in providers and not os.getenv(key):
+            problems.append(f"{key} is not set")
+    if "openai" in providers and importlib.util.find_spec("langchain_openai") is None:
+        problems.append("openai routes require the langchain-openai package")
+    if REASONING_MODE not in REASONING_MODES:
+        problems.append(f"Unknown REASONING_MODE: {REASONING_MODE}")
+    if LLM_POOL_SIZE < 1:
+        problems.append(f"LLM_POOL_SIZE must be at least 1, got {LLM_POOL_SIZE}")
+    if LLM_PREFIX_CACHE and _prefix_cache_seconds() <= LLM_PREFIX_CACHE_REFRESH_MARGIN:
+        problems.append(
+            f"LLM_PREFIX_CACHE_TTL ({LLM_PREFIX_CACHE_TTL}) must be longer than "
+            f"LLM_PREFIX_CACHE_REFRESH_MARGIN ({LLM_PREFIX_CACHE_REFRESH_MARGIN:g}s)"
+        )
+    return problems
+
+
+def create_prefix_cache() -> Optional[str]:
+    """Creates a Gemini cached content holding the system prompt and tools."""
+    try:
+        from google import genai
+        from google.genai import types
+        from langchain_google_genai._function_utils import convert_to_genai_function_declarations
+
+        client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+        cached = client.caches.create(
+            model=MODEL_NAME,
+            config=types.CreateCachedContentConfig(
+                system_instruction=SYSTEM_PROMPT,
+                tools=convert_to_genai_function_declarations(TOOLS),
+                ttl=LLM_PREFIX_CACHE_TTL,
+            ),
+        )
+        return cached.name
+    except Exception as e:
+        print(f"Prompt prefix cache unavailable, sending prefix inline: {e}")
+        return None
+
+
+def refresh_prefix_cache(name: str) -> bool:
+    """Extends a cached content's TTL; False if it is gone or cannot be updated."""
+    try:
+        from google import genai
+        from google.genai import types
+
+        client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+        client.caches.update(name=name, config=types.UpdateCachedContentConfig(ttl=LLM_PREFIX_CACHE_TTL))
+        return True
+    except Exception as e:
+        print(f"Prompt prefix cache refresh failed, it will be recreated: {e}")
+        return False
+
+
+def _prefix_cache_seconds() -> float:
+    return float(LLM_PREFIX_CACHE_TTL.rstrip("s"))
+
+
+def _first_turn(history: List[dict]) -> bool:
+    # Nothing on screen, no summary and no earlier messages: the request alone decides the UI
+    return len(history) == 1 and history[0]["role"] == "user"
+
+
+class LLMClient:
+    """Turns session history into LLMResponsePackets using a pluggable chat model.
+
+    Any object with langchain's invoke/ainvoke/astream surface can be passed as `llm`;
+    otherwise LLM_ROUTES (an LLMRouter over several models) or LLM_BACKEND picks it.
+    The chat models are created by warm(), or on the first call if nothing warmed
+    the client up.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[ResponseCache] = None,
+        llm=None,
+        layouts: Optional[SemanticLayoutCache] = None,
+    ):
+        self.cached_prefix = None
+        # time.monotonic() at which the provider drops the cached prefix
+        self.prefix_expires = 0.0
+        self._refreshing = False
+        self.model_name = MODEL_NAME
+        if llm is None and LLM_ROUTES:
+            self.model_name = f"router:{LLM_ROUTES}"
+        elif llm is None and LLM_BACKEND == "fake":
+            self.model_name = "fake"
+        self._pool: list = []
+        self._turn = itertools.count()
+        if llm is not None:
+            self.llm = llm
+        # Model for turns the classifier marks "fast"; None sends every turn to llm
+        self.fast_llm = None
+        self.fast_model_name = f"fast:{LLM_FAST_MODEL}"
+        self.cache = cache if cache is not None else create_response_cache()
+        # First turns close to an earlier one reuse its UI (see semantic_cache.py)
+        self.layouts = layouts if layouts is not None else create_semantic_cache()
+        # Identical requests in flight at the same time share one model call
+        self.flights = SingleFlight() if LLM_SINGLE_FLIGHT else None
+
+    @property
+    def llm(self):
+        self._keep_prefix_alive()
+        if not self._pool:
+            self.warm(1)
+        return self._pool[next(self._turn) % len(self._pool)]
+
+    @llm.setter
+    def llm(self, llm):
+        self._pool = [llm]
+
+    def _keep_prefix_alive(self):
+        """Extends the cached prefix's TTL in the background before the provider drops it.
+
+        A prefix that expired anyway (e.g. no calls for longer than its TTL) or
+        could not be refreshed is forgotten together with the pooled models bound
+        to it; the next call warms a fresh pool, which creates a new cache.
+        """
+        if not self.cached_prefix or self._refreshing:
+            return
+        now = time.monotonic()
+        if now >= self.prefix_expires:
+            self._drop_prefix()
+        elif now >= self.prefix_expires - LLM_PREFIX_CACHE_REFRESH_MARGIN:
+            self._refreshing = True
+            threading.Thread(target=self._refresh_prefix, name="prefix-cache", daemon=True).start()
+
+    def _refresh_prefix(self):
+        try:
+            if refresh_prefix_cache(self.cached_prefix):
+                self.prefix_expires = time.monotonic() + _prefix_cache_seconds()
             else:
-                messages.append(AIMessage(content=content))
+                self._drop_prefix()
+        finally:
+            self._refreshing = False
+
+    def _drop_prefix(self):
+        self.cached_prefix = None
+        self._pool = []
+
+    def reasoning_mode(self, reasoning: str) -> str:
+        # The provider-side cached prefix holds the default mode's prompt, so it pins every session to it
+        return REASONING_MODE if self.cached_prefix else reasoning
+
+    def prefix(self, reasoning: str = REASONING_MODE) -> tuple:
+        # A provider-side cached prefix already holds the system prompt
+        return prompt_prefix(reasoning)[1:] if self.cached_prefix else prompt_prefix(reasoning)
+
+    def warm(self, pool_size: int = LLM_POOL_SIZE):
+        """Imports the provider SDK and fills the pool with ready chat models."""
+        if LLM_FAST_MODEL and self.fast_llm is None:
+            self.fast_llm = LLMRouter.from_spec(LLM_FAST_MODEL, tools=tool_declarations(edit_only=True))
+            self.fast_llm.warm()
+        if LLM_ROUTES:
+            # The router keeps one model per route and spreads load itself
+            if not self._pool:
+                router = LLMRouter.from_spec(LLM_ROUTES)
+                router.warm()
+                self._pool = [router]
+            prompt_prefix()
+            return
+        if LLM_BACKEND == "fake":
+            from .fake_llm import FakeChatModel
+
+            # One scripted model is enough; it has no connections to spread
+            if not self._pool:
+                self._pool = [FakeChatModel.from_env()]
+            return
+        if not self._pool and LLM_PREFIX_CACHE:
+            self.cached_prefix = create_prefix_cache()
+            self.prefix_expires = time.monotonic() + _prefix_cache_seconds()
+        prompt_prefix()
+        while len(self._pool) < pool_size:
+            self._pool.append(self._create_gemini())
+
+    def _create_gemini(self):
+        if self.cached_prefix:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+
+            return ChatGoogleGenerativeAI(
+                model=MODEL_NAME,
+                google_api_key=os.getenv("GEMINI_API_KEY"),
+                cached_content=self.cached_prefix,
+            )
+        return create_chat_model("gemini", MODEL_NAME)
+
+    @property
+    def has_fast_tier(self) -> bool:
+        return self.fast_llm is not None
 
-        response = self.llm.invoke(messages)
+    def _tier(self, tier: str) -> tuple:
+        """(chat model, model name, tool schema) answering turns of this tier."""
+        if tier == "fast" and self.fast_llm is not None:
+            return self.fast_llm, self.fast_model_name, tool_schema(edit_only=True)
+        return self.llm, self.model_name, TOOL_SCHEMA
 
+    def _request_key(
+        self,
+        history: List[dict],
+        model_name: Optional[str] = None,
+        schema: str = TOOL_SCHEMA,
+        reasoning: str = REASONING_MODE,
+    ) -> str:
+        """Identifies a request for the response cache and for sharing identical in-flight calls."""
+        return make_cache_key(history, system_prompt(reasoning), model_name or self.model_name, schema)
+
+    def _cached(self, key: str, history: List[dict]) -> Optional[LLMResponsePacket]:
+        packet = self.cache.get(key) if self.cache is not None else None
+        if packet is None and self.layouts is not None and _first_turn(history):
+            with span("semantic_lookup"):
+                packet = self.layouts.get(history[0]["content"])
+        return packet
+
+    def _cache_store(self, key: str, packet: LLMResponsePacket, history: List[dict]):
+        if self.cache is not None:
+            self.cache.set(key, packet)
+        if self.layouts is not None and _first_turn(history) and not packet.tool_errors:
+            self.layouts.set(history[0]["content"], packet)
+
+    async def _shared(self, key: str, call):
+        """Runs call, or joins the identical request already in flight."""
+        if self.flights is None:
+            return await call()
+        return await self.flights.do(key, call)
+
+    _executor: Optional[ThreadPoolExecutor] = None
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        """Shared, bounded pool for the blocking fallback path."""
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(
+                max_workers=LLM_MAX_WORKERS,
+                thread_name_prefix="llm",
+            )
+        return cls._executor
+
+    def _build_messages(self, history: List[dict], tier: str = "strong", reasoning: str = REASONING_MODE) -> list:
+        if not self._pool:
+            # Warming decides whether the system prompt lives in a provider-side cache
+            self.warm(1)
+        # Only the strong tier's model was created with the cached prefix
+        if tier == "fast" and self.fast_llm is not None:
+            messages = list(prompt_prefix(reasoning))
+        else:
+            messages = list(self.prefix(self.reasoning_mode(reasoning)))
+        for msg in history:
+            # Each history entry is converted once and the message object reused on later turns
+            message = msg.get("message")
+            if message is None:
+                message = msg["message"] = to_message(msg["role"], msg["content"])
+            messages.append(message)
+        return messages
+
+    @staticmethod
+    def _content_text(content) -> str:
+        # Newer providers return content as a list of blocks rather than a string
+        if isinstance(content, list):
+            return "".join(
+                block if isinstance(block, str) else block.get("text", "")
+                for block in content
+            )
+        return content or ""
+
+    def _parse_response(self, response) -> LLMResponsePacket:
         # Parse tool calls into Pydantic models
-        parsed_tools = getattr(response, "tool_calls", [])
+        with span("parse"):
+            ui_commands, tool_errors = parse_tool_calls(getattr(response, "tool_calls", None) or [])
+        # Reasoning is neither shown to the user nor resent with the history
+        chat_message, reasoning_tokens = strip_reasoning(self._content_text(getattr(response, "content", "")))
+
+        return LLMResponsePacket(
+            chat_message=chat_message,
+            ui_commands=ui_commands,
+            tool_errors=tool_errors,
+            reasoning_tokens=reasoning_tokens,
+        )
+
+    def _reask_messages(self, tool_errors: List[ToolCallError], tier: str, reasoning: str = REASONING_MODE) -> list:
+        from langchain_core.messages import HumanMessage
+
+        messages = self._build_messages([], tier, reasoning)
+        messages.append(HumanMessage(content=reask_prompt(tool_errors)))
+        TOOL_CALL_REASKS.inc()
+        return messages
+
+    def _merge_reask(self, packet: LLMResponsePacket, response) -> LLMResponsePacket:
+        # The corrected calls were meant to come after the ones that were already valid
+        retry = self._parse_response(response)
+        print(f"Re-ask fixed {len(retry.ui_commands)} of {len(packet.tool_errors)} invalid tool calls")
+        return packet.model_copy(update={
+            "ui_commands": packet.ui_commands + retry.ui_commands,
+            "tool_errors": retry.tool_errors,
+            "reasoning_tokens": packet.reasoning_tokens + retry.reasoning_tokens,
+        })
+
+    def get_response(self, history: List[dict], tier: str = "strong", reasoning: str = REASONING_MODE) -> LLMResponsePacket:
+        """Calls Gemini with history and returns parsed function calls + message."""
+        llm, model_name, schema = self._tier(tier)
+        reasoning = self.reasoning_mode(reasoning)
+        key = self._request_key(history, model_name, schema, reasoning)
+        cached = self._cached(key, history)
+        if cached is not None:
+            return cached
+        response = llm.invoke(self._build_messages(history, tier, reasoning))
+        packet = self._parse_response(response)
+        if packet.tool_errors and LLM_REPAIR_REASK:
+            packet = self._merge_reask(packet, llm.invoke(self._reask_messages(packet.tool_errors, tier, reasoning)))
+        self._cache_store(key, packet, history)
+        return packet
+
+    async def _aparse(self, llm, history: List[dict], tier: str, reasoning: str) -> LLMResponsePacket:
+        packet = self._parse_response(await self._ainvoke(self._build_messages(history, tier, reasoning), llm))
+        if packet.tool_errors and LLM_REPAIR_REASK:
+            response = await self._ainvoke(self._reask_messages(packet.tool_errors, tier, reasoning), llm)
+            packet = self._merge_reask(packet, response)
+        return packet
+
+    async def aget_response(
+        self, history: List[dict], tier: str = "strong", reasoning: str = REASONING_MODE
+    ) -> LLMResponsePacket:
+        """Async variant of get_response that never blocks the event loop."""
+        llm, model_name, schema = self._tier(tier)
+        reasoning = self.reasoning_mode(reasoning)
+        key = self._request_key(history, model_name, schema, reasoning)
+        cached = self._cached(key, history)
+        if cached is not None:
+            return cached
+
+        async def call():
+            packet = await self._aparse(llm, history, tier, reasoning)
+            self._cache_store(key, packet, history)
+            return packet
+
+        return await self._shared(key, call)
+
+    async def _ainvoke(self, messages: list, llm=None):
+        llm = llm if llm is not None else self.llm
+        if hasattr(llm, "ainvoke"):
+            return await llm.ainvoke(messages)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(), llm.invoke, messages
+        )
+
+    async def astream_response(
+        self, history: List[dict], tier: str = "strong", reasoning: str = REASONING_MODE
+    ) -> AsyncIterator[Union[ChatDeltaPacket, UICommandPacket, TurnCompletePacket]]:
+        """Streams chat deltas and UI commands as soon as each tool call is complete.
+
+        Ends with a TurnCompletePacket carrying the full chat message. An identical
+        request already in flight is joined and its result replayed instead.
+        """
+        llm, model_name, schema = self._tier(tier)
+        reasoning = self.reasoning_mode(reasoning)
+        key = self._request_key(history, model_name, schema, reasoning)
+        packet = self._cached(key, history)
+        if packet is None and self.flights is not None:
+            packet = await self.flights.join(key)
+        if packet is not None or not hasattr(llm, "astream"):
+            if packet is None:
+                async def call():
+                    result = await self._aparse(llm, history, tier, reasoning)
+                    self._cache_store(key, result, history)
+                    return result
+
+                packet = await self._shared(key, call)
+            if packet.chat_message:
+                yield ChatDeltaPacket(delta=packet.chat_message)
+            for command in packet.ui_commands:
+                yield UICommandPacket(ui_command=command)
+            yield TurnCompletePacket(
+                chat_message=packet.chat_message,
+                tool_errors=packet.tool_errors,
+                reasoning_tokens=packet.reasoning_tokens,
+            )
+            return
+
+        with self.flights.lead(key) if self.flights is not None else nullcontext(lambda packet: None) as publish:
+            async for packet in self._stream(llm, history, tier, reasoning):
+                if isinstance(packet, LLMResponsePacket):
+                    # The assembled turn: share it with callers that joined, then finish the stream
+                    self._cache_store(key, packet, history)
+                    publish(packet)
+                    packet = TurnCompletePacket(
+                        chat_message=packet.chat_message,
+                        tool_errors=packet.tool_errors,
+                        reasoning_tokens=packet.reasoning_tokens,
+                    )
+                yield packet
+
+    async def _stream(self, llm, history: List[dict], tier: str, reasoning: str = REASONING_MODE):
+        """Yields ChatDeltaPackets and UICommandPackets, then the assembled LLMResponsePacket."""
+
+        text_parts = []
+        # Reasoning blocks are held back as they stream in and never reach the client
+        hidden = ReasoningFilter()
         ui_commands = []
-        for tool_call in parsed_tools:
-            # tool_call may be a dict or an object with .args
-            data = tool_call if isinstance(tool_call, dict) else getattr(tool_call, "args", {})
-            command_type = data.get("command")
-            model_cls = COMMAND_MODELS.get(command_type)
-            if model_cls:
+        tool_errors = []
+        # Accumulated raw JSON args per tool-call index; an entry is complete once it parses
+        pending_args = {}
+        tool_names = {}
+        emitted = set()
+        full = None
+        async for chunk in llm.astream(self._build_messages(history, tier, reasoning)):
+            full = chunk if full is None else full + chunk
+            delta = hidden.feed(self._content_text(getattr(chunk, "content", "")))
+            if delta:
+                text_parts.append(delta)
+                yield ChatDeltaPacket(delta=delta)
+            for tc_chunk in getattr(chunk, "tool_call_chunks", None) or []:
+                index = tc_chunk.get("index")
+                if index is None:
+                    index = len(pending_args)
+                pending_args[index] = pending_args.get(index, "") + (tc_chunk.get("args") or "")
+                if tc_chunk.get("name"):
+                    tool_names[index] = tc_chunk["name"]
+                if index in emitted:
+                    continue
                 try:
-                    ui_commands.append(model_cls(**data))
-                except Exception as e:
-                    print(f"Error parsing {command_type}: {e}")
+                    args = json.loads(pending_args[index])
+                except ValueError:
+                    continue
+                emitted.add(index)
+                with span("parse"):
+                    commands, errors = parse_tool_calls([{"name": tool_names.get(index), "args": args}])
+                tool_errors.extend(e.model_copy(update={"index": index}) for e in errors)
+                for command in commands:
+                    ui_commands.append(command)
+                    yield UICommandPacket(ui_command=command)
 
-        chat_message = getattr(response, "content", "")
+        delta = hidden.flush()
+        if delta:
+            text_parts.append(delta)
+            yield ChatDeltaPacket(delta=delta)
 
-        return LLMResponsePacket(
+        # A call whose arguments never became valid JSON is invalid like any other, and is asked again
+        for index in sorted(set(pending_args) - emitted):
+            try:
+                json.loads(pending_args[index])
+            except ValueError as e:
+                name = tool_names.get(index) or ""
+                tool_errors.append(ToolCallError(
+                    index=index,
+                    tool_name=name,
+                    command=TOOL_COMMANDS.get(name),
+                    arguments={"raw": pending_args[index]},
+                    errors=[{"loc": [], "type": "json_invalid", "msg": f"arguments are not valid JSON: {e}"}],
+                ))
+
+        # Providers that do not emit tool_call_chunks only expose parsed calls at the end
+        if full is not None and not pending_args:
+            with span("parse"):
+                commands, tool_errors = parse_tool_calls(getattr(full, "tool_calls", None) or [])
+            for command in commands:
+                ui_commands.append(command)
+                yield UICommandPacket(ui_command=command)
+
+        reasoning_tokens = hidden.hidden_tokens
+        if tool_errors and LLM_REPAIR_REASK:
+            retry = self._merge_reask(
+                LLMResponsePacket(tool_errors=tool_errors),
+                await self._ainvoke(self._reask_messages(tool_errors, tier, reasoning), llm),
+            )
+            tool_errors = retry.tool_errors
+            reasoning_tokens += retry.reasoning_tokens
+            for command in retry.ui_commands:
+                ui_commands.append(command)
+                yield UICommandPacket(ui_command=command)
+
+        chat_message = "".join(text_parts).rstrip() or None
+        yield LLMResponsePacket(
             chat_message=chat_message,
-            ui_commands=ui_commands
-        )
\ No newline at end of file
+            ui_commands=ui_commands,
+            tool_errors=tool_errors,
+            reasoning_tokens=reasoning_tokens,
+        )
@@ -1,18 +1,146 @@
-from fastapi import FastAPI, WebSocket
+import asyncio
+import hmac
+import os
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Request, WebSocket
+from fastapi.responses import JSONResponse, PlainTextResponse
+from .connections import Connection, ConnectionManager
+from .metrics import (
+    ACTIVE_CONNECTIONS, CACHE_HITS, CACHE_MISSES, REGISTRY, SEMANTIC_HITS, SEMANTIC_MISSES, probe_loop_lag,
+)
+from .llm_client import validate_config as validate_llm_config
 from .orchestrator import ConversationHandler
+from .reasoning import negotiate_reasoning
+from .turns import TURN_POLICIES, TURN_POLICY, TurnScheduler
+from .wire import negotiate_wire, wire_info
+
+# Bearer token for POST /drain; when unset, only local clients may drain
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+# How often disconnected sessions past their TTL are freed
+SESSION_REAP_INTERVAL = float(os.getenv("SESSION_REAP_INTERVAL", "60"))
 
 app = FastAPI()
 handler = ConversationHandler()
+connections = ConnectionManager()
+if handler.llm_client.cache is not None:
+    CACHE_HITS.set_function(lambda: handler.llm_client.cache.hits)
+    CACHE_MISSES.set_function(lambda: handler.llm_client.cache.misses)
+if handler.llm_client.layouts is not None:
+    SEMANTIC_HITS.set_function(lambda: handler.llm_client.layouts.hits)
+    SEMANTIC_MISSES.set_function(lambda: handler.llm_client.layouts.misses)
+
+
+def validate_config():
+    problems = validate_llm_config()
+    if TURN_POLICY not in TURN_POLICIES:
+        problems.append(f"Unknown TURN_POLICY: {TURN_POLICY}")
+    return problems
+
+
+@app.on_event("startup")
+async def startup():
+    """Fails fast on bad settings and warms the LLM clients before the first connection."""
+    problems = validate_config()
+    if problems:
+        raise RuntimeError("Invalid configuration: " + "; ".join(problems))
+    await asyncio.to_thread(handler.llm_client.warm)
+    app.state.loop_probe = asyncio.create_task(probe_loop_lag())
+    app.state.session_reaper = asyncio.create_task(reap_sessions())
+
+
+async def reap_sessions():
+    # Sessions are otherwise only evicted when a new connection opens
+    while True:
+        await asyncio.sleep(SESSION_REAP_INTERVAL)
+        handler.sessions.evict_expired()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Normally a no-op: the server closes websockets before this runs, so drain via POST /drain first
+    await connections.drain()
+    if handler.log is not None:
+        # Writes whatever is still queued
+        await asyncio.to_thread(handler.log.close)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of turn latencies, tokens, cache and connection gauges."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/healthz")
+async def healthz():
+    """503 while draining, so load balancers stop routing new connections here."""
+    body = {"status": "draining" if connections.draining else "ok", "connections": len(connections)}
+    return JSONResponse(body, status_code=503 if connections.draining else 200)
+
+
+@app.post("/drain")
+async def drain(request: Request):
+    """Starts a graceful drain before a restart: turns in flight finish, then every connection closes."""
+    if ADMIN_TOKEN:
+        supplied = request.headers.get("authorization", "")
+        if not hmac.compare_digest(supplied, f"Bearer {ADMIN_TOKEN}"):
+            raise HTTPException(status_code=401)
+    elif request.client is None or request.client.host not in ("127.0.0.1", "::1", "localhost"):
+        raise HTTPException(status_code=403)
+    closed = await connections.drain()
+    return {"status": "drained", "closed": closed}
+
 
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(
+    websocket: WebSocket,
+    session_id: Optional[str] = None,
+    stream: bool = False,
+    format: str = "json",
+    reasoning: Optional[str] = None,
+):
+    rejected = connections.admission()
+    if rejected is not None:
+        await connections.reject(websocket, rejected)
+        return
+    try:
+        await run_connection(websocket, session_id, stream, format, reasoning)
+    finally:
+        connections.release()
+
+
+async def run_connection(
+    websocket: WebSocket, session_id: Optional[str], stream: bool, format: str, reasoning: Optional[str],
+):
     await websocket.accept()
-    print("connection open")
+    session = scheduler = None
+    reason = "error"
     try:
-        while True:
-            data = await websocket.receive_json()
-            await handler.handle_message(websocket, data)
+        ACTIVE_CONNECTIONS.inc()
+        session = await handler.sessions.open(session_id)
+        session.stream = stream
+        session.wire = negotiate_wire(format)
+        session.reasoning = negotiate_reasoning(reasoning)
+        scheduler = TurnScheduler(handler, websocket, session)
+        print(f"connection open (session {session.session_id})")
+        await session.wire.send(websocket, {
+            "type": "session",
+            "session_id": session.session_id,
+            "resumed": session.session_id == session_id,
+            "ui_commands": session.ui.to_wire(),
+            "wire": wire_info(session.wire),
+            "reasoning": session.reasoning,
+        })
+        scheduler.start()
+        reason = await connections.serve(Connection(websocket, session, scheduler), scheduler.submit)
     except Exception as e:
         print(f"WebSocket error: {e}")
     finally:
-        await websocket.close()
\ No newline at end of file
+        ACTIVE_CONNECTIONS.dec()
+        if scheduler is not None:
+            await scheduler.close()
+        if session is not None:
+            # Past its maximum lifetime the session ends; otherwise it stays resumable until its TTL
+            await handler.sessions.close(session, keep=reason != "max_session")
+            print(f"connection closed (session {session.session_id}): {reason}")
+        else:
+            print(f"connection closed before a session was opened: {reason}")
@@ -0,0 +1,310 @@
+# backend/app/metrics.py
+import asyncio
+import bisect
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Path of a JSON-lines file that gets one record per turn; "-" prints them, empty disables
+METRICS_TRACE_LOG = os.getenv("METRICS_TRACE_LOG", "")
+METRICS_LOOP_PROBE_INTERVAL = float(os.getenv("METRICS_LOOP_PROBE_INTERVAL", "0.5"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _labels(names: Sequence[str], values: Tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, values)) + "}"
+
+
+class Metric:
+    """One named metric family with optional labels, rendered in Prometheus text format."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._fn: Optional[Callable[[], float]] = None
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple:
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def set_function(self, fn: Callable[[], float]):
+        """Reads the value at scrape time instead (e.g. a counter kept elsewhere)."""
+        self._fn = fn
+
+    def value(self, **labels) -> float:
+        if self._fn is not None:
+            return self._fn()
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        if self._fn is not None:
+            return [(self.name, "", self._fn())]
+        with self._lock:
+            return [(self.name, _labels(self.labelnames, k), v) for k, v in self._values.items()]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{name}{labels} {value:g}" for name, labels, value in self.samples()]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def count(self, **labels) -> int:
+        return sum(self._series.get(self._key(labels), [0, 0.0])[:-1])
+
+    def samples(self):
+        out = []
+        with self._lock:
+            for key, series in self._series.items():
+                cumulative = 0
+                for bound, n in zip(self.buckets + (float("inf"),), series):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    out.append((f"{self.name}_bucket", _labels(self.labelnames + ("le",), key + (le,)), cumulative))
+                out.append((f"{self.name}_sum", _labels(self.labelnames, key), series[-1]))
+                out.append((f"{self.name}_count", _labels(self.labelnames, key), cumulative))
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self.metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+TURN_SECONDS = REGISTRY.register(Histogram(
+    "gui_turn_seconds", "Wall time of a turn from receipt of the message to the last packet sent.", ["outcome", "tier"],
+))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "gui_turn_stage_seconds",
+    "Time spent per turn stage: queue, admission, build, llm_first_token, llm, parse, apply, serialize, send.",
+    ["stage"],
+))
+TOKENS = REGISTRY.register(Counter(
+    "gui_tokens_total", "Estimated tokens of model calls: prompt, completion, stripped reasoning and reasoning not resent.", ["kind"],
+))
+CACHE_HITS = REGISTRY.register(Counter("gui_llm_cache_hits_total", "Response cache hits."))
+CACHE_MISSES = REGISTRY.register(Counter("gui_llm_cache_misses_total", "Response cache misses."))
+SEMANTIC_HITS = REGISTRY.register(Counter("gui_semantic_cache_hits_total", "First turns answered with a reused UI."))
+SEMANTIC_MISSES = REGISTRY.register(Counter("gui_semantic_cache_misses_total", "Semantic cache lookups without a match."))
+ACTIVE_CONNECTIONS = REGISTRY.register(Gauge("gui_active_connections", "Open /ws connections."))
+CONNECTIONS_CLOSED = REGISTRY.register(Counter(
+    "gui_connections_closed_total", "Closed /ws connections by reason (disconnect, idle, heartbeat_timeout...).",
+    ["reason"],
+))
+CONNECTIONS_REJECTED = REGISTRY.register(Counter(
+    "gui_connections_rejected_total", "/ws connections turned away (capacity, draining).", ["reason"],
+))
+ACTIVE_TURNS = REGISTRY.register(Gauge("gui_active_turns", "Turns holding an LLM slot."))
+LOOP_LAG_SECONDS = REGISTRY.register(Histogram(
+    "gui_event_loop_lag_seconds", "How late the event loop woke a periodic probe; high values mean blocking code.",
+))
+
+LLM_ROUTE_SECONDS = REGISTRY.register(Histogram(
+    "gui_llm_route_seconds", "Latency per LLM route: whole response (invoke) or first chunk (stream).", ["route", "kind"],
+))
+LLM_ROUTE_ERRORS = REGISTRY.register(Counter(
+    "gui_llm_route_errors_total", "Failed requests per LLM route, by quota or other error.", ["route", "reason"],
+))
+LLM_HEDGES = REGISTRY.register(Counter(
+    "gui_llm_hedges_total", "Hedge requests sent, by the route they went to.", ["route"],
+))
+LLM_SHARED_REQUESTS = REGISTRY.register(Counter(
+    "gui_llm_shared_requests_total", "Requests answered by joining an identical request already in flight.",
+))
+TOOL_CALL_REPAIRS = REGISTRY.register(Counter(
+    "gui_tool_call_repairs_total", "Fixes applied locally to tool calls that failed validation.",
+))
+TOOL_CALL_REASKS = REGISTRY.register(Counter(
+    "gui_tool_call_reasks_total", "Follow-up requests for tool calls that could not be repaired locally.",
+))
+
+_current_trace: ContextVar[Optional["TurnTrace"]] = ContextVar("current_trace", default=None)
+
+
+class TraceLog:
+    """Appends trace records to their file from a writer thread, so a turn never waits on disk."""
+
+    def __init__(self):
+        self._queue: "queue.Queue[Tuple[str, str]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def write(self, path: str, record: str):
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="trace-log", daemon=True)
+                self._writer.start()
+        self._queue.put((path, record))
+
+    def flush(self):
+        """Blocks until every queued record is written."""
+        self._queue.join()
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                lines: Dict[str, List[str]] = {}
+                for path, record in batch:
+                    lines.setdefault(path, []).append(record + "\n")
+                for path, records in lines.items():
+                    with open(path, "a", encoding="utf-8") as f:
+                        f.writelines(records)
+            except Exception as e:
+                print(f"Trace log write failed: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+TRACE_LOG = TraceLog()
+
+
+class TurnTrace:
+    """Stage timings of one turn; stages are also observed into STAGE_SECONDS as they end."""
+
+    def __init__(self, session_id: str, received_at: Optional[float] = None):
+        self.session_id = session_id
+        self.started = received_at if received_at is not None else time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.tokens: Dict[str, int] = {}
+        # Set by the turn when it ends some other way than ok/cancelled/error (e.g. "rejected")
+        self.outcome: Optional[str] = None
+        # Model tier that served the turn, and why the classifier picked it (see tiering.py)
+        self.tier = "none"
+        self.routing: Optional[dict] = None
+
+    def record(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        STAGE_SECONDS.observe(seconds, stage=stage)
+
+    def count_tokens(self, kind: str, tokens: int):
+        self.tokens[kind] = self.tokens.get(kind, 0) + tokens
+        TOKENS.inc(tokens, kind=kind)
+
+    def finish(self, outcome: str):
+        total = time.perf_counter() - self.started
+        TURN_SECONDS.observe(total, outcome=outcome, tier=self.tier)
+        if METRICS_TRACE_LOG:
+            record = json.dumps({
+                "session_id": self.session_id,
+                "outcome": outcome,
+                "tier": self.tier,
+                "routing": self.routing,
+                "total_ms": round(total * 1000, 3),
+                "stages_ms": {k: round(v * 1000, 3) for k, v in self.stages.items()},
+                "tokens": self.tokens,
+            })
+            if METRICS_TRACE_LOG == "-":
+                print(record)
+            else:
+                TRACE_LOG.write(METRICS_TRACE_LOG, record)
+
+
+@contextmanager
+def trace_turn(session_id: str, received_at: Optional[float] = None):
+    """Makes a TurnTrace current for the enclosed code and finishes it with the outcome."""
+    trace = TurnTrace(session_id, received_at)
+    token = _current_trace.set(trace)
+    outcome = "error"
+    try:
+        yield trace
+        outcome = trace.outcome or "ok"
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        _current_trace.reset(token)
+        trace.finish(outcome)
+
+
+def current_trace() -> Optional[TurnTrace]:
+    return _current_trace.get()
+
+
+def record_stage(stage: str, seconds: float):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.record(stage, seconds)
+    else:
+        STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+@contextmanager
+def span(stage: str):
+    """Times the enclosed code as one stage of the current turn (or standalone if none)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+async def probe_loop_lag(interval: float = METRICS_LOOP_PROBE_INTERVAL):
+    """Runs forever, recording how late each periodic wakeup is."""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - expected))
@@ -1,25 +1,37 @@
 # backend/app/models.py
-from pydantic import BaseModel, Field
-from typing import List, Literal, Union, Dict, Any, Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import ClassVar, List, Literal, Union, Dict, Any, Optional
 
 # UI Commands (LLM -> Backend)
 # "GUI Instruction Set Architecture (ISA)"
 
+# Every command class in AnyCommand is exposed to the LLM as a tool named after the
+# class, with its docstring as the description (see registry.py). Set
+# `llm_tool = False` for commands only the server sends, and `edit_tool = False`
+# for commands left out of the reduced tool set given to the fast tier.
+
 class BaseCommand(BaseModel):
     """The base for any command that modifies the UI."""
+    llm_tool: ClassVar[bool] = True
+    edit_tool: ClassVar[bool] = True
     container_id: str = "main_workspace" # Default container for now
+    # Stable id of the element within its container; assigned by the server if omitted
+    element_id: Optional[str] = None
 
 class AddTextCommand(BaseCommand):
+    """Adds a block of text to a UI container."""
     command: Literal["ADD_TEXT"] = "ADD_TEXT"
     text: str
     style: Literal["header", "body", "code"] = "body"
 
 class AddButtonCommand(BaseCommand):
+    """Adds a button to a UI container."""
     command: Literal["ADD_BUTTON"] = "ADD_BUTTON"
     button_id: str
     text: str
 
 class AddSliderCommand(BaseCommand):
+    """Adds a labelled numeric slider to a UI container."""
     command: Literal["ADD_SLIDER"] = "ADD_SLIDER"
     slider_id: str
     label: str
@@ -27,23 +39,111 @@ class AddSliderCommand(BaseCommand):
     max_val: float
     default_val: float
 
+    @model_validator(mode="after")
+    def _keep_in_range(self):
+        # Models often swap the bounds or start outside them; fix rather than reject
+        if self.min_val > self.max_val:
+            self.min_val, self.max_val = self.max_val, self.min_val
+        self.default_val = min(max(self.default_val, self.min_val), self.max_val)
+        return self
+
 class ClearContainerCommand(BaseModel):
+    """Removes every element from a UI container."""
+    edit_tool: ClassVar[bool] = False # small edits never rebuild the whole container
     command: Literal["CLEAR_CONTAINER"] = "CLEAR_CONTAINER"
     container_id: str
 
+# Patch commands: edit elements already on screen by element_id instead of
+# clearing the container and re-adding everything.
+
+class UpdateElementCommand(BaseCommand):
+    """Changes fields of an element already on screen."""
+    llm_tool: ClassVar[bool] = False # the model re-adds the element with the same id instead
+    command: Literal["UPDATE_ELEMENT"] = "UPDATE_ELEMENT"
+    element_id: str
+    changes: Dict[str, Any]
+
+class RemoveElementCommand(BaseCommand):
+    """Removes one element, by its id, from a UI container."""
+    command: Literal["REMOVE_ELEMENT"] = "REMOVE_ELEMENT"
+    element_id: str
+
+class MoveElementCommand(BaseCommand):
+    """Moves an element to just after another element; without after_id it moves to the front."""
+    command: Literal["MOVE_ELEMENT"] = "MOVE_ELEMENT"
+    element_id: str
+    after_id: Optional[str] = None # None moves the element to the front
+
 # A Union type to represent any possible UI command.
 # FastAPI will use this for validation.
 AnyCommand = Union[
     AddTextCommand,
     AddButtonCommand,
     AddSliderCommand,
-    ClearContainerCommand
+    ClearContainerCommand,
+    UpdateElementCommand,
+    RemoveElementCommand,
+    MoveElementCommand,
 ]
 
+class ToolCallError(BaseModel):
+    """A tool call from the LLM that did not validate as a UI command."""
+    index: int
+    tool_name: str = ""
+    command: Optional[str] = None
+    arguments: Dict[str, Any] = Field(default_factory=dict)
+    errors: List[Dict[str, Any]] = Field(default_factory=list)
+
 class LLMResponsePacket(BaseModel):
     """The full, structured packet the LLM should return."""
     chat_message: Optional[str] = None
     ui_commands: List[AnyCommand] = Field(default_factory=list)
+    # Server-side only; never serialized to the client
+    tool_errors: List[ToolCallError] = Field(default_factory=list, exclude=True)
+    # Estimated tokens of reasoning stripped from the reply
+    reasoning_tokens: int = Field(0, exclude=True)
+
+
+# --- Streaming packets (Backend -> Frontend) ---
+# Sent instead of a single LLMResponsePacket when the client asks for streaming.
+
+class ChatDeltaPacket(BaseModel):
+    """An incremental piece of the assistant's chat message."""
+    type: Literal["chat_delta"] = "chat_delta"
+    delta: str
+
+class UICommandPacket(BaseModel):
+    """A single UI command, sent as soon as its tool call is complete."""
+    type: Literal["ui_command"] = "ui_command"
+    ui_command: AnyCommand
+
+class TurnCancelledPacket(BaseModel):
+    """The turn in flight was superseded by a newer message and stopped."""
+    type: Literal["turn_cancelled"] = "turn_cancelled"
+
+class TurnRejectedPacket(BaseModel):
+    """A message was not processed: the inbound queue was full, the server was busy or draining."""
+    type: Literal["turn_rejected"] = "turn_rejected"
+    reason: Literal["queue_full", "busy", "draining"]
+
+class PingPacket(BaseModel):
+    """Heartbeat; the client answers with {"type": "pong"}."""
+    type: Literal["ping"] = "ping"
+
+class ConnectionClosingPacket(BaseModel):
+    """Sent right before the server closes the connection."""
+    type: Literal["connection_closing"] = "connection_closing"
+    reason: Literal["idle", "max_session", "heartbeat_timeout", "capacity", "draining"]
+    # Whether reconnecting with the same session_id picks the conversation up again
+    resumable: bool = True
+
+class TurnCompletePacket(BaseModel):
+    """Marks the end of a streamed turn."""
+    type: Literal["turn_complete"] = "turn_complete"
+    chat_message: Optional[str] = None
+    tool_errors: List[ToolCallError] = Field(default_factory=list, exclude=True)
+    # Estimated tokens of reasoning stripped from the reply
+    reasoning_tokens: int = Field(0, exclude=True)
 
 
 # --- UI Events (Frontend -> Backend) ---
@@ -52,4 +152,5 @@ class LLMResponsePacket(BaseModel):
 class UIEvent(BaseModel):
     event_type: Literal["button_click", "slider_change"]
     element_id: str
+    container_id: str = "main_workspace"
     state: Dict[str, Any] = Field(default_factory=dict)
\ No newline at end of file
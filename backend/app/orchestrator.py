@@ -1,16 +1,156 @@
+import asyncio
+import os
+import time
+from typing import Optional
 from fastapi import WebSocket
+from pydantic import ValidationError
+from .context import ContextManager, estimate_tokens
+from .conversation_log import create_conversation_log
+from .events import EventEngine
 from .llm_client import LLMClient
+from .metrics import ACTIVE_TURNS, record_stage, span, trace_turn
+from .models import LLMResponsePacket, UICommandPacket, UIEvent, TurnCompletePacket, TurnRejectedPacket
+from .session import Session, SessionManager
+from .tiering import TurnClassifier
+
+# Server-wide cap on model calls in flight, and how long a turn may wait for a slot
+LLM_MAX_CONCURRENT = int(os.getenv("LLM_MAX_CONCURRENT", "256"))
+LLM_ADMISSION_TIMEOUT = float(os.getenv("LLM_ADMISSION_TIMEOUT", "30"))
 
 class ConversationHandler:
     def __init__(self):
         self.llm_client = LLMClient()
-        self.history = []
+        # Append-only record of every session, replayed to restore sessions after a restart
+        self.log = create_conversation_log()
+        self.sessions = SessionManager(log=self.log)
+        self.context = ContextManager()
+        self.events = EventEngine()
+        self.classifier = TurnClassifier()
+        self.llm_slots = asyncio.Semaphore(LLM_MAX_CONCURRENT)
 
-    async def handle_message(self, websocket: WebSocket, message_data: dict):
+    async def handle_message(self, websocket: WebSocket, session: Session, message_data: dict):
+        session.touch()
+        received_at = message_data.get("received_at")
         if message_data.get("type") == "user_message":
-            content = message_data.get("content", "")
-            self.history.append({"role": "user", "content": content})
-            llm_response = self.llm_client.get_response(self.history)
-            if llm_response.chat_message:
-                self.history.append({"role": "assistant", "content": llm_response.chat_message})
-            await websocket.send_json(llm_response.dict())
\ No newline at end of file
+            await self._run_turn(websocket, session, message_data.get("content", ""), received_at)
+        elif message_data.get("type") == "ui_event":
+            try:
+                event = UIEvent.model_validate(message_data)
+            except ValidationError as e:
+                print(f"Invalid UI event: {e}")
+                return
+            prompt = self.events.handle(session, event)
+            if self.log is not None:
+                self.log.append(session, ("event", event.model_dump()))
+            if prompt is not None:
+                await self._run_turn(websocket, session, prompt, received_at, from_event=True)
+        await self.sessions.save(session)
+
+    async def _run_turn(
+        self,
+        websocket: WebSocket,
+        session: Session,
+        content: str,
+        received_at: Optional[float] = None,
+        from_event: bool = False,
+    ):
+        with trace_turn(session.session_id, received_at) as trace:
+            if received_at is not None:
+                record_stage("queue", time.perf_counter() - received_at)
+            tier = "strong"
+            if self.llm_client.has_fast_tier:
+                # Classified before the turn is recorded or the pending UI changes are consumed
+                turn_class = self.classifier.classify(content, session, from_event)
+                tier = turn_class.tier
+                trace.routing = {"score": turn_class.score, "reasons": turn_class.reasons}
+            trace.tier = tier
+            session.add_message("user", content)
+            try:
+                with span("admission"):
+                    await asyncio.wait_for(self.llm_slots.acquire(), LLM_ADMISSION_TIMEOUT)
+            except asyncio.TimeoutError:
+                trace.outcome = "rejected"
+                session.pop_latest("user")
+                await session.wire.send(websocket, TurnRejectedPacket(reason="busy").model_dump())
+                return
+            ACTIVE_TURNS.inc()
+            try:
+                with span("build"):
+                    history = self.context.build(session)
+                trace.count_tokens("prompt", sum(m.get("tokens") or estimate_tokens(m["content"]) for m in history))
+                trace.count_tokens("reasoning_saved", sum(m.get("reasoning_tokens", 0) for m in history))
+                if session.stream:
+                    llm_response = await self._stream_turn(websocket, session, history, tier)
+                else:
+                    with span("llm"):
+                        llm_response = await self.llm_client.aget_response(history, tier, session.reasoning)
+                    # Record the turn before sending so a cancellation during the send
+                    # cannot leave the session out of step with what was generated
+                    with span("apply"):
+                        patch = llm_response.model_copy(update={"ui_commands": session.apply_commands(llm_response.ui_commands)})
+                    if llm_response.chat_message:
+                        session.add_message("assistant", llm_response.chat_message, llm_response.reasoning_tokens)
+                    await session.wire.send(websocket, patch.model_dump())
+                trace.count_tokens("completion", estimate_tokens(llm_response.chat_message or ""))
+                trace.count_tokens("reasoning", llm_response.reasoning_tokens)
+                if self.log is not None:
+                    self._log_turn(session, content, llm_response)
+            finally:
+                ACTIVE_TURNS.dec()
+                self.llm_slots.release()
+
+    def _log_turn(self, session: Session, content: str, llm_response: LLMResponsePacket):
+        records = [("user", {"content": content})]
+        if llm_response.ui_commands:
+            records.append(("commands", [c.model_dump() for c in llm_response.ui_commands]))
+        if llm_response.chat_message:
+            records.append(("assistant", {
+                "content": llm_response.chat_message,
+                "reasoning_tokens": llm_response.reasoning_tokens,
+            }))
+        self.log.append(session, *records)
+
+    async def _stream_turn(self, websocket: WebSocket, session: Session, history: list, tier: str = "strong") -> LLMResponsePacket:
+        """Forwards each streamed packet as it arrives and returns the assembled turn.
+
+        UI commands are applied to the session's UI tree as they arrive and the
+        resulting patch commands are sent in their place. The llm stage spans the
+        whole stream, so it includes the sends interleaved with it.
+        """
+        ui_commands = []
+        patcher = session.ui.begin_turn()
+        started = time.perf_counter()
+        first = True
+        try:
+            async for packet in self.llm_client.astream_response(history, tier, session.reasoning):
+                if first:
+                    record_stage("llm_first_token", time.perf_counter() - started)
+                    first = False
+                if isinstance(packet, UICommandPacket):
+                    ui_commands.append(packet.ui_command)
+                    with span("apply"):
+                        patch = patcher.feed(packet.ui_command)
+                    for command in patch:
+                        await session.wire.send(websocket, UICommandPacket(ui_command=command).model_dump())
+                    continue
+                if isinstance(packet, TurnCompletePacket):
+                    record_stage("llm", time.perf_counter() - started)
+                    with span("apply"):
+                        finish = patcher.finish()
+                    if packet.chat_message:
+                        session.add_message("assistant", packet.chat_message, packet.reasoning_tokens)
+                    for command in finish:
+                        await session.wire.send(websocket, UICommandPacket(ui_command=command).model_dump())
+                    await session.wire.send(websocket, packet.model_dump())
+                    return LLMResponsePacket(
+                        chat_message=packet.chat_message,
+                        ui_commands=ui_commands,
+                        tool_errors=packet.tool_errors,
+                        reasoning_tokens=packet.reasoning_tokens,
+                    )
+                await session.wire.send(websocket, packet.model_dump())
+        except asyncio.CancelledError:
+            # Keep the tree in step with the client, which still shows what was sent so far
+            patcher.abort()
+            raise
+        return LLMResponsePacket(ui_commands=ui_commands)
@@ -0,0 +1,87 @@
+# backend/app/parser.py
+from collections import defaultdict
+from typing import Annotated, Any, List, Tuple
+
+from pydantic import Field, TypeAdapter, ValidationError
+
+from .metrics import TOOL_CALL_REPAIRS
+from .models import AnyCommand, ToolCallError
+from .registry import TOOL_COMMANDS
+from .repair import repair_call
+
+# Built once at import: a discriminated union dispatches on `command` directly
+# instead of trying every member, and the list adapter validates a whole turn in one call.
+_COMMAND = Annotated[AnyCommand, Field(discriminator="command")]
+COMMAND_ADAPTER = TypeAdapter(_COMMAND)
+COMMAND_LIST_ADAPTER = TypeAdapter(List[_COMMAND])
+
+
+def normalize_tool_call(tool_call: Any) -> Tuple[str, dict]:
+    """Returns (tool name, command payload) for a langchain tool call, dict or bare args."""
+    if isinstance(tool_call, dict):
+        name = tool_call.get("name") or ""
+        args = tool_call.get("args", tool_call)
+    else:
+        name = getattr(tool_call, "name", "") or ""
+        args = getattr(tool_call, "args", {})
+    if not isinstance(args, dict):
+        return name, {}
+    if "command" not in args and name in TOOL_COMMANDS:
+        args = {"command": TOOL_COMMANDS[name], **args}
+    return name, args
+
+
+def _errors(e: ValidationError, skip: int = 0) -> dict:
+    # Validation errors grouped by index into the validated list
+    failures = defaultdict(list)
+    for err in e.errors(include_url=False, include_context=False):
+        loc = err["loc"]
+        failures[loc[0] if skip else 0].append({
+            "loc": list(loc[skip:]),
+            "type": err["type"],
+            "msg": err["msg"],
+        })
+    return failures
+
+
+def parse_tool_calls(tool_calls: List[Any]) -> Tuple[List[AnyCommand], List[ToolCallError]]:
+    """Validates every tool call of a response, keeping the valid commands in order.
+
+    The common all-valid case is a single validation pass. Calls that fail are
+    repaired locally where possible (see repair.py) and validated again on their
+    own; only what is still invalid is reported as a ToolCallError.
+    """
+    normalized = [normalize_tool_call(tc) for tc in tool_calls]
+    payloads = [args for _, args in normalized]
+    try:
+        return COMMAND_LIST_ADAPTER.validate_python(payloads), []
+    except ValidationError as e:
+        failures = _errors(e, skip=1)
+
+    for index in sorted(failures):
+        name, args = normalized[index]
+        tool, repaired, fixes = repair_call(name, args)
+        if not fixes:
+            continue
+        try:
+            COMMAND_ADAPTER.validate_python(repaired)
+        except ValidationError as e:
+            failures[index] = _errors(e)[0]
+            continue
+        print(f"Repaired tool call {index} ({tool}): {'; '.join(fixes)}")
+        TOOL_CALL_REPAIRS.inc(len(fixes))
+        payloads[index] = repaired
+        del failures[index]
+
+    errors = [
+        ToolCallError(
+            index=index,
+            tool_name=normalized[index][0],
+            command=payloads[index].get("command"),
+            arguments=payloads[index],
+            errors=failures[index],
+        )
+        for index in sorted(failures)
+    ]
+    valid = [p for i, p in enumerate(payloads) if i not in failures]
+    return COMMAND_LIST_ADAPTER.validate_python(valid), errors
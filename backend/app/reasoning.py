@@ -0,0 +1,126 @@
+# backend/app/reasoning.py
+import os
+import re
+from typing import List, Optional, Tuple
+
+from .context import estimate_tokens
+
+# How much the model reasons in writing before acting: "off", "budgeted" or "full".
+# Sessions can pick their own with the `reasoning` connection parameter.
+REASONING_MODES = ("off", "budgeted", "full")
+REASONING_MODE = os.getenv("REASONING_MODE", "off")
+# Word limit of the <thinking> block in budgeted mode
+REASONING_BUDGET_WORDS = int(os.getenv("REASONING_BUDGET_WORDS", "60"))
+
+# Rule 1 of the system prompt for each mode
+REASONING_RULES = {
+    "off": (
+        "1. Do not write out your reasoning or plans.\n"
+        "Use function calls to add UI elements, then reply to the user with a short message."
+    ),
+    "budgeted": (
+        f"1. Before building, think briefly in one <thinking> block of at most {REASONING_BUDGET_WORDS} words "
+        "(not shown to the user).\nAfter thinking, use function calls to add UI elements."
+    ),
+    "full": (
+        "1. Before building, think step-by-step in a <thinking> block (not shown to the user).\n"
+        "After thinking, use function calls to add UI elements."
+    ),
+}
+
+# Spans of model output that are never shown to the user or kept in history:
+# reasoning blocks, and UI described as code despite the prompt (see README examples)
+HIDDEN_BLOCKS = (
+    ("<thinking>", "</thinking>"),
+    ("<think>", "</think>"),
+    ("<reasoning>", "</reasoning>"),
+    ("```tool_code", "```"),
+    ("```json", "```"),
+)
+# Matched on the raw text: casefold()/lower() can change its length and shift every slice after
+_OPENERS = re.compile("|".join(re.escape(open_) for open_, _ in HIDDEN_BLOCKS), re.IGNORECASE)
+_CLOSERS = {open_.casefold(): close for open_, close in HIDDEN_BLOCKS}
+_CLOSER_PATTERNS = {close: re.compile(re.escape(close), re.IGNORECASE) for _, close in HIDDEN_BLOCKS}
+
+
+def _partial_suffix(text: str, markers) -> int:
+    """Length of the longest tail of text that could be the start of one of the markers."""
+    longest = 0
+    for marker in markers:
+        for size in range(min(len(marker) - 1, len(text)), longest, -1):
+            if marker.startswith(text[-size:].casefold()):
+                longest = size
+                break
+    return longest
+
+
+class ReasoningFilter:
+    """Removes hidden blocks from model text, including streamed text split mid-tag.
+
+    feed() returns the user-facing part of each delta as soon as it is known to be
+    outside a hidden block; flush() returns what was held back at the end. An
+    unterminated block hides everything after its opening tag.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._close: Optional[str] = None
+        self._started = False
+        self.hidden: List[str] = []
+
+    @property
+    def hidden_tokens(self) -> int:
+        return estimate_tokens("".join(self.hidden)) if self.hidden else 0
+
+    def feed(self, delta: str) -> str:
+        self._buffer += delta
+        visible = []
+        while self._buffer:
+            if self._close is not None:
+                found = _CLOSER_PATTERNS[self._close].search(self._buffer)
+                if found is None:
+                    keep = _partial_suffix(self._buffer, (self._close,))
+                    self.hidden.append(self._buffer[:len(self._buffer) - keep])
+                    self._buffer = self._buffer[len(self._buffer) - keep:]
+                    break
+                self.hidden.append(self._buffer[:found.end()])
+                self._buffer = self._buffer[found.end():]
+                self._close = None
+                continue
+            found = _OPENERS.search(self._buffer)
+            if found is None:
+                keep = _partial_suffix(self._buffer, [open_ for open_, _ in HIDDEN_BLOCKS])
+                visible.append(self._buffer[:len(self._buffer) - keep])
+                self._buffer = self._buffer[len(self._buffer) - keep:]
+                break
+            visible.append(self._buffer[:found.start()])
+            self.hidden.append(found.group(0))
+            self._buffer = self._buffer[found.end():]
+            self._close = _CLOSERS[found.group(0).casefold()]
+        return self._visible("".join(visible))
+
+    def flush(self) -> str:
+        rest, self._buffer = self._buffer, ""
+        if self._close is not None:
+            self.hidden.append(rest)
+            return ""
+        return self._visible(rest)
+
+    def _visible(self, text: str) -> str:
+        # The reply usually starts after the hidden block; drop the blank lines it leaves
+        if not self._started:
+            text = text.lstrip()
+            self._started = bool(text)
+        return text
+
+
+def negotiate_reasoning(requested: Optional[str]) -> str:
+    """The reasoning mode a client asked for, or the server default for missing/unknown values."""
+    return requested if requested in REASONING_MODES else REASONING_MODE
+
+
+def strip_reasoning(text: str) -> Tuple[str, int]:
+    """(user-facing text, estimated tokens removed) for a complete model reply."""
+    hidden = ReasoningFilter()
+    visible = hidden.feed(text) + hidden.flush()
+    return visible.rstrip(), hidden.hidden_tokens
@@ -0,0 +1,69 @@
+# backend/app/registry.py
+import json
+from functools import lru_cache
+from typing import Dict, List, Type, get_args
+
+from pydantic import BaseModel
+
+from .models import AnyCommand
+
+# Tool names as the model sees them (the command class names) -> command literal
+TOOL_COMMANDS: Dict[str, str] = {
+    cls.__name__: cls.model_fields["command"].default for cls in get_args(AnyCommand)
+}
+
+
+def _simplify(schema: dict) -> dict:
+    """Reduces a pydantic JSON schema to the subset function-calling APIs accept."""
+    if "anyOf" in schema:
+        # Optional[X] -> X; optionality is expressed by leaving it out of `required`
+        options = [s for s in schema["anyOf"] if s.get("type") != "null"]
+        schema = {**schema, **options[0]}
+        schema.pop("anyOf")
+    out = {k: v for k, v in schema.items() if k not in ("title", "default", "anyOf")}
+    if "properties" in out:
+        out["properties"] = {name: _simplify(prop) for name, prop in out["properties"].items()}
+    if "items" in out:
+        out["items"] = _simplify(out["items"])
+    return out
+
+
+def tool_declaration(cls: Type[BaseModel]) -> dict:
+    """OpenAI-style function declaration for a command class; `command` is implied by the name."""
+    schema = cls.model_json_schema()
+    properties = {
+        name: _simplify(prop)
+        for name, prop in schema.get("properties", {}).items()
+        if name != "command"
+    }
+    required = [name for name in schema.get("required", []) if name != "command"]
+    return {
+        "type": "function",
+        "function": {
+            "name": cls.__name__,
+            "description": " ".join((cls.__doc__ or "").split()),
+            "parameters": {"type": "object", "properties": properties, "required": required},
+        },
+    }
+
+
+@lru_cache(maxsize=None)
+def _declarations(edit_only: bool = False) -> tuple:
+    return tuple(
+        tool_declaration(cls) for cls in get_args(AnyCommand)
+        if getattr(cls, "llm_tool", True) and (not edit_only or getattr(cls, "edit_tool", True))
+    )
+
+
+def tool_declarations(edit_only: bool = False) -> List[dict]:
+    """Tool declarations for every command the model may call, built once per process.
+
+    edit_only gives the reduced set used for small edits on the fast tier.
+    """
+    return list(_declarations(edit_only))
+
+
+@lru_cache(maxsize=None)
+def tool_schema(edit_only: bool = False) -> str:
+    """The declarations serialized once; stable across processes, used in cache keys."""
+    return json.dumps(_declarations(edit_only), sort_keys=True, separators=(",", ":"))
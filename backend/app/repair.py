@@ -0,0 +1,109 @@
+# backend/app/repair.py
+import re
+from typing import Any, Dict, List, Literal, Optional, Tuple, Type, Union, get_args, get_origin
+
+from pydantic import BaseModel
+
+from .models import AnyCommand
+from .registry import TOOL_COMMANDS
+
+# command literal -> command class
+COMMAND_CLASSES: Dict[str, Type[BaseModel]] = {
+    cls.model_fields["command"].default: cls for cls in get_args(AnyCommand)
+}
+
+
+def _squash(name: str) -> str:
+    return re.sub(r"[^a-z]", "", name.casefold())
+
+
+# Spellings models use for tool names: AddText, add_text, ADD_TEXT, addTextCommand...
+_TOOL_ALIASES: Dict[str, str] = {}
+for _name, _command in TOOL_COMMANDS.items():
+    for _alias in (_name, _name.removesuffix("Command"), _command):
+        _TOOL_ALIASES[_squash(_alias)] = _name
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def resolve_tool_name(name: str) -> Optional[str]:
+    """The registered tool a possibly misspelled tool name refers to, if unambiguous."""
+    if name in TOOL_COMMANDS:
+        return name
+    return _TOOL_ALIASES.get(_squash(name))
+
+
+def _to_number(value: Any) -> Optional[float]:
+    """'500' / '$1,200' / '50%' / '2.5k' -> float; None if there is no single number in it."""
+    text = str(value).strip().replace(",", "").replace("_", "")
+    scale = 1000.0 if text.casefold().endswith("k") else 1.0
+    found = _NUMBER.findall(text)
+    if len(found) != 1:
+        return None
+    return float(found[0]) * scale
+
+
+def _field_kind(annotation) -> Tuple[str, tuple]:
+    # Optional[X] -> X
+    if get_origin(annotation) is Union:
+        options = [a for a in get_args(annotation) if a is not type(None)]
+        annotation = options[0] if len(options) == 1 else annotation
+    if get_origin(annotation) is Literal:
+        return "literal", get_args(annotation)
+    if annotation is float or annotation is int:
+        return "number", ()
+    if annotation is str:
+        return "str", ()
+    return "other", ()
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", text.casefold()).strip("_")[:40] or "element"
+
+
+def repair_call(name: str, args: dict) -> Tuple[str, dict, List[str]]:
+    """Fixes what can be fixed locally in a tool call that failed validation.
+
+    Returns the (possibly renamed) tool, the repaired arguments and a note per fix.
+    Whatever is still wrong is left for validation to report.
+    """
+    fixes = []
+    tool = resolve_tool_name(name) if name else None
+    if tool is None and isinstance(args.get("command"), str):
+        tool = resolve_tool_name(args["command"])
+    if tool is None:
+        return name, args, fixes
+    if tool != name:
+        fixes.append(f"tool {name!r} -> {tool!r}")
+    cls = COMMAND_CLASSES[TOOL_COMMANDS[tool]]
+    args = {**args, "command": TOOL_COMMANDS[tool]}
+
+    for field, info in cls.model_fields.items():
+        if field == "command":
+            continue
+        kind, allowed = _field_kind(info.annotation)
+        value = args.get(field)
+        if value is None:
+            continue
+        if kind == "number" and not isinstance(value, (int, float)):
+            number = _to_number(value)
+            if number is not None:
+                args[field] = number
+                fixes.append(f"{field} {value!r} -> {number:g}")
+        elif kind == "str" and isinstance(value, (int, float)):
+            args[field] = str(value)
+            fixes.append(f"{field} {value!r} -> string")
+        elif kind == "literal" and value not in allowed:
+            folded = next((a for a in allowed if isinstance(value, str) and a == value.casefold()), None)
+            if folded is None and not info.is_required():
+                folded = info.default
+            if folded is not None:
+                args[field] = folded
+                fixes.append(f"{field} {value!r} -> {folded!r}")
+
+    # Missing ids can be derived from the element's own text
+    for id_field, source in (("button_id", "text"), ("slider_id", "label")):
+        if id_field in cls.model_fields and not args.get(id_field) and isinstance(args.get(source), str):
+            args[id_field] = _slug(args[source])
+            fixes.append(f"{id_field} derived from {source}")
+    return tool, args, fixes
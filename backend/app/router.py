@@ -0,0 +1,313 @@
+# backend/app/router.py
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, List, Optional
+
+from .metrics import LLM_HEDGES, LLM_ROUTE_ERRORS, LLM_ROUTE_SECONDS
+from .registry import tool_declarations
+
+# Comma-separated provider:model routes in order of preference, e.g.
+# "gemini:gemini-2.5-flash,gemini:gemini-1.5-flash,openai:gpt-4o-mini". Empty = no router.
+LLM_ROUTES = os.getenv("LLM_ROUTES", "")
+# Fire a second request on the next route when the first is slower than its recent p95
+LLM_HEDGE = os.getenv("LLM_HEDGE", "1") == "1"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+# Hedge delay until a route has enough samples for a percentile, and the floor after that
+LLM_HEDGE_DEFAULT_SECONDS = float(os.getenv("LLM_HEDGE_DEFAULT_SECONDS", "3"))
+LLM_HEDGE_MIN_SECONDS = float(os.getenv("LLM_HEDGE_MIN_SECONDS", "0.25"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+PROVIDERS = ("gemini", "openai", "fake")
+
+# Substrings of provider errors that mean quota/rate limiting; these open the breaker at once
+_QUOTA_MARKERS = ("429", "quota", "resourceexhausted", "resource_exhausted", "rate limit")
+
+
+class RouterError(Exception):
+    """No route could answer: every one failed or has its breaker open."""
+
+
+def create_chat_model(provider: str, model: str, tools: Optional[List[dict]] = None):
+    """Builds a langchain chat model with the UI tools bound; provider SDKs are imported here."""
+    tools = tools if tools is not None else tool_declarations()
+    if provider == "gemini":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        return ChatGoogleGenerativeAI(
+            model=model, google_api_key=os.getenv("GEMINI_API_KEY"),
+        ).bind(tools=tools)
+    if provider == "openai":
+        try:
+            from langchain_openai import ChatOpenAI
+        except ImportError:
+            raise RuntimeError("openai routes require the langchain-openai package") from None
+        return ChatOpenAI(model=model, api_key=os.getenv("OPENAI_API_KEY")).bind(tools=tools)
+    if provider == "fake":
+        from .fake_llm import FakeChatModel
+
+        return FakeChatModel.from_env()
+    raise ValueError(f"Unknown LLM provider: {provider}")
+
+
+def parse_routes(spec: str) -> List[tuple]:
+    """"gemini:gemini-1.5-flash,openai:gpt-4o-mini" -> [("gemini", "gemini-1.5-flash"), ...]"""
+    routes = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        provider, sep, model = item.partition(":")
+        if not sep or provider not in PROVIDERS:
+            raise ValueError(f"Invalid LLM route: {item!r}")
+        routes.append((provider, model))
+    return routes
+
+
+class LatencyTracker:
+    """Recent latencies of one route, for percentile-based hedging."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples: deque = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    """Closed -> open after repeated failures (or one quota error) -> half-open after a cooldown.
+
+    While half-open a single trial request is let through; its outcome closes or
+    re-opens the breaker.
+    """
+
+    def __init__(self, failures: int = LLM_BREAKER_FAILURES, cooldown: float = LLM_BREAKER_COOLDOWN):
+        self.max_failures = failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self.trial)
+
+    def begin(self):
+        # Called when a request is actually sent; a half-open breaker lets only this one through
+        if self.state == "half_open":
+            self.trial = True
+
+    def abandon(self):
+        # The request was cancelled (e.g. a hedge that lost), so it proved nothing
+        self.trial = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def record_failure(self, quota: bool = False):
+        self.failures += 1
+        self.trial = False
+        if quota or self.failures >= self.max_failures or self.opened_at is not None:
+            self.opened_at = time.monotonic()
+
+
+class Route:
+    """One provider/model with its own breaker and latency history."""
+
+    def __init__(self, name: str, factory: Callable[[], object], breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.factory = factory
+        self.breaker = breaker or CircuitBreaker()
+        # kind ("invoke" = whole response, "stream" = first chunk) -> tracker
+        self.latency = {"invoke": LatencyTracker(), "stream": LatencyTracker()}
+        self._model = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = self.factory()
+        return self._model
+
+    def hedge_delay(self, kind: str, percentile: float = LLM_HEDGE_PERCENTILE) -> float:
+        p = self.latency[kind].percentile(percentile)
+        return LLM_HEDGE_DEFAULT_SECONDS if p is None else max(p, LLM_HEDGE_MIN_SECONDS)
+
+    def record(self, kind: str, seconds: float):
+        self.breaker.record_success()
+        self.latency[kind].add(seconds)
+        LLM_ROUTE_SECONDS.observe(seconds, route=self.name, kind=kind)
+
+    def fail(self, error: Exception):
+        quota = any(marker in str(error).casefold() for marker in _QUOTA_MARKERS)
+        self.breaker.record_failure(quota=quota)
+        LLM_ROUTE_ERRORS.inc(route=self.name, reason="quota" if quota else "error")
+
+
+class LLMRouter:
+    """Chat-model facade over several routes, used by LLMClient in place of a single model.
+
+    Requests go to the first route whose breaker allows it. If it is slower than
+    that route's recent p95, one hedge request goes to the next route and the
+    first answer wins; the loser is cancelled. Failures fail over down the list.
+    """
+
+    def __init__(self, routes: List[Route], hedge: bool = LLM_HEDGE, max_hedges: int = 1):
+        if not routes:
+            raise ValueError("LLMRouter needs at least one route")
+        self.routes = routes
+        self.hedge = hedge
+        self.max_hedges = max_hedges
+
+    @classmethod
+    def from_spec(cls, spec: str = LLM_ROUTES, tools: Optional[List[dict]] = None) -> "LLMRouter":
+        return cls([
+            Route(f"{provider}:{model}", lambda p=provider, m=model: create_chat_model(p, m, tools))
+            for provider, model in parse_routes(spec)
+        ])
+
+    @property
+    def name(self) -> str:
+        return ",".join(route.name for route in self.routes)
+
+    def warm(self):
+        for route in self.routes:
+            route.model
+
+    def _candidates(self) -> List[Route]:
+        candidates = [route for route in self.routes if route.breaker.allow()]
+        if not candidates:
+            raise RouterError("every LLM route has its circuit breaker open")
+        return candidates
+
+    def invoke(self, messages: list, **kwargs):
+        """Blocking path: fails over in order, without hedging."""
+        errors = []
+        for route in self._candidates():
+            route.breaker.begin()
+            start = time.perf_counter()
+            try:
+                result = route.model.invoke(messages, **kwargs)
+            except Exception as e:
+                route.fail(e)
+                errors.append(f"{route.name}: {e}")
+                continue
+            route.record("invoke", time.perf_counter() - start)
+            return result
+        raise RouterError("; ".join(errors))
+
+    async def ainvoke(self, messages: list, **kwargs):
+        return await self._race("invoke", lambda model: model.ainvoke(messages, **kwargs))
+
+    async def astream(self, messages: list, **kwargs):
+        """Streams from whichever route produces the first chunk first; hedges on time to first chunk."""
+
+        async def first_chunk(model):
+            stream = model.astream(messages, **kwargs).__aiter__()
+            try:
+                return stream, await stream.__anext__()
+            except BaseException:
+                await stream.aclose()
+                raise
+
+        async def discard(result):
+            await result[0].aclose()
+
+        stream, chunk = await self._race("stream", first_chunk, discard)
+        try:
+            yield chunk
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    async def _race(
+        self,
+        kind: str,
+        call: Callable[[object], Awaitable],
+        discard: Optional[Callable[[object], Awaitable]] = None,
+    ):
+        candidates = self._candidates()
+        pending = {}
+        errors = []
+        hedges = 0
+        # Routes are launched in order; count how many have been started so far
+        started = [0]
+
+        def launch_next():
+            route = candidates[started[0]]
+            started[0] += 1
+            pending[asyncio.ensure_future(self._timed(route, kind, call))] = route
+            return route
+
+        launch_next()
+        winner = None
+        try:
+            while pending:
+                lead = next(iter(pending.values()))
+                can_hedge = (
+                    self.hedge and hedges < self.max_hedges
+                    and started[0] < len(candidates) and len(pending) == 1
+                )
+                done, _ = await asyncio.wait(
+                    pending, timeout=lead.hedge_delay(kind) if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    hedges += 1
+                    LLM_HEDGES.inc(route=launch_next().name)
+                    continue
+                for task in done:
+                    route = pending.pop(task)
+                    if task.exception() is not None:
+                        errors.append(f"{route.name}: {task.exception()}")
+                    elif winner is None:
+                        winner = task.result()
+                    elif discard is not None:
+                        await discard(task.result())
+                if winner is not None:
+                    return winner
+                if not pending and started[0] < len(candidates):
+                    launch_next()
+        finally:
+            for task in pending:
+                task.cancel()
+            for task in pending:
+                try:
+                    result = await task
+                except BaseException:
+                    continue
+                if discard is not None:
+                    await discard(result)
+        raise RouterError("; ".join(errors))
+
+    @staticmethod
+    async def _timed(route: Route, kind: str, call):
+        route.breaker.begin()
+        start = time.perf_counter()
+        try:
+            result = await call(route.model)
+        except asyncio.CancelledError:
+            # A hedge that lost is not the route's fault
+            route.breaker.abandon()
+            raise
+        except Exception as e:
+            route.fail(e)
+            raise
+        route.record(kind, time.perf_counter() - start)
+        return result
@@ -0,0 +1,234 @@
+# backend/app/semantic_cache.py
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from pydantic import ValidationError
+
+from .models import LLMResponsePacket
+from .parser import COMMAND_ADAPTER
+
+# Reuse the UI of an earlier first turn whose request was worded almost the same,
+# e.g. "plan a trip to Tokyo" -> "plan a trip to Kyoto", without calling the model.
+# Off by default: a reused layout is only as right as the word and number swaps
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "0") == "1"
+# Minimum cosine similarity between the two requests
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.6"))
+# Words that may differ (and are swapped into the reused UI); more than this is a different request
+SEMANTIC_CACHE_MAX_SUBSTITUTIONS = int(os.getenv("SEMANTIC_CACHE_MAX_SUBSTITUTIONS", "2"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "512"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "86400"))
+
+STOPWORDS = frozenset("""
+    a an the to for of in on at by with and or me my i we our you your it this that is are be
+    please can could would like want need some any just let lets help
+""".split())
+
+_TOKEN = re.compile(r"[a-z]+|\d+(?:\.\d+)?")
+# Command fields never rewritten when a layout is re-parameterized
+_FIXED_FIELDS = ("command", "container_id")
+
+
+class Terms(NamedTuple):
+    words: List[Tuple[str, str]]  # (stem, word as written), stopwords removed
+    numbers: List[str]
+
+
+def _stem(word: str) -> str:
+    # Plural and possessive endings only; enough for "trips"/"trip", "sliders"/"slider"
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+
+def extract_terms(text: str) -> Terms:
+    words, numbers = [], []
+    for token in _TOKEN.findall(text.casefold().replace(",", "")):
+        if token[0].isdigit():
+            numbers.append(token)
+        elif token not in STOPWORDS:
+            words.append((_stem(token), token))
+    return Terms(words, numbers)
+
+
+def vectorize(terms: Terms) -> Dict[str, float]:
+    """L2-normalized bag of stems and stem bigrams; numbers are left to re-parameterization."""
+    stems = [stem for stem, _ in terms.words]
+    counts: Dict[str, float] = defaultdict(float)
+    for stem in stems:
+        counts[stem] += 1.0
+    for a, b in zip(stems, stems[1:]):
+        counts[f"{a} {b}"] += 0.5
+    norm = math.sqrt(sum(w * w for w in counts.values())) or 1.0
+    return {feature: w / norm for feature, w in counts.items()}
+
+
+def _same_case(template: str, word: str) -> str:
+    if template.isupper() and len(template) > 1:
+        return word.upper()
+    if template[:1].isupper():
+        return word[:1].upper() + word[1:]
+    return word
+
+
+def _number(text: str):
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+class _Entry:
+    __slots__ = ("prompt", "terms", "vector", "packet", "stored_at")
+
+    def __init__(self, prompt: str, terms: Terms, vector: Dict[str, float], packet: LLMResponsePacket):
+        self.prompt = prompt
+        self.terms = terms
+        self.vector = vector
+        self.packet = packet
+        self.stored_at = time.monotonic()
+
+
+class SemanticLayoutCache:
+    """Bounded similarity index over (first request, generated UI) pairs.
+
+    Requests are vectorized locally (stems and bigrams, no embedding service)
+    and found through an inverted index. A close enough match is reused with the
+    differing words and numbers of the new request swapped into its commands.
+    Least recently used entries are evicted beyond max_entries.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        max_substitutions: int = SEMANTIC_CACHE_MAX_SUBSTITUTIONS,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS,
+    ):
+        self.threshold = threshold
+        self.max_substitutions = max_substitutions
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._index: Dict[str, Set[int]] = defaultdict(set)
+        self._ids = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self)}
+
+    def get(self, prompt: str) -> Optional[LLMResponsePacket]:
+        """The stored UI adapted to prompt, or None if nothing stored is close enough."""
+        terms = extract_terms(prompt)
+        vector = vectorize(terms)
+        with self._lock:
+            for score, entry_id in self._candidates(vector):
+                if score < self.threshold:
+                    break
+                entry = self._entries[entry_id]
+                if time.monotonic() - entry.stored_at > self.ttl_seconds:
+                    self._remove(entry_id)
+                    continue
+                packet = self._adapt(entry, terms)
+                if packet is not None:
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return packet
+            self.misses += 1
+            return None
+
+    def set(self, prompt: str, packet: LLMResponsePacket):
+        terms = extract_terms(prompt)
+        if not terms.words or not packet.ui_commands:
+            return
+        vector = vectorize(terms)
+        with self._lock:
+            # A request worded the same way replaces the older layout
+            for score, entry_id in self._candidates(vector):
+                if score < 0.999:
+                    break
+                self._remove(entry_id)
+            self._ids += 1
+            self._entries[self._ids] = _Entry(prompt, terms, vector, packet)
+            for feature in vector:
+                self._index[feature].add(self._ids)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _candidates(self, vector: Dict[str, float]) -> List[Tuple[float, int]]:
+        # Only entries sharing a feature can score above zero
+        scores: Dict[int, float] = defaultdict(float)
+        for feature, weight in vector.items():
+            for entry_id in self._index.get(feature, ()):
+                scores[entry_id] += weight * self._entries[entry_id].vector[feature]
+        return sorted(((s, i) for i, s in scores.items()), reverse=True)
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        for feature in entry.vector:
+            ids = self._index[feature]
+            ids.discard(entry_id)
+            if not ids:
+                del self._index[feature]
+
+    def _adapt(self, entry: _Entry, terms: Terms) -> Optional[LLMResponsePacket]:
+        """Swaps the new request's words and numbers into the stored UI, if they pair up."""
+        old_stems = {stem for stem, _ in entry.terms.words}
+        new_stems = {stem for stem, _ in terms.words}
+        removed = [word for stem, word in entry.terms.words if stem not in new_stems]
+        added = [word for stem, word in terms.words if stem not in old_stems]
+        if len(removed) != len(added) or len(removed) > self.max_substitutions:
+            return None
+        if len(entry.terms.numbers) != len(terms.numbers):
+            return None
+        words = dict(zip(removed, added))
+        numbers = {old: new for old, new in zip(entry.terms.numbers, terms.numbers) if old != new}
+        if not words and not numbers:
+            return entry.packet
+
+        def rewrite(text: str) -> str:
+            for old, new in words.items():
+                text = re.sub(
+                    rf"\b{re.escape(old)}\b", lambda m, new=new: _same_case(m.group(0), new),
+                    text, flags=re.IGNORECASE,
+                )
+            for old, new in numbers.items():
+                text = re.sub(rf"(?<![\d.]){re.escape(old)}(?![\d.])", new, text)
+            return text
+
+        values = {_number(old): _number(new) for old, new in numbers.items()}
+        # A number that is not a value in the stored UI may count its elements ("a form
+        # with 3 sliders"); swapping it would only change the text, not the layout
+        fields = {
+            value for command in entry.packet.ui_commands for value in command.model_dump().values()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        }
+        if any(value not in fields for value in values):
+            return None
+        commands = []
+        for command in entry.packet.ui_commands:
+            data = command.model_dump()
+            for field, value in data.items():
+                if field in _FIXED_FIELDS or field.endswith("_id"):
+                    continue
+                if isinstance(value, str):
+                    data[field] = rewrite(value)
+                elif isinstance(value, (int, float)) and not isinstance(value, bool) and value in values:
+                    data[field] = values[value]
+            try:
+                commands.append(COMMAND_ADAPTER.validate_python(data))
+            except ValidationError:
+                return None
+        return LLMResponsePacket(
+            chat_message=rewrite(entry.packet.chat_message) if entry.packet.chat_message else None,
+            ui_commands=commands,
+        )
+
+
+def create_semantic_cache(enabled: bool = SEMANTIC_CACHE) -> Optional[SemanticLayoutCache]:
+    return SemanticLayoutCache() if enabled else None
@@ -0,0 +1,238 @@
+# backend/app/session.py
+import asyncio
+import os
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from .context import estimate_tokens
+from .models import AnyCommand
+from .reasoning import REASONING_MODE
+from .session_store import SessionStore, create_session_store
+from .ui_state import UIElement, UITree
+from .wire import JSONWire
+
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+# Rough per-session memory cap, measured in characters of stored history.
+SESSION_MAX_HISTORY_CHARS = int(os.getenv("SESSION_MAX_HISTORY_CHARS", "20000"))
+SESSION_ALLOW_RESUME = os.getenv("SESSION_ALLOW_RESUME", "1") == "1"
+
+
+class Session:
+    """Conversation history and rendered UI state for a single client."""
+
+    def __init__(self, session_id: str, max_history_chars: int = SESSION_MAX_HISTORY_CHARS):
+        self.session_id = session_id
+        self.max_history_chars = max_history_chars
+        self.history: List[dict] = []
+        self.ui = UITree()
+        # element_id -> value the user set locally since the last model turn
+        self.ui_changes: Dict[str, Any] = {}
+        self.history_chars = 0
+        self.history_tokens = 0
+        # Rolling summary of turns compacted out of history by the ContextManager
+        self.summary = ""
+        self.connected = False
+        # Connection preference: send the turn as streamed packets instead of one packet
+        self.stream = False
+        # Connection preference: negotiated wire format for packets sent to the client
+        self.wire = JSONWire()
+        # Connection preference: how much the model reasons before acting (see reasoning.py)
+        self.reasoning = REASONING_MODE
+        self.last_active = time.monotonic()
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+    def add_message(self, role: str, content: str, reasoning_tokens: int = 0):
+        tokens = estimate_tokens(content)
+        msg = {"role": role, "content": content, "tokens": tokens}
+        if reasoning_tokens:
+            # Stripped from the reply; each later turn that sends it saves this many input tokens
+            msg["reasoning_tokens"] = reasoning_tokens
+        self.history.append(msg)
+        self.history_chars += len(content)
+        self.history_tokens += tokens
+        # Drop the oldest turns once over the cap, but always keep the latest message
+        while self.history_chars > self.max_history_chars and len(self.history) > 1:
+            self.pop_oldest(1)
+
+    def pop_oldest(self, count: int) -> List[dict]:
+        dropped, self.history = self.history[:count], self.history[count:]
+        for msg in dropped:
+            self.history_chars -= len(msg["content"])
+            self.history_tokens -= msg["tokens"]
+        return dropped
+
+    def pop_latest(self, role: str) -> Optional[dict]:
+        """Removes the newest message if it has the given role (e.g. a superseded user turn)."""
+        if not self.history or self.history[-1]["role"] != role:
+            return None
+        msg = self.history.pop()
+        self.history_chars -= len(msg["content"])
+        self.history_tokens -= msg["tokens"]
+        return msg
+
+    @property
+    def ui_state(self) -> List[UIElement]:
+        """The elements currently on screen, in render order."""
+        return self.ui.elements()
+
+    def apply_commands(self, commands: List[AnyCommand]) -> List[AnyCommand]:
+        """Applies a turn's UI commands and returns the patch to send to the client."""
+        return self.ui.patch(commands)
+
+    def to_state(self) -> dict:
+        """JSON-safe snapshot of what must survive a move to another worker."""
+        return {
+            "history": [
+                {k: m[k] for k in ("role", "content", "tokens", "reasoning_tokens") if k in m}
+                for m in self.history
+            ],
+            "summary": self.summary,
+            "ui": self.ui.to_state(),
+            "ui_changes": self.ui_changes,
+        }
+
+    @classmethod
+    def from_state(cls, session_id: str, state: dict, max_history_chars: int = SESSION_MAX_HISTORY_CHARS) -> "Session":
+        session = cls(session_id, max_history_chars)
+        session.history = [dict(m) for m in state["history"]]
+        session.history_chars = sum(len(m["content"]) for m in session.history)
+        session.history_tokens = sum(m["tokens"] for m in session.history)
+        session.summary = state["summary"]
+        session.ui = UITree.from_state(state["ui"])
+        session.ui_changes = state["ui_changes"]
+        return session
+
+
+class SessionManager:
+    """Keeps sessions keyed by token with LRU and idle-TTL eviction.
+
+    Sessions in memory are this process's working copies. With a shared store
+    they are written back after every turn and reloaded when a client
+    reconnects, so any worker can pick a conversation up.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = SESSION_MAX_SESSIONS,
+        ttl_seconds: float = SESSION_TTL_SECONDS,
+        max_history_chars: int = SESSION_MAX_HISTORY_CHARS,
+        allow_resume: bool = SESSION_ALLOW_RESUME,
+        store: Optional[SessionStore] = None,
+        log=None,
+    ):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_history_chars = max_history_chars
+        self.allow_resume = allow_resume
+        self.store = store if store is not None else create_session_store()
+        # Optional ConversationLog to rebuild sessions this process no longer holds, e.g. after a restart
+        self.log = log
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    async def get(self, session_id: str) -> Optional[Session]:
+        session = self._sessions.get(session_id)
+        if self.store.shared and (session is None or not session.connected):
+            # Another worker may have served this session since we last saw it
+            session = await self._load(session_id)
+        if session is None and self.log is not None and session_id in self.log:
+            session = await self._restore(session_id)
+        if session is None:
+            return None
+        if time.monotonic() - session.last_active > self.ttl_seconds and not session.connected:
+            self._forget(session_id)
+            return None
+        self._sessions.move_to_end(session_id)
+        return session
+
+    async def open(self, session_id: Optional[str] = None) -> Session:
+        """Returns the session to use for a new connection, resuming it if allowed.
+
+        A session still held by a live connection is not shared: the second
+        client gets a fresh session, so two sockets never drive one conversation.
+        """
+        self.evict_expired()
+        session = await self.get(session_id) if (session_id and self.allow_resume) else None
+        if session is not None and session.connected:
+            print(f"Session {session_id} is still connected; starting a new session instead")
+            session = None
+        if session is None:
+            session = Session(secrets.token_urlsafe(16), self.max_history_chars)
+            self._sessions[session.session_id] = session
+            await self._store(self.store.save, session.session_id, session.to_state())
+        session.connected = True
+        session.touch()
+        self._evict_overflow()
+        return session
+
+    async def close(self, session: Session, keep: bool = True):
+        """Marks a session disconnected; it is kept for resume until its TTL runs out.
+
+        keep=False ends the session now, e.g. once it reached its maximum lifetime.
+        """
+        session.connected = False
+        session.touch()
+        if not keep or not self.allow_resume:
+            self._sessions.pop(session.session_id, None)
+            await self._store(self.store.delete, session.session_id)
+            if self.log is not None:
+                self.log.drop(session.session_id)
+
+    async def save(self, session: Session):
+        """Writes the session back to a shared store, off the event loop."""
+        if self.store.shared:
+            await asyncio.to_thread(self.store.save, session.session_id, session.to_state())
+
+    async def _store(self, call, *args):
+        # Shared stores do disk or network I/O; the in-memory one is cheap enough to call inline
+        if self.store.shared:
+            return await asyncio.to_thread(call, *args)
+        return call(*args)
+
+    async def _load(self, session_id: str) -> Optional[Session]:
+        self._sessions.pop(session_id, None)
+        state = await self._store(self.store.load, session_id)
+        if state is None:
+            return None
+        session = Session.from_state(session_id, state, self.max_history_chars)
+        self._sessions[session_id] = session
+        return session
+
+    async def _restore(self, session_id: str) -> Optional[Session]:
+        # Waits for the log writer and reads segments; neither may stall the event loop
+        session = await asyncio.to_thread(self.log.restore, session_id, self.max_history_chars)
+        if session is not None:
+            print(f"Restored session {session_id} from the conversation log")
+            self._sessions[session_id] = session
+        return session
+
+    def evict_expired(self):
+        now = time.monotonic()
+        expired = [
+            sid for sid, s in self._sessions.items()
+            if not s.connected and now - s.last_active > self.ttl_seconds
+        ]
+        for sid in expired:
+            self._forget(sid)
+
+    def _evict_overflow(self):
+        # Evict least recently used idle sessions first; live connections are never dropped
+        if len(self._sessions) <= self.max_sessions:
+            return
+        for sid in [sid for sid, s in self._sessions.items() if not s.connected]:
+            if len(self._sessions) <= self.max_sessions:
+                break
+            self._forget(sid)
+
+    def _forget(self, session_id: str):
+        # An evicted session is over; the log must not bring it back on the next connect
+        self._sessions.pop(session_id, None)
+        if self.log is not None:
+            self.log.drop(session_id)
@@ -0,0 +1,126 @@
+# backend/app/session_store.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")  # memory | sqlite | redis
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", "sessions.sqlite3")
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0")
+SESSION_STORE_TTL_SECONDS = float(os.getenv("SESSION_STORE_TTL_SECONDS", os.getenv("SESSION_TTL_SECONDS", "1800")))
+
+
+class SessionStore:
+    """Where session state lives between connections.
+
+    State is the plain dict produced by Session.to_state(). A shared store is
+    visible to every worker process, so a reconnect may land on any of them.
+    """
+
+    shared = False
+
+    def load(self, session_id: str) -> Optional[dict]:
+        return None
+
+    def save(self, session_id: str, state: dict):
+        pass
+
+    def delete(self, session_id: str):
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    """In-process only: sessions are the ones the SessionManager holds in memory."""
+
+
+class SQLiteSessionStore(SessionStore):
+    """On-disk store shared by every worker on the same host."""
+
+    shared = True
+
+    def __init__(self, path: str = SESSION_STORE_PATH, ttl_seconds: float = SESSION_STORE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " session_id TEXT PRIMARY KEY, updated_at REAL NOT NULL, state TEXT NOT NULL)"
+            )
+
+    def load(self, session_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT updated_at, state FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None or time.time() - row[0] > self.ttl_seconds:
+            return None
+        return json.loads(row[1])
+
+    def save(self, session_id, state):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, updated_at, state) VALUES (?, ?, ?)",
+                (session_id, now, json.dumps(state, separators=(",", ":"))),
+            )
+            self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (now - self.ttl_seconds,))
+
+    def delete(self, session_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+
+class RedisSessionStore(SessionStore):
+    """Store on a Redis-protocol server, shared by workers on any node.
+
+    client only needs get/set(ex=)/delete, so tests can pass a local stand-in.
+    """
+
+    shared = True
+
+    def __init__(
+        self,
+        client=None,
+        url: str = SESSION_REDIS_URL,
+        ttl_seconds: float = SESSION_STORE_TTL_SECONDS,
+        prefix: str = "session:",
+    ):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("SESSION_STORE=redis requires the redis package") from None
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    def load(self, session_id):
+        raw = self.client.get(self.prefix + session_id)
+        return json.loads(raw) if raw is not None else None
+
+    def save(self, session_id, state):
+        # The server expires idle sessions on its own
+        self.client.set(
+            self.prefix + session_id,
+            json.dumps(state, separators=(",", ":")),
+            ex=max(1, int(self.ttl_seconds)),
+        )
+
+    def delete(self, session_id):
+        self.client.delete(self.prefix + session_id)
+
+
+def create_session_store(backend: str = SESSION_STORE) -> SessionStore:
+    """Builds the store selected by SESSION_STORE."""
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    if backend == "redis":
+        return RedisSessionStore()
+    raise ValueError(f"Unknown SESSION_STORE: {backend}")
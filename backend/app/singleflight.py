@@ -0,0 +1,97 @@
+# backend/app/singleflight.py
+import asyncio
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict
+
+from .metrics import LLM_SHARED_REQUESTS
+
+
+class LeaderGone(Exception):
+    """The streaming caller that owned an in-flight request went away before it finished."""
+
+
+class _Flight:
+    def __init__(self, key: str, future: asyncio.Future):
+        self.key = key
+        self.future = future
+        self.waiters = 0
+        # Only calls started by do() are owned by the flight and may be cancelled by it
+        self.owned = False
+
+
+class SingleFlight:
+    """Lets concurrent callers with the same key share one in-flight request.
+
+    A call started by do() runs as its own task: it keeps going while anyone is
+    still waiting, and is cancelled once the last waiter is cancelled. A streaming
+    caller can lead() a key instead; if it goes away, waiters get LeaderGone and
+    issue the request themselves.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        while True:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._start(key, asyncio.ensure_future(fn()))
+                flight.owned = True
+            else:
+                LLM_SHARED_REQUESTS.inc()
+            try:
+                return await self._wait(flight)
+            except LeaderGone:
+                continue
+
+    async def join(self, key: str):
+        """Result of the in-flight request for key, or None if there is none (or its leader left)."""
+        flight = self._flights.get(key)
+        if flight is None:
+            return None
+        LLM_SHARED_REQUESTS.inc()
+        try:
+            return await self._wait(flight)
+        except LeaderGone:
+            return None
+
+    @contextmanager
+    def lead(self, key: str):
+        """Registers the caller as the one producing key's result; yields a function to publish it."""
+        flight = self._start(key, asyncio.get_running_loop().create_future())
+
+        def publish(result):
+            if not flight.future.done():
+                flight.future.set_result(result)
+
+        try:
+            yield publish
+        finally:
+            if not flight.future.done():
+                flight.future.set_exception(LeaderGone())
+                # Nobody may be waiting; do not log "exception was never retrieved"
+                flight.future.exception()
+
+    def _start(self, key: str, future: asyncio.Future) -> _Flight:
+        flight = _Flight(key, future)
+        self._flights[key] = flight
+        future.add_done_callback(lambda _: self._forget(flight))
+        return flight
+
+    def _forget(self, flight: _Flight):
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+
+    async def _wait(self, flight: _Flight):
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.future)
+        finally:
+            flight.waiters -= 1
+            if flight.owned and flight.waiters == 0 and not flight.future.done():
+                # Last interested caller is gone; later callers must start afresh
+                self._forget(flight)
+                flight.future.cancel()
@@ -0,0 +1,73 @@
+# backend/app/tiering.py
+import os
+import re
+from typing import List, NamedTuple
+
+from .session import Session
+
+# Turns scoring at or below the threshold go to the fast tier (LLM_FAST_MODEL)
+LLM_TIER_THRESHOLD = int(os.getenv("LLM_TIER_THRESHOLD", "0"))
+
+# Words that suggest a small change to what is already on screen
+EDIT_WORDS = frozenset("""
+    make change rename bigger smaller larger shorter longer move remove delete hide
+    set increase decrease raise lower swap update edit replace reword bold
+""".split())
+# Words that suggest building or reasoning about something new
+PLAN_WORDS = frozenset("""
+    plan build create design compare help organize schedule recommend suggest analyze
+    why how explain steps workflow dashboard form trip itinerary
+""".split())
+
+_WORD = re.compile(r"[a-z0-9_]+")
+
+
+class TurnClass(NamedTuple):
+    tier: str  # "fast" | "strong"
+    score: int
+    reasons: List[str]
+
+
+class TurnClassifier:
+    """Cheap local estimate of how much reasoning a turn needs.
+
+    Scores the message, the conversation length and the pending UI changes;
+    small edits of an existing UI score low and go to the fast tier.
+    """
+
+    def __init__(self, threshold: int = LLM_TIER_THRESHOLD):
+        self.threshold = threshold
+
+    def classify(self, content: str, session: Session, from_event: bool = False) -> TurnClass:
+        words = _WORD.findall(content.casefold())
+        score, reasons = 0, []
+
+        def add(points: int, reason: str):
+            nonlocal score
+            score += points
+            reasons.append(f"{reason}{points:+d}")
+
+        if not session.ui_state:
+            add(2, "empty_ui")
+        if len(words) > 25:
+            add(2, "long_message")
+        elif len(words) > 10:
+            add(1, "medium_message")
+        plan = sum(w in PLAN_WORDS for w in words)
+        if plan:
+            add(min(plan, 2), "plan_words")
+        edit = sum(w in EDIT_WORDS for w in words)
+        if edit:
+            add(-min(edit, 2), "edit_words")
+        ids = {el.get("element_id") for el in session.ui_state}
+        if ids.intersection(words):
+            add(-1, "names_element")
+        if from_event:
+            # A click usually moves the flow on to its next step
+            add(1, "button_click")
+        if len(session.ui_changes) > 2:
+            add(1, "many_changes")
+        if len(session.history) > 12:
+            add(1, "long_history")
+        tier = "fast" if score <= self.threshold else "strong"
+        return TurnClass(tier, score, reasons)
@@ -0,0 +1,139 @@
+# backend/app/turns.py
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Deque, Optional
+
+from fastapi import WebSocket
+
+from .models import TurnCancelledPacket, TurnRejectedPacket
+from .session import Session
+
+# What happens when a user message arrives while a turn is queued or in flight:
+#   latest   - cancel the turn in flight and forget it; only the newest message is answered
+#   coalesce - cancel the turn in flight but keep its message; the next turn answers all of them
+#   drop     - let the turn in flight finish; messages beyond the queue limit are rejected
+TURN_POLICY = os.getenv("TURN_POLICY", "latest")
+TURN_QUEUE_SIZE = int(os.getenv("TURN_QUEUE_SIZE", "8"))
+
+TURN_POLICIES = ("latest", "coalesce", "drop")
+
+
+def _is_turn(message: dict) -> bool:
+    # Button clicks are answered by the model, so they queue and cancel like user messages
+    if message.get("type") == "ui_event":
+        return message.get("event_type") == "button_click"
+    return message.get("type") == "user_message"
+
+
+def _event_slot(message: dict) -> Optional[tuple]:
+    # Value changes for the same element supersede each other while queued
+    if message.get("type") == "ui_event" and message.get("event_type") == "slider_change":
+        return message.get("container_id", "main_workspace"), message.get("element_id")
+    return None
+
+
+class TurnScheduler:
+    """Per-connection inbound queue with a single turn in flight at a time."""
+
+    def __init__(
+        self,
+        handler,
+        websocket: WebSocket,
+        session: Session,
+        policy: str = TURN_POLICY,
+        queue_size: int = TURN_QUEUE_SIZE,
+    ):
+        if policy not in TURN_POLICIES:
+            raise ValueError(f"Unknown TURN_POLICY: {policy}")
+        self.handler = handler
+        self.websocket = websocket
+        self.session = session
+        self.policy = policy
+        self.queue_size = queue_size
+        self.pending: Deque[dict] = deque()
+        self.wakeup = asyncio.Event()
+        self.current: Optional[asyncio.Task] = None
+        self.current_message: Optional[dict] = None
+        self.worker: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.worker = asyncio.create_task(self._run())
+
+    async def submit(self, message: dict):
+        """Queues an inbound message according to the policy; never blocks on the model."""
+        # Start of the turn's trace, so time spent queued shows up in the metrics
+        message.setdefault("received_at", time.perf_counter())
+        slot = _event_slot(message)
+        if slot is not None:
+            for i, queued in enumerate(self.pending):
+                if _event_slot(queued) == slot:
+                    self.pending[i] = message
+                    return
+        if _is_turn(message) and self.policy != "drop":
+            self.pending = deque(m for m in self.pending if not _is_turn(m) or self.policy == "coalesce")
+            if self.policy == "coalesce":
+                message = self._merge_queued(message)
+            if self.current is not None and _is_turn(self.current_message):
+                self.current.cancel()
+        if len(self.pending) >= self.queue_size:
+            if self.policy == "drop":
+                await self._send(TurnRejectedPacket(reason="queue_full"))
+                return
+            # The newest message wins; the client still learns that the oldest was not processed
+            self.pending.popleft()
+            await self._send(TurnRejectedPacket(reason="queue_full"))
+        self.pending.append(message)
+        self.wakeup.set()
+
+    def _merge_queued(self, message: dict) -> dict:
+        # Fold queued user messages into the new one so they become a single turn
+        if message.get("type") != "user_message":
+            return message
+        queued = [m for m in self.pending if m.get("type") == "user_message"]
+        if not queued:
+            return message
+        self.pending = deque(m for m in self.pending if m.get("type") != "user_message")
+        contents = [m.get("content", "") for m in queued] + [message.get("content", "")]
+        return {**message, "content": "\n".join(contents)}
+
+    async def _run(self):
+        while True:
+            while not self.pending:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+            message = self.pending.popleft()
+            self.current_message = message
+            self.current = asyncio.create_task(
+                self.handler.handle_message(self.websocket, self.session, message)
+            )
+            try:
+                await asyncio.wait({self.current})
+                if self.current.cancelled():
+                    if self.policy == "latest":
+                        self.session.pop_latest("user")
+                    await self._send(TurnCancelledPacket())
+                elif self.current.exception() is not None:
+                    # Same outcome as an error in the receive loop: report it and end the connection
+                    print(f"WebSocket error: {self.current.exception()}")
+                    await self.websocket.close(code=1011)
+                    return
+            finally:
+                self.current = None
+                self.current_message = None
+
+    async def _send(self, packet):
+        await self.session.wire.send(self.websocket, packet.model_dump())
+
+    async def close(self):
+        """Cancels the turn in flight and the worker; called when the socket goes away."""
+        for task in (self.current, self.worker):
+            if task is not None:
+                task.cancel()
+        for task in (self.current, self.worker):
+            if task is not None:
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
@@ -0,0 +1,349 @@
+# backend/app/ui_state.py
+import sys
+from collections.abc import Mapping
+from typing import Any, Dict, List, Optional, get_args
+
+from pydantic import ValidationError
+
+from .models import (
+    AnyCommand, MoveElementCommand, RemoveElementCommand, UpdateElementCommand,
+)
+from .parser import COMMAND_ADAPTER
+
+# Fields that identify an element rather than describe it; never part of a diff
+_IDENTITY_FIELDS = ("command", "container_id", "element_id")
+
+# Compact layout of every command class: a small integer code, the fields kept
+# positionally in UIElement.values, and the keys of its dict form (identity first)
+COMMAND_NAMES = tuple(cls.model_fields["command"].default for cls in get_args(AnyCommand))
+COMMAND_CODES = {name: code for code, name in enumerate(COMMAND_NAMES)}
+_VALUE_FIELDS = tuple(
+    tuple(k for k in cls.model_fields if k not in _IDENTITY_FIELDS) for cls in get_args(AnyCommand)
+)
+_KEYS = tuple(("container_id", "element_id", "command") + fields for fields in _VALUE_FIELDS)
+_POSITIONS = tuple({name: i for i, name in enumerate(fields)} for fields in _VALUE_FIELDS)
+
+# Short strings ("Next", "Budget ($)") and numbers recur across sessions; share one object
+_SHARED_STR_MAX = 40
+_SHARED_NUMBERS: Dict[float, float] = {}
+_SHARED_NUMBERS_MAX = 4096
+
+
+def _share(value):
+    if isinstance(value, str):
+        return sys.intern(value) if len(value) <= _SHARED_STR_MAX else value
+    if isinstance(value, float):
+        shared = _SHARED_NUMBERS.get(value)
+        if shared is not None:
+            return shared
+        if len(_SHARED_NUMBERS) < _SHARED_NUMBERS_MAX:
+            _SHARED_NUMBERS[value] = value
+    return value
+
+
+class UIElement(Mapping):
+    """One element on screen, stored compactly for the per-session UI tree.
+
+    Pydantic models are only used to validate commands at the boundary; the tree
+    keeps a command code, interned ids and a tuple of the remaining field values,
+    with short strings and common numbers shared between elements.
+    Reads like the model_dump() dict it replaces (and compares equal to it);
+    to_dict() gives the wire form.
+    """
+
+    __slots__ = ("code", "container_id", "element_id", "values")
+
+    def __init__(self, code: int, container_id: str, element_id: Optional[str], values: tuple):
+        self.code = code
+        self.container_id = sys.intern(container_id)
+        self.element_id = sys.intern(element_id) if element_id is not None else None
+        self.values = tuple(_share(v) for v in values)
+
+    @classmethod
+    def from_command(cls, cmd: AnyCommand) -> "UIElement":
+        code = COMMAND_CODES[cmd.command]
+        return cls(code, cmd.container_id, cmd.element_id, [getattr(cmd, f) for f in _VALUE_FIELDS[code]])
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "UIElement":
+        code = COMMAND_CODES[data["command"]]
+        return cls(code, data["container_id"], data.get("element_id"), [data[f] for f in _VALUE_FIELDS[code]])
+
+    @property
+    def command(self) -> str:
+        return COMMAND_NAMES[self.code]
+
+    def __getitem__(self, key: str):
+        if key == "command":
+            return COMMAND_NAMES[self.code]
+        if key == "container_id":
+            return self.container_id
+        if key == "element_id":
+            return self.element_id
+        return self.values[_POSITIONS[self.code][key]]
+
+    def __setitem__(self, key: str, value):
+        # Only descriptive fields change in place (e.g. a slider moved by the user)
+        index = _POSITIONS[self.code][key]
+        self.values = self.values[:index] + (_share(value),) + self.values[index + 1:]
+
+    def __iter__(self):
+        return iter(_KEYS[self.code])
+
+    def __len__(self) -> int:
+        return len(_KEYS[self.code])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(zip(_KEYS[self.code], (self.container_id, self.element_id, COMMAND_NAMES[self.code]) + self.values))
+
+    def __repr__(self) -> str:
+        return f"UIElement({self.to_dict()!r})"
+
+
+def element_key(cmd: dict, text_counter: int) -> str:
+    """Stable id for an added element: explicit element_id, its own *_id field, or text ordinal."""
+    if cmd.get("element_id"):
+        return cmd["element_id"]
+    for name in ("button_id", "slider_id"):
+        if cmd.get(name):
+            return cmd[name]
+    return f"text_{text_counter}"
+
+
+def _longest_increasing(seq: List[int]) -> set:
+    """Indices into seq of one longest strictly increasing subsequence."""
+    tails, prev, tail_idx = [], [-1] * len(seq), []
+    for i, value in enumerate(seq):
+        lo, hi = 0, len(tails)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if tails[mid] < value:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == len(tails):
+            tails.append(value)
+            tail_idx.append(i)
+        else:
+            tails[lo] = value
+            tail_idx[lo] = i
+        prev[i] = tail_idx[lo - 1] if lo else -1
+    keep, i = set(), tail_idx[-1] if tail_idx else -1
+    while i != -1:
+        keep.add(i)
+        i = prev[i]
+    return keep
+
+
+class UITree:
+    """Server-side copy of what a client has on screen: container -> ordered elements."""
+
+    def __init__(self):
+        self.containers: Dict[str, Dict[str, UIElement]] = {}
+        self.text_counters: Dict[str, int] = {}
+
+    def elements(self) -> List[UIElement]:
+        return [el for container in self.containers.values() for el in container.values()]
+
+    def find(self, element_id: str, container_id: str = "main_workspace") -> Optional[UIElement]:
+        return self.containers.get(container_id, {}).get(element_id)
+
+    def to_wire(self) -> List[dict]:
+        """The elements as ADD_* command dicts, e.g. to redraw the UI on reconnect."""
+        return [el.to_dict() for el in self.elements()]
+
+    def to_state(self) -> dict:
+        return {
+            "containers": {
+                cid: {key: el.to_dict() for key, el in container.items()}
+                for cid, container in self.containers.items()
+            },
+            "text_counters": dict(self.text_counters),
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "UITree":
+        tree = cls()
+        tree.containers = {
+            sys.intern(cid): {sys.intern(key): UIElement.from_dict(data) for key, data in container.items()}
+            for cid, container in state["containers"].items()
+        }
+        tree.text_counters = dict(state["text_counters"])
+        return tree
+
+    def begin_turn(self) -> "UIPatcher":
+        return UIPatcher(self)
+
+    def patch(self, commands: List[AnyCommand]) -> List[AnyCommand]:
+        """Applies a whole turn and returns the minimal commands to send instead."""
+        patcher = self.begin_turn()
+        out = []
+        for cmd in commands:
+            out.extend(patcher.feed(cmd))
+        out.extend(patcher.finish())
+        return out
+
+
+class UIPatcher:
+    """Turns one LLM turn into patch commands, one command at a time.
+
+    CLEAR_CONTAINER is held back: elements re-added with the same id become
+    UPDATE_ELEMENT (or nothing if unchanged), and whatever was not re-added is
+    removed in finish(), which also restores the intended order with moves.
+    Works for streamed turns since every command can be forwarded as it arrives.
+    """
+
+    def __init__(self, tree: UITree):
+        self.tree = tree
+        # container -> elements that were on screen when the container was cleared
+        self.cleared: Dict[str, Dict[str, UIElement]] = {}
+        # container -> element ids in the order the client currently has them
+        self.client_order: Dict[str, List[str]] = {}
+
+    def _client(self, container_id: str) -> List[str]:
+        if container_id not in self.client_order:
+            self.client_order[container_id] = list(self.tree.containers.get(container_id, {}))
+        return self.client_order[container_id]
+
+    def feed(self, cmd: AnyCommand) -> List[AnyCommand]:
+        if cmd.command == "CLEAR_CONTAINER":
+            return self._clear(cmd.container_id)
+        if isinstance(cmd, UpdateElementCommand):
+            return self._update(cmd)
+        if isinstance(cmd, RemoveElementCommand):
+            return self._remove(cmd)
+        if isinstance(cmd, MoveElementCommand):
+            return self._move(cmd)
+        return self._add(cmd)
+
+    def _clear(self, container_id: str) -> List[AnyCommand]:
+        self._client(container_id)
+        current = self.tree.containers.pop(container_id, {})
+        self.cleared.setdefault(container_id, {}).update(current)
+        self.tree.text_counters[container_id] = 0
+        return []
+
+    def _add(self, cmd: AnyCommand) -> List[AnyCommand]:
+        cid = cmd.container_id
+        client = self._client(cid)
+        data = UIElement.from_command(cmd)
+        counter = self.tree.text_counters.get(cid, 0)
+        key = element_key(data, counter)
+        if cmd.command == "ADD_TEXT" and not data.element_id:
+            self.tree.text_counters[cid] = counter + 1
+        data.element_id = key = sys.intern(key)
+        container = self.tree.containers.setdefault(cid, {})
+
+        old = self.cleared.get(cid, {}).pop(key, None)
+        if old is None:
+            old = container.get(key)
+        # Re-adding an element already in the container updates it in place
+        container[key] = data
+        if old is None:
+            client.append(key)
+            return [cmd.model_copy(update={"element_id": key})]
+        if old.code != data.code:
+            # Same id, different kind of element: replace it at the same spot on the client
+            index = client.index(key)
+            after = client[index - 1] if index else None
+            return [
+                RemoveElementCommand(container_id=cid, element_id=key),
+                cmd.model_copy(update={"element_id": key}),
+                MoveElementCommand(container_id=cid, element_id=key, after_id=after),
+            ]
+        # Same kind of element, so the value tuples line up field by field
+        changes = {
+            k: v for k, v, before in zip(_VALUE_FIELDS[data.code], data.values, old.values)
+            if before != v
+        }
+        if not changes:
+            return []
+        return [UpdateElementCommand(container_id=cid, element_id=key, changes=changes)]
+
+    def _update(self, cmd: UpdateElementCommand) -> List[AnyCommand]:
+        container = self.tree.containers.get(cmd.container_id, {})
+        old = container.get(cmd.element_id)
+        if old is None:
+            return []
+        changes = {k: v for k, v in cmd.changes.items() if k not in _IDENTITY_FIELDS}
+        try:
+            merged = UIElement.from_command(COMMAND_ADAPTER.validate_python({**old.to_dict(), **changes}))
+        except ValidationError as e:
+            print(f"Dropping invalid update for {cmd.element_id}: {e}")
+            return []
+        changes = {
+            k: v for k, v, before in zip(_VALUE_FIELDS[merged.code], merged.values, old.values)
+            if before != v
+        }
+        container[cmd.element_id] = merged
+        if not changes:
+            return []
+        return [cmd.model_copy(update={"changes": changes})]
+
+    def _remove(self, cmd: RemoveElementCommand) -> List[AnyCommand]:
+        client = self._client(cmd.container_id)
+        if self.tree.containers.get(cmd.container_id, {}).pop(cmd.element_id, None) is None:
+            return []
+        client.remove(cmd.element_id)
+        return [cmd]
+
+    def _move(self, cmd: MoveElementCommand) -> List[AnyCommand]:
+        container = self.tree.containers.get(cmd.container_id, {})
+        if cmd.element_id not in container or (cmd.after_id is not None and cmd.after_id not in container):
+            return []
+        # Moving an element after itself leaves it where it is
+        if cmd.after_id == cmd.element_id:
+            return []
+        client = self._client(cmd.container_id)
+        order = [k for k in container if k != cmd.element_id]
+        pos = 0 if cmd.after_id is None else order.index(cmd.after_id) + 1
+        order.insert(pos, cmd.element_id)
+        self.tree.containers[cmd.container_id] = {k: container[k] for k in order}
+        if cmd.element_id not in client or (cmd.after_id is not None and cmd.after_id not in client):
+            # Not both on screen yet; finish() sends the moves that bring the client in line
+            return []
+        client.remove(cmd.element_id)
+        client.insert(0 if cmd.after_id is None else client.index(cmd.after_id) + 1, cmd.element_id)
+        return [cmd]
+
+    def finish(self) -> List[AnyCommand]:
+        """Removes elements that were cleared but not re-added and fixes the order."""
+        out: List[AnyCommand] = []
+        for cid, leftovers in self.cleared.items():
+            client = self._client(cid)
+            for key in leftovers:
+                client.remove(key)
+                out.append(RemoveElementCommand(container_id=cid, element_id=key))
+        for cid, client in self.client_order.items():
+            out.extend(self._reorder(cid, client))
+        self.cleared = {}
+        return out
+
+    def abort(self):
+        """Brings the tree back in line with the client after a turn stops midway.
+
+        Cleared elements not yet removed are still on screen, so they go back in.
+        """
+        for cid, leftovers in self.cleared.items():
+            container = self.tree.containers.setdefault(cid, {})
+            container.update(leftovers)
+        for cid, client in self.client_order.items():
+            container = self.tree.containers.get(cid, {})
+            self.tree.containers[cid] = {key: container[key] for key in client if key in container}
+        self.cleared = {}
+
+    def _reorder(self, cid: str, client: List[str]) -> List[AnyCommand]:
+        target = list(self.tree.containers.get(cid, {}))
+        if client == target:
+            return []
+        position = {key: i for i, key in enumerate(client)}
+        keep = _longest_increasing([position[key] for key in target])
+        # Each moved element goes right after its predecessor in the target order;
+        # elements on the longest already-ordered run stay put.
+        moves: List[AnyCommand] = []
+        for i, key in enumerate(target):
+            if i not in keep:
+                after: Optional[str] = target[i - 1] if i else None
+                moves.append(MoveElementCommand(container_id=cid, element_id=key, after_id=after))
+        client[:] = target
+        return moves
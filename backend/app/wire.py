@@ -0,0 +1,96 @@
+# backend/app/wire.py
+import json
+from typing import Any, Dict, List, Tuple, get_args
+
+from fastapi import WebSocket
+
+from .metrics import span
+from .models import AnyCommand
+
+try:
+    import orjson
+except ImportError:  # optional fast path
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional compact binary format
+    msgpack = None
+
+# command literal -> (code, field order). A command is sent in the compact format
+# as [code, *values] using this layout; the table is sent to the client on connect.
+COMMAND_LAYOUTS: Dict[str, Tuple[int, List[str]]] = {
+    cls.model_fields["command"].default: (
+        code,
+        [name for name in cls.model_fields if name != "command"],
+    )
+    for code, cls in enumerate(get_args(AnyCommand), start=1)
+}
+
+
+def compact_command(cmd: dict) -> list:
+    code, fields = COMMAND_LAYOUTS[cmd["command"]]
+    return [code] + [cmd[name] for name in fields]
+
+
+def compact_packet(data: dict) -> dict:
+    """Replaces every UI command in a packet with its positional array form."""
+    if "ui_commands" in data:
+        data = {**data, "ui_commands": [compact_command(c) for c in data["ui_commands"]]}
+    if "ui_command" in data:
+        data = {**data, "ui_command": compact_command(data["ui_command"])}
+    return data
+
+
+class JSONWire:
+    """Default: stdlib JSON text frames, as sent before formats were negotiable."""
+    name = "json"
+
+    def encode(self, data: dict) -> str:
+        # Same output as WebSocket.send_json
+        return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+    async def send(self, websocket: WebSocket, data: dict):
+        with span("serialize"):
+            frame = self.encode(data)
+        with span("send"):
+            if isinstance(frame, bytes):
+                await websocket.send_bytes(frame)
+            else:
+                await websocket.send_text(frame)
+
+
+class ORJSONWire(JSONWire):
+    """Same JSON text frames, serialized with orjson."""
+    name = "orjson"
+
+    def encode(self, data: dict) -> str:
+        return orjson.dumps(data).decode("utf-8")
+
+
+class MsgpackWire(JSONWire):
+    """Binary msgpack frames with UI commands as positional arrays."""
+    name = "msgpack"
+
+    def encode(self, data: dict) -> bytes:
+        return msgpack.packb(compact_packet(data))
+
+
+def negotiate_wire(requested: str) -> JSONWire:
+    """Picks the wire format a client asked for, falling back to JSON when unavailable."""
+    if requested == "msgpack" and msgpack is not None:
+        return MsgpackWire()
+    if requested in ("orjson", "msgpack") and orjson is not None:
+        return ORJSONWire()
+    return JSONWire()
+
+
+def wire_info(wire: JSONWire) -> Dict[str, Any]:
+    """What the client needs to decode the negotiated format."""
+    info: Dict[str, Any] = {"format": wire.name}
+    if isinstance(wire, MsgpackWire):
+        info["command_layouts"] = {
+            command: {"code": code, "fields": fields}
+            for command, (code, fields) in COMMAND_LAYOUTS.items()
+        }
+    return info
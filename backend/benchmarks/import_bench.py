@@ -0,0 +1,78 @@
+# Measures how long a fresh interpreter takes to import app.main, which is what
+# cold starts, --reload cycles and new replicas pay before serving.
+# Exits non-zero when the median is over budget or a provider SDK is imported eagerly.
+# Run from backend/: python -m benchmarks.import_bench --budget-ms 800
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Heavy provider stacks that must only load on first use (LLMClient.warm)
+LAZY_MODULES = ("langchain_google_genai", "langchain_core", "google.genai")
+
+PROBE = (
+    "import sys, time\n"
+    "t = time.perf_counter()\n"
+    "import app.main\n"
+    "print(time.perf_counter() - t)\n"
+    "print(','.join(m for m in {lazy!r} if m in sys.modules))\n"
+)
+
+
+def measure() -> tuple:
+    env = {**os.environ, "GEMINI_API_KEY": os.getenv("GEMINI_API_KEY", "bench-key")}
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(lazy=LAZY_MODULES)],
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout.splitlines()
+    return float(out[-2]), [m for m in out[-1].split(",") if m]
+
+
+def slowest_imports(top: int) -> list:
+    """Cumulative import time of each module app.main imports directly, from -X importtime."""
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env={**os.environ, "GEMINI_API_KEY": "bench-key"}, capture_output=True, text=True,
+    ).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "|" not in line[12:]:
+            continue
+        _, cumulative, name = line[12:].split("|")
+        # -X importtime indents one space plus two per nesting level
+        if cumulative.strip().isdigit() and len(name) - len(name.lstrip(" ")) == 3:
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "1000")))
+    parser.add_argument("--top", type=int, default=8)
+    args = parser.parse_args()
+
+    times, eager = [], set()
+    for _ in range(args.runs):
+        elapsed, loaded = measure()
+        times.append(elapsed * 1000)
+        eager.update(loaded)
+    median = statistics.median(times)
+    print(f"import app.main: median {median:.0f}ms, min {min(times):.0f}ms, max {max(times):.0f}ms ({args.runs} runs)")
+    print("slowest direct imports of app.main:")
+    for us, name in slowest_imports(args.top):
+        print(f"  {us / 1000:>8.1f}ms  {name}")
+
+    failed = False
+    if median > args.budget_ms:
+        print(f"FAIL: median import time {median:.0f}ms is over the {args.budget_ms:.0f}ms budget")
+        failed = True
+    if eager:
+        print(f"FAIL: imported eagerly: {', '.join(sorted(eager))}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# Measures tool-call parsing cost per response as commands per turn grow.
+# Run from backend/: python -m benchmarks.parser_bench
+import time
+
+from app.parser import parse_tool_calls
+
+
+def make_calls(n):
+    calls = []
+    for i in range(n):
+        if i % 3 == 0:
+            calls.append({"name": "AddTextCommand", "args": {"container_id": "main_workspace", "text": f"Item {i}", "style": "body"}})
+        elif i % 3 == 1:
+            calls.append({"name": "AddButtonCommand", "args": {"container_id": "main_workspace", "button_id": f"b{i}", "text": "Next"}})
+        else:
+            calls.append({"name": "AddSliderCommand", "args": {
+                "container_id": "main_workspace", "slider_id": f"s{i}", "label": "Budget",
+                "min_val": 0, "max_val": 100, "default_val": 50,
+            }})
+    return calls
+
+
+def bench(n, repeat):
+    calls = make_calls(n)
+    parse_tool_calls(calls)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parse_tool_calls(calls)
+    elapsed = (time.perf_counter() - start) / repeat
+    return elapsed
+
+
+def main():
+    print(f"{'commands':>8} {'per response':>14} {'per command':>12}")
+    for n in (1, 10, 100, 500, 1000):
+        elapsed = bench(n, repeat=max(20, 20000 // n))
+        print(f"{n:>8} {elapsed * 1e6:>12.1f}us {elapsed / n * 1e6:>10.2f}us")
+
+
+if __name__ == "__main__":
+    main()
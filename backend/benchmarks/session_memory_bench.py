@@ -0,0 +1,103 @@
+# Measures memory per session as the UI grows, to size nodes for N concurrent sessions.
+# Compares the compact UIElement tree with the model_dump() dicts it replaced, and
+# times conversion of a whole UI to the wire form (what a reconnect sends).
+# Run from backend/: python -m benchmarks.session_memory_bench --sessions 200
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from app.parser import parse_tool_calls
+from app.session import Session
+
+
+def make_calls(n):
+    calls = []
+    for i in range(n):
+        if i % 3 == 0:
+            calls.append({"name": "AddTextCommand", "args": {"text": f"Step {i}: choose what matters most", "style": "body"}})
+        elif i % 3 == 1:
+            calls.append({"name": "AddButtonCommand", "args": {"button_id": f"b{i}", "text": "Next"}})
+        else:
+            calls.append({"name": "AddSliderCommand", "args": {
+                "slider_id": f"s{i}", "label": "Budget ($)", "min_val": 0, "max_val": 5000, "default_val": 1500,
+            }})
+    return calls
+
+
+def make_commands(n):
+    # Parsed from fresh JSON per session, like model output: no objects shared by accident
+    return parse_tool_calls(json.loads(json.dumps(make_calls(n))))[0]
+
+
+def measure(build, count):
+    """Bytes allocated per object kept alive by build(), averaged over count objects."""
+    # One warm-up build, so one-time costs (interning tables) are not counted
+    build(0)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [build(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return (after - before) / count
+
+
+def compact_session(n):
+    def build(i):
+        session = Session(f"session-{i}")
+        session.apply_commands(make_commands(n))
+        return session
+    return build
+
+
+def dict_ui(n):
+    # The previous representation: container -> element_id -> model_dump() dict
+    def build(i):
+        container = {}
+        for index, cmd in enumerate(make_commands(n)):
+            data = cmd.model_dump()
+            data["element_id"] = data.get("button_id") or data.get("slider_id") or f"text_{index}"
+            container[data["element_id"]] = data
+        return {"main_workspace": container}
+    return build
+
+
+def compact_ui(n):
+    def build(i):
+        session = Session(f"session-{i}")
+        session.apply_commands(make_commands(n))
+        return session.ui.containers
+    return build
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'elements':>8} {'session':>10} {'ui (compact)':>13} {'ui (dicts)':>11} {'saved':>6} {'to_wire':>10}")
+    for n in (0, 10, 50, 200, 1000):
+        count = max(10, args.sessions * 10 // max(n, 10))
+        session = measure(compact_session(n), count)
+        compact = measure(compact_ui(n), count)
+        dicts = measure(dict_ui(n), count)
+        saved = 1 - compact / dicts if dicts else 0.0
+
+        sample = Session("wire")
+        sample.apply_commands(make_commands(n))
+        repeat = max(10, 20000 // max(n, 1))
+        start = time.perf_counter()
+        for _ in range(repeat):
+            sample.ui.to_wire()
+        wire = (time.perf_counter() - start) / repeat
+        print(
+            f"{n:>8} {session / 1024:>8.1f}KB {compact / 1024:>11.1f}KB {dicts / 1024:>9.1f}KB "
+            f"{saved:>6.0%} {wire * 1e6:>8.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
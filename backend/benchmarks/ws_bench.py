@@ -0,0 +1,149 @@
+# Drives N concurrent /ws clients against app.main backed by the offline fake LLM
+# and reports turn latency, throughput and server memory per session.
+# Run from backend/: python -m benchmarks.ws_bench --clients 1000 --turns 3
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from websockets.asyncio.client import connect
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_kb(pid: int) -> int:
+    """Resident set size of a process in KiB (Linux only; 0 elsewhere)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def start_server(port: int, args) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "LLM_BACKEND": "fake",
+        # Every client sends the same message; each must reach the fake model
+        "LLM_CACHE_BACKEND": "off",
+        "SEMANTIC_CACHE": "0",
+        "LLM_SINGLE_FLIGHT": "0",
+        "LLM_FAKE_LATENCY": str(args.latency),
+        "LLM_FAKE_ERROR_RATE": str(args.error_rate),
+        "SESSION_MAX_SESSIONS": str(max(1000, args.clients * 2)),
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+async def run_client(url, args, latencies, errors, ready, release):
+    try:
+        async with connect(url, max_size=None, open_timeout=60) as ws:
+            await ws.recv()  # session packet
+            for turn in range(args.turns):
+                start = time.perf_counter()
+                await ws.send(json.dumps({"type": "user_message", "content": args.message}))
+                while True:
+                    packet = json.loads(await ws.recv())
+                    if packet.get("type") in (None, "turn_complete"):
+                        break
+                latencies.append(time.perf_counter() - start)
+            ready.append(True)
+            await release.wait()
+    except Exception as e:
+        errors.append(repr(e))
+        ready.append(False)
+
+
+async def run(args, port, server_pid):
+    url = f"ws://127.0.0.1:{port}/ws?stream={'true' if args.stream else 'false'}&format={args.format}"
+    latencies, errors, ready = [], [], []
+    release = asyncio.Event()
+    baseline = rss_kb(server_pid)
+    start = time.perf_counter()
+    tasks = [
+        asyncio.create_task(run_client(url, args, latencies, errors, ready, release))
+        for _ in range(args.clients)
+    ]
+    while len(ready) < args.clients:
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    loaded = rss_kb(server_pid)
+    release.set()
+    await asyncio.gather(*tasks)
+
+    sessions = max(1, sum(ready))
+    return {
+        "clients": args.clients,
+        "turns": len(latencies),
+        "errors": len(errors),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        "throughput_turns_s": round(len(latencies) / elapsed, 1),
+        "server_rss_mb": round(loaded / 1024, 1),
+        "kb_per_session": round((loaded - baseline) / sessions, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake model time to first token (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--format", default="json", choices=["json", "orjson", "msgpack"])
+    parser.add_argument("--message", default="I want to plan a trip to Tokyo.")
+    args = parser.parse_args()
+    if args.format == "msgpack":
+        parser.error("the load generator decodes JSON frames only; use json or orjson")
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, args.clients * 2 + 64)), hard))
+
+    port = free_port()
+    server = start_server(port, args)
+    try:
+        report = asyncio.run(run(args, port, server.pid))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
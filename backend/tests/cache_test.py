@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+import pytest
+
+from app.cache import MemoryResponseCache, SQLiteResponseCache, make_cache_key
+from app.llm_client import LLMClient
+from app.models import AddTextCommand, LLMResponsePacket
+
+
+PACKET = LLMResponsePacket(chat_message="hi", ui_commands=[AddTextCommand(text="Trip")])
+
+
+def key_for(content):
+    return make_cache_key([{"role": "user", "content": content}], "prompt", "model", "tools")
+
+
+def test_key_ignores_case_and_whitespace():
+    assert key_for("Plan a  trip ") == key_for("plan a trip")
+    assert key_for("plan a trip") != key_for("build a form")
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_cache(request, tmp_path):
+    def factory(**kwargs):
+        if request.param == "memory":
+            return MemoryResponseCache(**kwargs)
+        return SQLiteResponseCache(path=str(tmp_path / "cache.sqlite3"), **kwargs)
+    return factory
+
+
+def test_roundtrip_and_counters(make_cache):
+    cache = make_cache()
+    assert cache.get("k") is None
+    cache.set("k", PACKET)
+    assert cache.get("k") == PACKET
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+def test_size_limit_evicts_least_recently_used(make_cache):
+    cache = make_cache(max_entries=2)
+    cache.set("a", PACKET)
+    time.sleep(0.001)
+    cache.set("b", PACKET)
+    time.sleep(0.001)
+    cache.get("a")
+    cache.set("c", PACKET)
+    assert cache.get("b") is None
+    assert cache.get("a") == PACKET
+    assert len(cache) == 2
+
+
+def test_ttl_expires_entries(make_cache):
+    cache = make_cache(ttl_seconds=0.01)
+    cache.set("k", PACKET)
+    time.sleep(0.02)
+    assert cache.get("k") is None
+
+
+class CountingLLM:
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        return LLMResponsePacket(chat_message="ok")
+
+
+def test_client_skips_model_on_hit(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    client = LLMClient(cache=MemoryResponseCache())
+    client.llm = CountingLLM()
+    history = [{"role": "user", "content": "plan a trip"}]
+    first = asyncio.run(client.aget_response(history))
+    second = asyncio.run(client.aget_response([{"role": "user", "content": "Plan a trip"}]))
+    assert first == second
+    assert client.llm.calls == 1
+    assert client.cache.stats()["hits"] == 1
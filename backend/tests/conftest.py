@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import WebSocketDisconnect
+from starlette.websockets import WebSocketState
+
+from app.cache import MemoryResponseCache
+from app.fake_llm import FakeChatModel
+from app.llm_client import LLMClient
+from app.orchestrator import ConversationHandler
+
+
+class FakeWebSocket:
+    """Client side of a /ws connection for tests.
+
+    Records every frame sent (frames) and the decoded JSON packets (sent).
+    Incoming messages are scripted through inbox; a server close is answered
+    like a browser would, by ending receive_json().
+    """
+
+    def __init__(self, answer_pings=False):
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.frames = []
+        self.sent = []
+        self.answer_pings = answer_pings
+        self.application_state = WebSocketState.CONNECTED
+        self.close_code = None
+
+    async def accept(self):
+        pass
+
+    async def receive_json(self):
+        message = await self.inbox.get()
+        if message is None:
+            raise WebSocketDisconnect(self.close_code or 1000)
+        return message
+
+    async def send_json(self, data):
+        self.frames.append(("json", data))
+        self._received(data)
+
+    async def send_text(self, data):
+        self.frames.append(("text", data))
+        self._received(json.loads(data))
+
+    async def send_bytes(self, data):
+        self.frames.append(("bytes", data))
+
+    def _received(self, packet):
+        self.sent.append(packet)
+        if self.answer_pings and packet.get("type") == "ping":
+            self.inbox.put_nowait({"type": "pong"})
+
+    async def close(self, code=1000):
+        self.close_code = code
+        self.application_state = WebSocketState.DISCONNECTED
+        self.inbox.put_nowait(None)
+
+    def types(self):
+        return [p.get("type") for p in self.sent]
+
+
+@pytest.fixture
+def make_websocket():
+    """Creates FakeWebSocket clients; a test may need several."""
+    return FakeWebSocket
+
+
+@pytest.fixture
+def api_key(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+
+
+@pytest.fixture
+def handler(request, api_key):
+    """ConversationHandler answering from FakeChatModel (handler.llm) behind an in-memory cache.
+
+    FakeChatModel options come from a fake_llm marker on the test or module,
+    e.g. pytestmark = pytest.mark.fake_llm(script=SCRIPT, latency=0.05), and from
+    indirect parametrization; cache=False leaves the response cache out.
+    """
+    options = {"latency": 0, "chunk_delay": 0}
+    marker = request.node.get_closest_marker("fake_llm")
+    if marker is not None:
+        options.update(marker.kwargs)
+    options.update(getattr(request, "param", {}))
+    cache = options.pop("cache", True)
+    handler = ConversationHandler()
+    handler.llm = FakeChatModel(**options)
+    handler.llm_client = LLMClient(cache=MemoryResponseCache() if cache else None, llm=handler.llm)
+    return handler
@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from app.connections import CLOSE_RESTART, CLOSE_TRY_LATER, Connection, ConnectionManager
+from app.turns import TurnScheduler
+
+SCRIPT = [{"match": "", "text": "done", "tool_calls": []}]
+
+pytestmark = pytest.mark.fake_llm(script=SCRIPT, latency=0.2)
+
+
+async def connect(handler, ws):
+    session = await handler.sessions.open()
+    scheduler = TurnScheduler(handler, ws, session)
+    scheduler.start()
+    return Connection(ws, session, scheduler)
+
+
+def test_silent_client_times_out(handler, make_websocket):
+    async def run():
+        manager = ConnectionManager(ping_interval=0.05, ping_timeout=0.05, idle_timeout=0, tick=0.01)
+        ws = make_websocket()
+        connection = await connect(handler, ws)
+        reason = await manager.serve(connection, connection.scheduler.submit)
+        await connection.scheduler.close()
+        return reason, ws
+
+    reason, ws = asyncio.run(run())
+    assert reason == "heartbeat_timeout"
+    assert "ping" in ws.types()
+    # A dead peer is not sent a goodbye
+    assert "connection_closing" not in ws.types()
+
+
+def test_pongs_keep_the_connection_alive_but_not_active(handler, make_websocket):
+    async def run():
+        manager = ConnectionManager(ping_interval=0.03, ping_timeout=0.03, idle_timeout=0.2, tick=0.01)
+        ws = make_websocket(answer_pings=True)
+        connection = await connect(handler, ws)
+        reason = await manager.serve(connection, connection.scheduler.submit)
+        await connection.scheduler.close()
+        return reason, ws
+
+    reason, ws = asyncio.run(run())
+    assert reason == "idle"
+    assert ws.sent[-1] == {"type": "connection_closing", "reason": "idle", "resumable": True}
+    assert ws.close_code == 1000
+
+
+def test_busy_connection_is_not_idle(handler, make_websocket):
+    async def run():
+        manager = ConnectionManager(ping_interval=0, idle_timeout=0.05, tick=0.01)
+        ws = make_websocket()
+        connection = await connect(handler, ws)
+        ws.inbox.put_nowait({"type": "user_message", "content": "hi"})
+        reason = await manager.serve(connection, connection.scheduler.submit)
+        await connection.scheduler.close()
+        return reason, connection.session
+
+    reason, session = asyncio.run(run())
+    assert reason == "idle"
+    # The turn finished before the connection was reaped
+    assert [m["content"] for m in session.history] == ["hi", "done"]
+
+
+def test_max_session_closes_without_resume(handler, make_websocket):
+    async def run():
+        manager = ConnectionManager(ping_interval=0, idle_timeout=0, max_session_seconds=0.05, tick=0.01)
+        ws = make_websocket()
+        connection = await connect(handler, ws)
+        reason = await manager.serve(connection, connection.scheduler.submit)
+        await connection.scheduler.close()
+        await handler.sessions.close(connection.session, keep=reason != "max_session")
+        return reason, ws, connection.session
+
+    reason, ws, session = asyncio.run(run())
+    assert reason == "max_session"
+    assert ws.sent[-1]["resumable"] is False
+    assert asyncio.run(handler.sessions.get(session.session_id)) is None
+
+
+def test_rejects_over_capacity(make_websocket):
+    async def run():
+        manager = ConnectionManager(max_connections=0)
+        ws = make_websocket()
+        reason = manager.admission()
+        await manager.reject(ws, reason)
+        return reason, ws
+
+    reason, ws = asyncio.run(run())
+    assert reason == "capacity"
+    assert ws.sent == [{"type": "connection_closing", "reason": "capacity", "resumable": True}]
+    assert ws.close_code == CLOSE_TRY_LATER
+
+
+def test_concurrent_connects_cannot_exceed_the_cap():
+    manager = ConnectionManager(max_connections=1)
+    # Checked back to back, before any connection reached serve()
+    assert [manager.admission() for _ in range(3)] == [None, "capacity", "capacity"]
+    manager.release()
+    assert manager.admission() is None
+
+
+def test_drain_finishes_turns_in_flight_then_closes(handler, make_websocket):
+    async def run():
+        manager = ConnectionManager(ping_interval=0, idle_timeout=0, tick=0.01)
+        ws = make_websocket()
+        connection = await connect(handler, ws)
+        serving = asyncio.create_task(manager.serve(connection, connection.scheduler.submit))
+        ws.inbox.put_nowait({"type": "user_message", "content": "first"})
+        await asyncio.sleep(0.05)
+        drain = asyncio.create_task(manager.drain(timeout=2))
+        await asyncio.sleep(0.01)
+        # New turns are refused once draining
+        ws.inbox.put_nowait({"type": "user_message", "content": "second"})
+        closed = await drain
+        reason = await serving
+        await connection.scheduler.close()
+        return closed, reason, ws, connection.session, manager
+
+    closed, reason, ws, session, manager = asyncio.run(run())
+    assert (closed, reason) == (1, "draining")
+    assert [m["content"] for m in session.history] == ["first", "done"]
+    assert {"type": "turn_rejected", "reason": "draining"} in ws.sent
+    assert ws.sent[-1] == {"type": "connection_closing", "reason": "draining", "resumable": True}
+    assert ws.close_code == CLOSE_RESTART
+    assert manager.admission() == "draining"
@@ -0,0 +1,61 @@
+from app.context import ContextManager, describe_ui_state, estimate_tokens
+from app.models import AddSliderCommand
+from app.session import Session
+
+
+def make_session(turns, words_per_turn=50):
+    session = Session("s", max_history_chars=10**6)
+    for i in range(turns):
+        session.add_message("user", f"request {i} " + "word " * words_per_turn)
+        session.add_message("assistant", f"Reply {i}. " + "more " * words_per_turn)
+    return session
+
+
+def test_under_budget_history_is_sent_unchanged():
+    session = make_session(2)
+    assert ContextManager(budget=10_000).build(session) == session.history
+
+
+def test_over_budget_compacts_old_turns_into_summary():
+    session = make_session(20)
+    manager = ContextManager(budget=1000, keep_recent=4)
+    sent = manager.build(session)
+    assert len(session.history) == 4
+    assert session.history_tokens == sum(m["tokens"] for m in session.history)
+    assert "User: request" in session.summary
+    note = next(m for m in sent if m not in session.history)
+    assert note["content"].startswith("Summary of the earlier conversation:")
+    # The note comes right before the latest user message
+    assert sent[sent.index(note) + 1] is session.history[-2]
+    assert sum(estimate_tokens(m["content"]) for m in sent) < 1000
+
+
+def test_summary_stays_within_its_share_of_the_budget():
+    session = make_session(200)
+    manager = ContextManager(budget=1000, keep_recent=2)
+    for _ in range(5):
+        manager.build(session)
+        session.add_message("user", "next " * 100)
+    assert estimate_tokens(session.summary) <= manager.summary_budget
+
+
+def test_ui_state_is_sent_as_compact_block():
+    session = Session("s")
+    session.add_message("user", "budget please")
+    session.apply_commands([
+        AddSliderCommand(slider_id="budget", label="Budget", min_val=500, max_val=5000, default_val=1500),
+    ])
+    sent = ContextManager().build(session)
+    assert describe_ui_state(session.ui_state) == 'ADD_SLIDER budget "Budget" 500..5000=1500'
+    assert sent[0]["content"].endswith('ADD_SLIDER budget "Budget" 500..5000=1500')
+    assert sent[1:] == session.history
+
+
+def test_note_goes_before_the_latest_user_message():
+    session = make_session(2, words_per_turn=1)
+    session.add_message("user", "make it bigger")
+    session.ui_changes = {"budget": 2500}
+    sent = ContextManager(budget=10_000).build(session)
+    assert sent[:4] == session.history[:4]
+    assert sent[4]["content"] == "Changed by the user since the last turn: budget=2500"
+    assert sent[5] is session.history[-1]
@@ -0,0 +1,148 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from app.conversation_log import ConversationLog, encode_record, read_records
+from app.session import Session, SessionManager
+
+SCRIPT = [
+    {"match": "trip", "text": "Let's plan it.", "tool_calls": [
+        {"name": "AddTextCommand", "args": {"text": "Trip Planner", "style": "header"}},
+        {"name": "AddSliderCommand", "args": {
+            "slider_id": "budget", "label": "Budget", "min_val": 0, "max_val": 5000, "default_val": 1000,
+        }},
+        {"name": "AddButtonCommand", "args": {"button_id": "next", "text": "Next"}},
+    ]},
+    {"match": "", "text": "Next step.", "tool_calls": [
+        {"name": "AddTextCommand", "args": {"text": "Pick your dates"}},
+    ]},
+]
+
+pytestmark = pytest.mark.fake_llm(script=SCRIPT)
+
+
+def test_records_roundtrip_and_stop_at_a_torn_tail():
+    data = encode_record("s1", "user", {"content": "hi"}) + encode_record("s2", "drop", None)
+    records = list(read_records(data + data[:7]))
+    assert [(kind, sid) for _, _, kind, sid, _, _ in records] == [("user", "s1"), ("drop", "s2")]
+    assert records[1][0] + records[1][1] == len(data)
+
+
+def run_conversation(handler, ws):
+    async def run():
+        session = await handler.sessions.open()
+        await handler.handle_message(ws, session, {"type": "user_message", "content": "plan a trip"})
+        await handler.handle_message(ws, session, {
+            "type": "ui_event", "event_type": "slider_change", "element_id": "budget", "state": {"value": 2500},
+        })
+        await handler.handle_message(ws, session, {"type": "ui_event", "event_type": "button_click", "element_id": "next"})
+        return session
+
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def handler(handler, tmp_path):
+    # The shared handler, logging to a fresh directory
+    handler.log = ConversationLog(str(tmp_path / "log"), snapshot_every=3)
+    handler.sessions = SessionManager(log=handler.log)
+    return handler
+
+
+def test_restart_restores_history_and_rendered_ui(handler, make_websocket, tmp_path):
+    session = run_conversation(handler, make_websocket())
+    handler.log.close()
+
+    # A new process: nothing in memory, only the log on disk
+    manager = SessionManager(log=ConversationLog(str(tmp_path / "log"), snapshot_every=3))
+    restored = asyncio.run(manager.open(session.session_id))
+    assert restored.session_id == session.session_id
+    assert [m["content"] for m in restored.history] == [m["content"] for m in session.history]
+    assert restored.ui_state == session.ui_state
+    assert restored.ui.find("budget")["default_val"] == 2500
+    assert restored.ui_changes == {}
+
+
+def test_sessions_past_their_ttl_are_not_restored(handler, make_websocket, tmp_path, monkeypatch):
+    session = run_conversation(handler, make_websocket())
+    handler.log.close()
+
+    # The process restarts an hour later
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 3600)
+    log = ConversationLog(str(tmp_path / "log"))
+    manager = SessionManager(ttl_seconds=60, log=log)
+    assert asyncio.run(manager.open(session.session_id)).session_id != session.session_id
+    log.flush()
+    assert session.session_id not in log
+    log.close()
+
+
+def test_evicted_sessions_are_dropped_from_the_log(handler, make_websocket):
+    session = run_conversation(handler, make_websocket())
+    asyncio.run(handler.sessions.close(session))
+    handler.sessions.ttl_seconds = 0
+    handler.sessions.evict_expired()
+    handler.log.flush()
+    assert session.session_id not in handler.log
+    assert asyncio.run(handler.sessions.open(session.session_id)).session_id != session.session_id
+    handler.log.close()
+
+
+def test_replay_starts_at_the_latest_snapshot(tmp_path):
+    log = ConversationLog(str(tmp_path), snapshot_every=4)
+    session = Session("s")
+    for i in range(10):
+        session.add_message("user", f"message {i}")
+        log.append(session, ("user", {"content": f"message {i}"}))
+    log.flush()
+    kinds = [kind for kind, _ in log.records("s")]
+    assert kinds[0] == "snapshot" and len(kinds) <= 5
+    assert [m["content"] for m in log.restore("s").history] == [f"message {i}" for i in range(10)]
+    log.close()
+
+
+def test_segments_rotate_and_old_ones_are_dropped(tmp_path):
+    log = ConversationLog(str(tmp_path), segment_bytes=512, max_segments=3, snapshot_every=1)
+    old, new = Session("old"), Session("new")
+    log.append(old, ("user", {"content": "x" * 100}))
+    for i in range(30):
+        log.append(new, ("user", {"content": "y" * 100}))
+    log.flush()
+    assert len([name for name in os.listdir(tmp_path / log.writer) if name.endswith(".log")]) == 3
+    assert "old" not in log and "new" in log
+    log.drop("new")
+    log.close()
+    assert "new" not in ConversationLog(str(tmp_path))
+
+
+def test_workers_sharing_a_directory_keep_sessions_apart(tmp_path):
+    a, b = ConversationLog(str(tmp_path), snapshot_every=100), ConversationLog(str(tmp_path), snapshot_every=100)
+    alice, bob = Session("A"), Session("B")
+    for i in range(5):
+        alice.add_message("user", f"a{i}")
+        a.append(alice, ("user", {"content": f"a{i}"}))
+        bob.add_message("user", f"b{i}")
+        b.append(bob, ("user", {"content": f"b{i}"}))
+    a.close()
+    b.close()
+    assert a.writer != b.writer
+
+    # After a restart, either worker's sessions restore from the other's files
+    log = ConversationLog(str(tmp_path))
+    assert [m["content"] for m in log.restore("A").history] == [f"a{i}" for i in range(5)]
+    assert [m["content"] for m in log.restore("B").history] == [f"b{i}" for i in range(5)]
+    log.close()
+
+
+
+def test_records_of_another_session_are_never_replayed(tmp_path):
+    log = ConversationLog(str(tmp_path))
+    log.append(Session("B"), ("user", {"content": "secret"}))
+    log.flush()
+    log._index["A"] = log._index["B"]
+    assert log.records("A") == []
+    assert log.restore("A") is None
+    log.close()
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from app.context import ContextManager
+from app.events import EventEngine
+from app.models import AddButtonCommand, AddSliderCommand, UIEvent
+from app.session import Session
+from app.turns import TurnScheduler
+
+
+def ui_commands():
+    return [
+        AddSliderCommand(slider_id="budget", label="Budget", min_val=0, max_val=5000, default_val=1000),
+        AddButtonCommand(button_id="next", text="Next"),
+    ]
+
+
+def make_session():
+    session = Session("s")
+    session.apply_commands(ui_commands())
+    return session
+
+
+def slider(value, element_id="budget"):
+    return {"type": "ui_event", "event_type": "slider_change", "element_id": element_id, "state": {"value": value}}
+
+
+def test_slider_change_is_applied_locally_and_clamped():
+    session = make_session()
+    engine = EventEngine()
+    assert engine.handle(session, UIEvent.model_validate(slider(9000))) is None
+    assert session.ui.find("budget")["default_val"] == 5000
+    assert session.ui_changes == {"budget": 5000}
+
+
+def test_slider_change_for_non_slider_or_non_finite_value_is_ignored():
+    session = make_session()
+    engine = EventEngine()
+    assert engine.handle(session, UIEvent.model_validate(slider(10, element_id="next"))) is None
+    for value in ("nan", "inf", float("nan")):
+        assert engine.handle(session, UIEvent.model_validate(slider(value))) is None
+    assert session.ui.find("budget")["default_val"] == 1000
+    assert session.ui_changes == {}
+
+
+def test_button_click_becomes_a_turn():
+    session = make_session()
+    prompt = EventEngine().handle(session, UIEvent(event_type="button_click", element_id="next"))
+    assert prompt == 'Clicked the "Next" button (next).'
+
+
+def test_unknown_element_is_ignored():
+    session = make_session()
+    assert EventEngine().handle(session, UIEvent(event_type="button_click", element_id="nope")) is None
+
+
+def test_changes_are_sent_once_in_the_next_prompt():
+    session = make_session()
+    EventEngine().handle(session, UIEvent.model_validate(slider(2500)))
+    session.add_message("user", "Clicked Next")
+    note = ContextManager().build(session)[0]["content"]
+    assert "Changed by the user since the last turn: budget=2500" in note
+    assert "Changed by the user" not in ContextManager().build(session)[0]["content"]
+
+
+@pytest.mark.fake_llm(script=[{"match": "", "text": "done"}], latency=0.05)
+def test_queued_slider_changes_coalesce_and_do_not_cancel(handler, make_websocket):
+    async def run():
+        ws = make_websocket()
+        session = await handler.sessions.open()
+        session.apply_commands(ui_commands())
+        scheduler = TurnScheduler(handler, ws, session, policy="latest")
+        await scheduler.submit({"type": "user_message", "content": "hi"})
+        for value in (100, 200, 300):
+            await scheduler.submit(slider(value))
+        assert len(scheduler.pending) == 2
+        scheduler.start()
+        while scheduler.pending or scheduler.current is not None:
+            await asyncio.sleep(0.01)
+        await scheduler.close()
+        return session, [p.get("type") for p in ws.sent]
+
+    session, sent = asyncio.run(run())
+    assert sent == [None]
+    assert handler.llm.calls == 1
+    assert session.ui.find("budget")["default_val"] == 300
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from app.cache import MemoryResponseCache
+from app.fake_llm import FakeChatModel, FakeLLMError
+from app.llm_client import LLMClient
+from app.models import TurnCompletePacket, UICommandPacket
+
+TRIP = [{"role": "user", "content": "I want to plan a trip to Tokyo."}]
+
+
+def client(**kwargs):
+    return LLMClient(cache=MemoryResponseCache(), llm=FakeChatModel(latency=0, chunk_delay=0, **kwargs))
+
+
+def test_scripted_turn_is_replayed():
+    packet = client().get_response(TRIP)
+    assert [c.command for c in packet.ui_commands] == ["CLEAR_CONTAINER", "ADD_TEXT", "ADD_SLIDER", "ADD_BUTTON"]
+    assert packet.chat_message.startswith("Great!")
+
+
+def test_unmatched_message_uses_fallback_turn():
+    packet = client().get_response([{"role": "user", "content": "hello"}])
+    assert [c.command for c in packet.ui_commands] == ["ADD_TEXT", "ADD_BUTTON"]
+
+
+def test_streaming_matches_single_response():
+    async def collect():
+        return [p async for p in client(chunk_chars=4).astream_response(TRIP)]
+
+    packets = asyncio.run(collect())
+    full = client().get_response(TRIP)
+    assert [p.ui_command for p in packets if isinstance(p, UICommandPacket)] == full.ui_commands
+    assert packets[-1] == TurnCompletePacket(chat_message=full.chat_message)
+    assert sum(1 for p in packets if p.type == "chat_delta") > 1
+
+
+def test_error_injection():
+    with pytest.raises(FakeLLMError):
+        client(error_rate=1.0).get_response(TRIP)
+
+
+def test_custom_script_and_latency():
+    script = [{"match": "", "text": "ok", "tool_calls": []}]
+    llm = FakeChatModel(script=script, latency=0.05)
+    packet = asyncio.run(LLMClient(cache=MemoryResponseCache(), llm=llm).aget_response(TRIP))
+    assert packet.chat_message == "ok"
+    assert llm.calls == 1
@@ -0,0 +1,84 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from app import llm_client
+from app.llm_client import LLMClient, prompt_prefix, validate_config
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    return LLMClient()
+
+
+def test_history_messages_are_converted_once(client):
+    history = [{"role": "user", "content": "plan a trip"}]
+    first = client._build_messages(history)
+    history.append({"role": "assistant", "content": "Sure."})
+    second = client._build_messages(history)
+    assert second[len(prompt_prefix())] is first[len(prompt_prefix())]
+    assert [type(m).__name__ for m in second[len(prompt_prefix()):]] == ["HumanMessage", "AIMessage"]
+
+
+def test_static_prefix_is_shared_between_turns(client):
+    a = client._build_messages([{"role": "user", "content": "a"}])
+    b = client._build_messages([{"role": "user", "content": "b"}])
+    assert all(x is y for x, y in zip(a[:len(prompt_prefix())], b[:len(prompt_prefix())]))
+
+
+def test_provider_sdk_is_not_imported_with_the_app():
+    probe = "import sys, app.main; print('langchain_google_genai' in sys.modules)"
+    out = subprocess.run(
+        [sys.executable, "-c", probe], capture_output=True, text=True, check=True,
+        env={**os.environ, "GEMINI_API_KEY": "test-key"}, cwd=os.path.dirname(os.path.dirname(__file__)),
+    )
+    assert out.stdout.strip() == "False"
+
+
+def test_missing_api_key_is_reported_up_front(monkeypatch):
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    assert "GEMINI_API_KEY is not set" in validate_config()
+
+
+def test_warm_pool_is_used_round_robin(client):
+    client.warm(3)
+    assert len({id(client.llm) for _ in range(3)}) == 3
+
+
+def wait_for_refresh(client):
+    deadline = time.monotonic() + 2
+    while client._refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_prefix_cache_is_refreshed_before_it_expires(client, monkeypatch):
+    monkeypatch.setattr(llm_client, "refresh_prefix_cache", lambda name: True)
+    client.warm(1)
+    client.cached_prefix = "cachedContents/1"
+    client.prefix_expires = time.monotonic() + 10
+    client.llm
+    wait_for_refresh(client)
+    assert client.cached_prefix == "cachedContents/1"
+    assert client.prefix_expires > time.monotonic() + llm_client.LLM_PREFIX_CACHE_REFRESH_MARGIN
+
+
+def test_lost_prefix_cache_is_dropped_with_its_models(client, monkeypatch):
+    monkeypatch.setattr(llm_client, "refresh_prefix_cache", lambda name: False)
+    client.warm(1)
+    bound = client._pool[0]
+    client.cached_prefix = "cachedContents/1"
+    client.prefix_expires = time.monotonic() + 10
+    client.llm
+    wait_for_refresh(client)
+    assert client.cached_prefix is None and bound not in client._pool
+
+    # One that expired between calls is never sent
+    client.warm(1)
+    client.cached_prefix = "cachedContents/2"
+    client.prefix_expires = time.monotonic() - 1
+    model = client.llm
+    assert client.cached_prefix is None and client._pool == [model]
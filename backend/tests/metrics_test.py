@@ -0,0 +1,66 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from app import metrics
+from app.metrics import Counter, Histogram, Registry, span, trace_turn
+
+SCRIPT = [{"match": "", "text": "done", "tool_calls": [
+    {"name": "AddTextCommand", "args": {"text": "Trip", "style": "header"}},
+]}]
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    hist = registry.register(Histogram("h_seconds", "Test.", ["stage"], buckets=(0.1, 1.0)))
+    hist.observe(0.05, stage="a")
+    hist.observe(0.5, stage="a")
+    hist.observe(5, stage="a")
+    text = registry.render()
+    assert 'h_seconds_bucket{stage="a",le="0.1"} 1' in text
+    assert 'h_seconds_bucket{stage="a",le="1"} 2' in text
+    assert 'h_seconds_bucket{stage="a",le="+Inf"} 3' in text
+    assert 'h_seconds_count{stage="a"} 3' in text
+    assert "# TYPE h_seconds histogram" in text
+
+
+def test_counter_can_read_a_value_kept_elsewhere():
+    counter = Counter("hits_total", "Test.")
+    counter.set_function(lambda: 7)
+    assert counter.render().endswith("hits_total 7")
+
+
+def test_spans_are_attributed_to_the_current_turn():
+    with trace_turn("s") as trace:
+        with span("build"):
+            time.sleep(0.01)
+        with span("build"):
+            pass
+    assert trace.stages["build"] >= 0.01
+    assert trace.outcome is None
+
+
+@pytest.mark.fake_llm(script=SCRIPT, latency=0.01)
+@pytest.mark.parametrize("stream", [False, True])
+def test_turn_records_every_stage(handler, make_websocket, monkeypatch, tmp_path, stream):
+    log = tmp_path / "trace.jsonl"
+    monkeypatch.setattr(metrics, "METRICS_TRACE_LOG", str(log))
+
+    async def run():
+        session = await handler.sessions.open()
+        session.stream = stream
+        message = {"type": "user_message", "content": "plan a trip", "received_at": time.perf_counter()}
+        await handler.handle_message(make_websocket(), session, message)
+
+    asyncio.run(run())
+    metrics.TRACE_LOG.flush()
+    record = json.loads(log.read_text().splitlines()[-1])
+    assert record["outcome"] == "ok"
+    for stage in ("queue", "admission", "build", "llm", "parse", "apply", "serialize", "send"):
+        assert stage in record["stages_ms"]
+    # Only a streamed turn observes its first token
+    assert ("llm_first_token" in record["stages_ms"]) == stream
+    assert record["tokens"]["prompt"] > 0 and record["tokens"]["completion"] > 0
+    assert record["total_ms"] >= record["stages_ms"]["llm"]
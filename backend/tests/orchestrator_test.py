@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+import pytest
+
+from app.llm_client import LLMClient
+from app.orchestrator import ConversationHandler
+
+pytestmark = pytest.mark.usefixtures("api_key")
+
+
+class StubResponse:
+    def __init__(self, content, tool_calls=None):
+        self.content = content
+        self.tool_calls = tool_calls or []
+
+
+class SlowAsyncLLM:
+    """Stands in for the chat model: answers after a fixed async delay."""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    async def ainvoke(self, messages):
+        await asyncio.sleep(self.delay)
+        return StubResponse(f"echo: {messages[-1].content}")
+
+
+class SlowSyncLLM:
+    """Chat model without an async path; forces the thread-pool fallback."""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def invoke(self, messages):
+        time.sleep(self.delay)
+        return StubResponse(f"echo: {messages[-1].content}")
+
+
+@pytest.mark.parametrize("llm_cls", [SlowAsyncLLM, SlowSyncLLM])
+def test_concurrent_turns_do_not_block_each_other(llm_cls, make_websocket):
+    async def run():
+        handlers = []
+        for _ in range(5):
+            handler = ConversationHandler()
+            handler.llm_client.llm = llm_cls(0.2)
+            handlers.append(handler)
+        sockets = [make_websocket() for _ in handlers]
+        sessions = [await h.sessions.open() for h in handlers]
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            h.handle_message(ws, session, {"type": "user_message", "content": f"hi {i}"})
+            for i, (h, ws, session) in enumerate(zip(handlers, sockets, sessions))
+        ))
+        return time.perf_counter() - start, sockets
+
+    elapsed, sockets = asyncio.run(run())
+    assert elapsed < 0.6
+    for i, ws in enumerate(sockets):
+        assert ws.sent[0]["chat_message"] == f"echo: hi {i}"
+
+
+def test_aget_response_matches_get_response():
+    client = LLMClient()
+    client.llm = SlowSyncLLM(0)
+    history = [{"role": "user", "content": "build a form"}]
+    assert asyncio.run(client.aget_response(history)) == client.get_response(history)
+
+
+def test_sessions_keep_separate_histories(make_websocket):
+    async def run():
+        handler = ConversationHandler()
+        handler.llm_client.llm = SlowAsyncLLM(0)
+        a, b = await handler.sessions.open(), await handler.sessions.open()
+        await handler.handle_message(make_websocket(), a, {"type": "user_message", "content": "alice"})
+        await handler.handle_message(make_websocket(), b, {"type": "user_message", "content": "bob"})
+        return a, b
+
+    a, b = asyncio.run(run())
+    assert [m["content"] for m in a.history] == ["alice", "echo: alice"]
+    assert [m["content"] for m in b.history] == ["bob", "echo: bob"]
+
+
+class StreamingLLM:
+    """Yields text deltas, then one tool call whose args arrive in two fragments."""
+
+    async def astream(self, messages):
+        from langchain_core.messages import AIMessageChunk
+
+        yield AIMessageChunk(content="Let's ")
+        yield AIMessageChunk(content="plan.")
+        yield AIMessageChunk(content="", tool_call_chunks=[
+            {"name": "AddTextCommand", "args": '{"command": "ADD_TEXT", ', "id": "1", "index": 0},
+        ])
+        yield AIMessageChunk(content="", tool_call_chunks=[
+            {"name": None, "args": '"text": "Trip"}', "id": None, "index": 0},
+        ])
+
+
+def test_streamed_turn_sends_framed_packets(make_websocket):
+    async def run():
+        handler = ConversationHandler()
+        handler.llm_client.llm = StreamingLLM()
+        session = await handler.sessions.open()
+        session.stream = True
+        ws = make_websocket()
+        await handler.handle_message(ws, session, {"type": "user_message", "content": "trip"})
+        return session, ws
+
+    session, ws = asyncio.run(run())
+    assert [p["type"] for p in ws.sent] == ["chat_delta", "chat_delta", "ui_command", "turn_complete"]
+    assert ws.sent[2]["ui_command"]["text"] == "Trip"
+    assert ws.sent[3]["chat_message"] == "Let's plan."
+    assert session.history[-1]["content"] == "Let's plan."
+    assert [c["text"] for c in session.ui_state] == ["Trip"]
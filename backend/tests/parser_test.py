@@ -0,0 +1,37 @@
+from app.models import AddSliderCommand, AddTextCommand, ClearContainerCommand
+from app.parser import TOOL_COMMANDS, parse_tool_calls
+
+
+def test_tool_names_map_to_command_literals():
+    assert TOOL_COMMANDS["AddSliderCommand"] == "ADD_SLIDER"
+    assert TOOL_COMMANDS["ClearContainerCommand"] == "CLEAR_CONTAINER"
+
+
+def test_langchain_tool_calls_are_parsed_by_name():
+    commands, errors = parse_tool_calls([
+        {"name": "ClearContainerCommand", "args": {"container_id": "main_workspace"}, "id": "1"},
+        {"name": "AddTextCommand", "args": {"container_id": "main_workspace", "text": "Hi"}, "id": "2"},
+    ])
+    assert errors == []
+    assert commands == [ClearContainerCommand(container_id="main_workspace"), AddTextCommand(text="Hi")]
+
+
+def test_bare_args_with_command_are_accepted():
+    commands, errors = parse_tool_calls([{"command": "ADD_TEXT", "text": "Hi", "style": "header"}])
+    assert errors == []
+    assert commands[0].style == "header"
+
+
+def test_invalid_calls_become_structured_errors_and_valid_ones_survive():
+    commands, errors = parse_tool_calls([
+        {"name": "AddTextCommand", "args": {"text": "ok"}},
+        {"name": "AddSliderCommand", "args": {"slider_id": "s", "label": "x", "min_val": "low", "max_val": 1, "default_val": 0}},
+        {"name": "AddWidgetCommand", "args": {"foo": 1}},
+        {"name": "AddSliderCommand", "args": {"slider_id": "b", "label": "y", "min_val": 0, "max_val": 1, "default_val": 0}},
+    ])
+    assert [type(c) for c in commands] == [AddTextCommand, AddSliderCommand]
+    assert [e.index for e in errors] == [1, 2]
+    assert errors[0].command == "ADD_SLIDER"
+    assert errors[0].errors[0]["loc"] == ["ADD_SLIDER", "min_val"]
+    assert errors[1].tool_name == "AddWidgetCommand"
+    assert errors[1].errors[0]["type"] == "union_tag_not_found"
@@ -0,0 +1,95 @@
+import asyncio
+import json
+
+import pytest
+
+from app.llm_client import LLMClient, system_prompt
+from app.models import ChatDeltaPacket, TurnCompletePacket
+from app.orchestrator import ConversationHandler
+from app.reasoning import ReasoningFilter, negotiate_reasoning, strip_reasoning
+
+pytestmark = pytest.mark.usefixtures("api_key")
+
+
+def test_reasoning_and_ui_code_are_stripped():
+    text = "<thinking>\nThe user wants a trip planner.\n</thinking>\n\nLet's start with your budget.```tool_code\nadd()\n```"
+    visible, tokens = strip_reasoning(text)
+    assert visible == "Let's start with your budget."
+    assert tokens > 0
+    assert strip_reasoning("Plain reply.") == ("Plain reply.", 0)
+
+
+def test_text_that_changes_length_when_casefolded_is_sliced_correctly():
+    assert strip_reasoning("Straße Straße Straße <thinking>abc</thinking>Done")[0] == "Straße Straße Straße Done"
+    text = "<thinking>Die Maße: Größe, Straße, Fußweg, heiß</thinking>Hier ist dein Formular."
+    assert strip_reasoning(text)[0] == "Hier ist dein Formular."
+
+
+def test_unterminated_block_hides_the_rest():
+    assert strip_reasoning("Sure. <THINKING> still going")[0] == "Sure."
+
+
+def test_tags_split_across_stream_chunks_are_held_back():
+    hidden = ReasoningFilter()
+    chunks = ["<thi", "nking>plan", " it</thin", "king>Hel", "lo <", "b>"]
+    assert "".join(hidden.feed(c) for c in chunks) + hidden.flush() == "Hello <b>"
+
+
+def test_modes_change_only_the_reasoning_rule():
+    assert "<thinking>" not in system_prompt("off")
+    assert "at most" in system_prompt("budgeted")
+    assert "step-by-step" in system_prompt("full")
+    assert negotiate_reasoning("full") == "full"
+    assert negotiate_reasoning("bogus") == negotiate_reasoning(None)
+
+
+class ThinkingLLM:
+    def __init__(self):
+        self.calls = []
+
+    async def ainvoke(self, messages):
+        from langchain_core.messages import AIMessage
+
+        self.calls.append(messages)
+        return AIMessage(content="<thinking>" + "long plan " * 40 + "</thinking>Done.")
+
+    async def astream(self, messages):
+        from langchain_core.messages import AIMessageChunk
+
+        self.calls.append(messages)
+        for part in ["<think", "ing>" + "long plan " * 40, "</thinking>Do", "ne."]:
+            yield AIMessageChunk(content=part)
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_stored_history_has_no_reasoning_and_savings_are_counted(make_websocket, stream):
+    async def run():
+        handler = ConversationHandler()
+        handler.llm_client.llm = ThinkingLLM()
+        handler.llm_client.cache = None
+        session = await handler.sessions.open()
+        session.stream = stream
+        ws = make_websocket()
+        await handler.handle_message(ws, session, {"type": "user_message", "content": "plan a trip"})
+        await handler.handle_message(ws, session, {"type": "user_message", "content": "make it longer"})
+        return handler, session, ws
+
+    handler, session, ws = asyncio.run(run())
+    assert [m["content"] for m in session.history if m["role"] == "assistant"] == ["Done.", "Done."]
+    assert session.history[1]["reasoning_tokens"] > 0
+    assert all("long plan" not in json.dumps(packet) for packet in ws.sent)
+    # The second request resent the first reply without its reasoning
+    second_prompt = handler.llm_client.llm.calls[1]
+    assert all("long plan" not in str(m.content) for m in second_prompt)
+
+
+def test_streamed_turn_reports_reasoning_tokens():
+    async def run():
+        client = LLMClient(cache=None, llm=ThinkingLLM())
+        client.cache = None
+        return [p async for p in client.astream_response([{"role": "user", "content": "hi"}], reasoning="full")]
+
+    packets = asyncio.run(run())
+    assert "".join(p.delta for p in packets if isinstance(p, ChatDeltaPacket)) == "Done."
+    assert packets[-1] == TurnCompletePacket(chat_message="Done.", reasoning_tokens=packets[-1].reasoning_tokens)
+    assert packets[-1].reasoning_tokens > 0
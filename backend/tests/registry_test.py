@@ -0,0 +1,36 @@
+from typing import get_args
+
+from app.models import AnyCommand
+from app.registry import TOOL_COMMANDS, tool_declarations, tool_schema
+
+
+def by_name():
+    return {t["function"]["name"]: t["function"] for t in tool_declarations()}
+
+
+def test_every_model_facing_command_is_a_tool():
+    names = set(by_name())
+    expected = {cls.__name__ for cls in get_args(AnyCommand) if getattr(cls, "llm_tool", True)}
+    assert names == expected
+    assert "UpdateElementCommand" not in names
+    assert set(TOOL_COMMANDS) == {cls.__name__ for cls in get_args(AnyCommand)}
+
+
+def test_declarations_follow_the_pydantic_fields():
+    slider = by_name()["AddSliderCommand"]
+    params = slider["parameters"]
+    assert "command" not in params["properties"]
+    assert params["properties"]["min_val"] == {"type": "number"}
+    assert set(params["required"]) == {"slider_id", "label", "min_val", "max_val", "default_val"}
+    assert slider["description"] == "Adds a labelled numeric slider to a UI container."
+
+
+def test_optional_fields_are_flattened():
+    move = by_name()["MoveElementCommand"]["parameters"]
+    assert move["properties"]["after_id"] == {"type": "string"}
+    assert "after_id" not in move["required"]
+
+
+def test_schema_blob_is_built_once():
+    assert tool_schema() is tool_schema()
+    assert tool_declarations() == tool_declarations()
@@ -0,0 +1,112 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from app.llm_client import LLMClient
+from app.models import AddButtonCommand, AddSliderCommand, AddTextCommand, TurnCompletePacket, UICommandPacket
+from app.parser import parse_tool_calls
+from app.repair import repair_call, resolve_tool_name
+
+
+def test_tool_name_spellings_resolve_to_registered_tools():
+    assert resolve_tool_name("add_slider") == "AddSliderCommand"
+    assert resolve_tool_name("AddText") == "AddTextCommand"
+    assert resolve_tool_name("ADD_BUTTON") == "AddButtonCommand"
+    assert resolve_tool_name("AddWidget") is None
+
+
+def test_fixable_arguments_are_repaired_instead_of_dropped():
+    commands, errors = parse_tool_calls([
+        {"name": "add_slider", "args": {
+            "slider_id": "budget", "label": "Budget", "min_val": "$500", "max_val": "5,000", "default_val": 9000,
+        }},
+        {"name": "AddTextCommand", "args": {"text": "Hi", "style": "Title"}},
+        {"name": "AddButtonCommand", "args": {"text": "Next step"}},
+    ])
+    assert errors == []
+    assert commands[0] == AddSliderCommand(slider_id="budget", label="Budget", min_val=500, max_val=5000, default_val=5000)
+    assert commands[1] == AddTextCommand(text="Hi", style="body")
+    assert commands[2] == AddButtonCommand(button_id="next_step", text="Next step")
+
+
+def test_repair_reports_each_fix():
+    tool, args, fixes = repair_call("AddTextCommand", {"text": 42, "style": "HEADER"})
+    assert tool == "AddTextCommand"
+    assert args == {"text": "42", "style": "header", "command": "ADD_TEXT"}
+    assert len(fixes) == 2
+
+
+def test_slider_bounds_are_kept_consistent():
+    slider = AddSliderCommand(slider_id="s", label="x", min_val=10, max_val=0, default_val=-5)
+    assert (slider.min_val, slider.max_val, slider.default_val) == (0, 10, 0)
+
+
+class ScriptedModel:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def invoke(self, messages):
+        self.calls.append(messages)
+        return self.responses.pop(0)
+
+
+def test_only_unrecoverable_calls_are_asked_again(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    model = ScriptedModel(
+        AIMessage(content="Here you go.", tool_calls=[
+            {"name": "AddTextCommand", "args": {"text": "ok"}, "id": "1"},
+            {"name": "AddSliderCommand", "args": {"slider_id": "s", "label": "x", "min_val": "low", "max_val": 1, "default_val": 0}, "id": "2"},
+        ]),
+        AIMessage(content="", tool_calls=[
+            {"name": "AddSliderCommand", "args": {"slider_id": "s", "label": "x", "min_val": 0, "max_val": 1, "default_val": 0}, "id": "3"},
+        ]),
+    )
+    client = LLMClient(cache=None, llm=model)
+    client.cache = None
+    packet = client.get_response([{"role": "user", "content": "a slider please"}])
+    assert [type(c) for c in packet.ui_commands] == [AddTextCommand, AddSliderCommand]
+    assert packet.tool_errors == []
+    assert packet.chat_message == "Here you go."
+    # The follow-up carries only the failed call, not the conversation
+    followup = model.calls[1][-1].content
+    assert "AddSliderCommand" in followup and "a slider please" not in followup
+
+
+class StreamedModel(ScriptedModel):
+    def __init__(self, chunks, *responses):
+        super().__init__(*responses)
+        self.chunks = chunks
+
+    async def astream(self, messages):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def test_streamed_call_with_broken_json_is_asked_again(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    model = StreamedModel(
+        [
+            AIMessageChunk(content="Here you go.", tool_call_chunks=[
+                {"name": "AddTextCommand", "args": '{"text": "ok"}', "id": "1", "index": 0},
+            ]),
+            AIMessageChunk(content="", tool_call_chunks=[
+                {"name": "AddButtonCommand", "args": '{"button_id": "go", "text": "Go"', "id": "2", "index": 1},
+            ]),
+        ],
+        AIMessage(content="", tool_calls=[
+            {"name": "AddButtonCommand", "args": {"button_id": "go", "text": "Go"}, "id": "3"},
+        ]),
+    )
+    client = LLMClient(cache=None, llm=model)
+    client.cache = None
+
+    async def run():
+        return [p async for p in client.astream_response([{"role": "user", "content": "a button please"}])]
+
+    packets = asyncio.run(run())
+    commands = [p.ui_command for p in packets if isinstance(p, UICommandPacket)]
+    assert commands == [AddTextCommand(text="ok"), AddButtonCommand(button_id="go", text="Go")]
+    assert isinstance(packets[-1], TurnCompletePacket) and packets[-1].tool_errors == []
+    followup = model.calls[0][-1].content
+    assert "AddButtonCommand" in followup and "not valid JSON" in followup
@@ -0,0 +1,122 @@
+import asyncio
+import time
+
+import pytest
+
+from app.router import CircuitBreaker, LLMRouter, Route, RouterError, parse_routes
+
+
+class StubModel:
+    def __init__(self, name, delay=0.0, error=None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = 0
+
+    async def ainvoke(self, messages, **kwargs):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error:
+            raise RuntimeError(self.error)
+        return self.name
+
+    def invoke(self, messages, **kwargs):
+        self.calls += 1
+        if self.error:
+            raise RuntimeError(self.error)
+        return self.name
+
+    async def astream(self, messages, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise RuntimeError(self.error)
+        for part in ("a", "b"):
+            yield f"{self.name}:{part}"
+
+
+def router(*models, **kwargs):
+    return LLMRouter([Route(m.name, lambda m=m: m) for m in models], **kwargs)
+
+
+def test_parse_routes():
+    assert parse_routes("gemini:gemini-1.5-flash, openai:gpt-4o-mini") == [
+        ("gemini", "gemini-1.5-flash"), ("openai", "gpt-4o-mini"),
+    ]
+    with pytest.raises(ValueError):
+        parse_routes("nope")
+
+
+def test_hedge_wins_when_primary_is_slow(monkeypatch):
+    monkeypatch.setattr("app.router.LLM_HEDGE_DEFAULT_SECONDS", 0.05)
+    slow, fast = StubModel("slow", delay=1.0), StubModel("fast", delay=0.01)
+    r = router(slow, fast)
+    start = time.perf_counter()
+    assert asyncio.run(r.ainvoke([])) == "fast"
+    assert time.perf_counter() - start < 0.5
+    assert slow.cancelled == 1
+    # The loser was cancelled, which is not held against its breaker
+    assert r.routes[0].breaker.failures == 0
+
+
+def test_no_hedge_when_primary_answers_in_time(monkeypatch):
+    monkeypatch.setattr("app.router.LLM_HEDGE_DEFAULT_SECONDS", 0.5)
+    primary, backup = StubModel("primary", delay=0.01), StubModel("backup")
+    assert asyncio.run(router(primary, backup).ainvoke([])) == "primary"
+    assert backup.calls == 0
+
+
+def test_errors_fail_over_and_open_the_breaker():
+    broken, backup = StubModel("broken", error="boom"), StubModel("backup")
+    r = router(broken, backup, hedge=False)
+    r.routes[0].breaker = CircuitBreaker(failures=2, cooldown=60)
+    for _ in range(3):
+        assert asyncio.run(r.ainvoke([])) == "backup"
+    assert broken.calls == 2
+    assert r.routes[0].breaker.state == "open"
+
+
+def test_quota_error_opens_the_breaker_at_once():
+    limited, backup = StubModel("limited", error="429 Resource has been exhausted (quota)"), StubModel("backup")
+    r = router(limited, backup, hedge=False)
+    assert r.invoke([]) == "backup"
+    assert r.routes[0].breaker.state == "open"
+
+
+def test_half_open_breaker_lets_one_trial_through():
+    breaker = CircuitBreaker(failures=1, cooldown=0.01)
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.begin()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_all_routes_down_raises():
+    r = router(StubModel("a", error="x"), StubModel("b", error="y"), hedge=False)
+    with pytest.raises(RouterError):
+        asyncio.run(r.ainvoke([]))
+
+
+def test_stream_hedges_on_first_chunk(monkeypatch):
+    monkeypatch.setattr("app.router.LLM_HEDGE_DEFAULT_SECONDS", 0.05)
+
+    async def collect(r):
+        return [chunk async for chunk in r.astream([])]
+
+    assert asyncio.run(collect(router(StubModel("slow", delay=1.0), StubModel("fast")))) == ["fast:a", "fast:b"]
+
+
+def test_hedge_delay_follows_recent_latency():
+    route = Route("r", lambda: None)
+    for i in range(100):
+        route.latency["invoke"].add(0.3 + i / 1000)
+    assert route.hedge_delay("invoke") == pytest.approx(0.395)
@@ -0,0 +1,108 @@
+import asyncio
+import time
+
+import pytest
+
+from app.llm_client import LLMClient
+from app.models import AddButtonCommand, AddSliderCommand, AddTextCommand, LLMResponsePacket
+from app.semantic_cache import SemanticLayoutCache, extract_terms, vectorize
+
+TRIP = LLMResponsePacket(
+    chat_message="Let's plan your Tokyo trip!",
+    ui_commands=[
+        AddTextCommand(text="Tokyo Trip Planner", style="header"),
+        AddSliderCommand(slider_id="budget", label="Budget ($)", min_val=500, max_val=5000, default_val=2000),
+        AddButtonCommand(button_id="next", text="Next"),
+    ],
+)
+
+
+def test_vectors_ignore_stopwords_and_plurals():
+    a = vectorize(extract_terms("Plan a trip to Tokyo"))
+    b = vectorize(extract_terms("plan trips to tokyo please"))
+    assert a == b
+
+
+def test_close_request_reuses_layout_with_swapped_words_and_numbers():
+    cache = SemanticLayoutCache(threshold=0.6)
+    cache.set("Plan a trip to Tokyo with a budget of $2000", TRIP)
+    packet = cache.get("plan a trip to Kyoto with a budget of $3,000")
+    assert packet.chat_message == "Let's plan your Kyoto trip!"
+    assert packet.ui_commands[0].text == "Kyoto Trip Planner"
+    assert packet.ui_commands[1].default_val == 3000
+    assert packet.ui_commands[2] == TRIP.ui_commands[2]
+    assert cache.stats() == {"hits": 1, "misses": 0, "size": 1}
+
+
+def test_different_requests_miss():
+    cache = SemanticLayoutCache()
+    cache.set("Plan a trip to Tokyo", TRIP)
+    assert cache.get("build a workout schedule") is None
+    # Too many words differ to re-parameterize safely
+    assert cache.get("plan a cheap family ski trip to Hokkaido") is None
+    assert cache.misses == 2
+
+
+def test_numbers_that_may_count_elements_are_not_swapped():
+    cache = SemanticLayoutCache()
+    form = LLMResponsePacket(chat_message="Here are 3 sliders.", ui_commands=[
+        AddSliderCommand(slider_id=f"s{i}", label=f"Slider {i}", min_val=0, max_val=10, default_val=5)
+        for i in range(3)
+    ])
+    cache.set("a form with 3 sliders", form)
+    assert cache.get("a form with 5 sliders") is None
+    assert cache.get("a form with 3 sliders") is form
+
+
+def test_index_is_bounded_and_entries_expire():
+    cache = SemanticLayoutCache(max_entries=2, ttl_seconds=60)
+    for city in ("tokyo", "paris", "rome"):
+        cache.set(f"plan a trip to {city} museums", TRIP)
+    assert len(cache) == 2
+    # The evicted entry is gone from the inverted index too
+    assert "tokyo" not in cache._index
+
+    cache = SemanticLayoutCache(ttl_seconds=0.01)
+    cache.set("plan a trip to tokyo", TRIP)
+    time.sleep(0.02)
+    assert cache.get("plan a trip to tokyo") is None
+    assert len(cache) == 0
+
+
+class CountingLLM:
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, messages):
+        from langchain_core.messages import AIMessage
+
+        self.calls += 1
+        return AIMessage(content="Let's plan your Tokyo trip!", tool_calls=[
+            {"name": "AddTextCommand", "args": {"text": "Tokyo Trip Planner", "style": "header"}, "id": "1"},
+        ])
+
+
+@pytest.fixture(autouse=True)
+def api_key(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+
+
+def test_client_answers_similar_first_turns_without_the_model():
+    llm = CountingLLM()
+    client = LLMClient(llm=llm, layouts=SemanticLayoutCache())
+    client.cache = None
+
+    async def run():
+        first = await client.aget_response([{"role": "user", "content": "plan a trip to Tokyo"}])
+        second = await client.aget_response([{"role": "user", "content": "Plan a trip to Osaka"}])
+        # Later turns depend on the conversation and always go to the model
+        third = await client.aget_response([
+            {"role": "user", "content": "plan a trip to Tokyo"},
+            {"role": "assistant", "content": "ok"},
+            {"role": "user", "content": "plan a trip to Tokyo"},
+        ])
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert second.ui_commands == [AddTextCommand(text="Osaka Trip Planner", style="header")]
+    assert llm.calls == 2
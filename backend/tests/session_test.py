@@ -0,0 +1,129 @@
+import asyncio
+import time
+
+from app.models import AddTextCommand, ClearContainerCommand
+from app.session import Session, SessionManager
+from app.session_store import RedisSessionStore, SQLiteSessionStore
+
+
+def test_history_is_capped_per_session():
+    session = Session("s", max_history_chars=10)
+    for i in range(5):
+        session.add_message("user", f"msg{i}")
+    assert [m["content"] for m in session.history] == ["msg3", "msg4"]
+    assert session.history_chars == 8
+
+
+def test_resume_returns_same_session():
+    manager = SessionManager()
+    session = asyncio.run(manager.open())
+    session.add_message("user", "hello")
+    asyncio.run(manager.close(session))
+    resumed = asyncio.run(manager.open(session.session_id))
+    assert resumed is session
+    assert resumed.history[0]["content"] == "hello"
+
+
+def test_resume_of_a_connected_session_starts_a_new_one():
+    manager = SessionManager()
+    session = asyncio.run(manager.open())
+    session.add_message("user", "hello")
+    other = asyncio.run(manager.open(session.session_id))
+    assert other.session_id != session.session_id
+    assert other.history == [] and session.connected
+
+
+def test_resume_disabled_drops_session_on_close():
+    manager = SessionManager(allow_resume=False)
+    session = asyncio.run(manager.open())
+    asyncio.run(manager.close(session))
+    assert len(manager) == 0
+    assert asyncio.run(manager.open(session.session_id)) is not session
+
+
+def test_idle_sessions_expire():
+    manager = SessionManager(ttl_seconds=0.01)
+    session = asyncio.run(manager.open())
+    asyncio.run(manager.close(session))
+    time.sleep(0.02)
+    manager.evict_expired()
+    assert len(manager) == 0
+
+
+def test_lru_eviction_spares_connected_sessions():
+    manager = SessionManager(max_sessions=2)
+    idle = asyncio.run(manager.open())
+    asyncio.run(manager.close(idle))
+    live = asyncio.run(manager.open())
+    asyncio.run(manager.open())
+    assert asyncio.run(manager.get(idle.session_id)) is None
+    assert asyncio.run(manager.get(live.session_id)) is live
+
+
+def test_ui_state_tracks_clear_container():
+    session = Session("s")
+    session.apply_commands([AddTextCommand(text="a"), AddTextCommand(text="c")])
+    session.apply_commands([
+        ClearContainerCommand(container_id="main_workspace"),
+        AddTextCommand(text="b"),
+    ])
+    assert [c["text"] for c in session.ui_state] == ["b"]
+
+
+class FakeRedis:
+    """Local stand-in for the few Redis commands the store uses."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+def handoff(store_a, store_b):
+    # Two workers with their own managers; the client reconnects to the other one
+    worker_a, worker_b = SessionManager(store=store_a), SessionManager(store=store_b)
+    session = asyncio.run(worker_a.open())
+    session.add_message("user", "hello")
+    session.apply_commands([AddTextCommand(text="a")])
+    session.ui_changes["budget"] = 10
+    asyncio.run(worker_a.save(session))
+    asyncio.run(worker_a.close(session))
+    return worker_a, worker_b, session
+
+
+def test_sqlite_store_lets_another_worker_resume(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    _, worker_b, session = handoff(SQLiteSessionStore(path), SQLiteSessionStore(path))
+    resumed = asyncio.run(worker_b.open(session.session_id))
+    assert resumed.session_id == session.session_id
+    assert resumed.history == session.history
+    assert resumed.history_tokens == session.history_tokens
+    assert resumed.ui_state == session.ui_state
+    assert resumed.ui_changes == {"budget": 10}
+
+
+def test_shared_store_refreshes_a_stale_local_copy():
+    redis = FakeRedis()
+    worker_a, worker_b, session = handoff(RedisSessionStore(redis), RedisSessionStore(redis))
+    on_b = asyncio.run(worker_b.open(session.session_id))
+    on_b.add_message("assistant", "hi")
+    asyncio.run(worker_b.save(on_b))
+    asyncio.run(worker_b.close(on_b))
+    back_on_a = asyncio.run(worker_a.open(session.session_id))
+    assert back_on_a is not session
+    assert [m["content"] for m in back_on_a.history] == ["hello", "hi"]
+
+
+def test_resume_disabled_deletes_from_shared_store():
+    redis = FakeRedis()
+    manager = SessionManager(allow_resume=False, store=RedisSessionStore(redis))
+    session = asyncio.run(manager.open())
+    asyncio.run(manager.close(session))
+    assert redis.data == {}
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from app.cache import MemoryResponseCache
+from app.fake_llm import FakeChatModel
+from app.llm_client import LLMClient
+from app.models import TurnCompletePacket
+from app.singleflight import SingleFlight
+
+SCRIPT = [{"match": "", "text": "Welcome!", "tool_calls": [
+    {"name": "AddTextCommand", "args": {"text": "Hi", "style": "header"}},
+]}]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    llm = FakeChatModel(script=SCRIPT, latency=0.1, chunk_delay=0.01)
+    return LLMClient(cache=MemoryResponseCache(), llm=llm), llm
+
+
+def history(content="Show me the demo"):
+    # Each caller has its own session history; identical once normalized
+    return [{"role": "user", "content": content}]
+
+
+def test_identical_concurrent_requests_share_one_call(client):
+    client, llm = client
+
+    async def run():
+        return await asyncio.gather(*(client.aget_response(history(c)) for c in ("Show me the demo", " show me  the DEMO")))
+
+    a, b = asyncio.run(run())
+    assert a.chat_message == b.chat_message == "Welcome!"
+    assert llm.calls == 1
+
+
+def test_cancelled_originator_does_not_cancel_the_others(client):
+    client, llm = client
+
+    async def run():
+        first = asyncio.create_task(client.aget_response(history()))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(client.aget_response(history()))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()).chat_message == "Welcome!"
+    assert llm.calls == 1
+
+
+def test_call_is_cancelled_when_every_caller_is_gone():
+    started, cancelled = asyncio.Event(), []
+
+    async def slow():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def run():
+        flights = SingleFlight()
+        waiters = [asyncio.create_task(flights.do("k", slow)) for _ in range(2)]
+        await started.wait()
+        for w in waiters:
+            w.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+        return len(flights)
+
+    assert asyncio.run(run()) == 0
+    assert cancelled == [True]
+
+
+def test_streams_join_a_stream_in_flight(client):
+    client, llm = client
+
+    async def collect():
+        return [p async for p in client.astream_response(history())]
+
+    async def run():
+        return await asyncio.gather(collect(), collect())
+
+    leader, follower = asyncio.run(run())
+    assert llm.calls == 1
+    assert isinstance(follower[-1], TurnCompletePacket)
+    assert follower[-1].chat_message == leader[-1].chat_message == "Welcome!"
+
+
+def test_follower_makes_its_own_call_when_the_leading_stream_goes_away(client):
+    client, llm = client
+
+    async def collect():
+        return [p async for p in client.astream_response(history())]
+
+    async def run():
+        leader = asyncio.create_task(collect())
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(collect())
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(run())[-1].chat_message == "Welcome!"
+    assert llm.calls == 2
@@ -0,0 +1,75 @@
+import asyncio
+import json
+
+import pytest
+
+from app import metrics
+from app.fake_llm import FakeChatModel
+from app.models import AddTextCommand
+from app.registry import tool_declarations
+from app.session import Session
+from app.tiering import TurnClassifier
+
+
+def session_with_ui():
+    session = Session("s")
+    session.apply_commands([AddTextCommand(text="Trip planner", style="header", element_id="title")])
+    return session
+
+
+def test_small_edit_goes_to_the_fast_tier():
+    turn = TurnClassifier().classify("make the title bigger", session_with_ui())
+    assert turn.tier == "fast"
+    assert "names_element-1" in turn.reasons
+
+
+def test_planning_goes_to_the_strong_tier():
+    assert TurnClassifier().classify("help me plan a trip to Tokyo", Session("s")).tier == "strong"
+
+
+def test_click_and_pending_changes_raise_the_score():
+    session = session_with_ui()
+    base = TurnClassifier().classify("ok", session).score
+    session.ui_changes = {"a": 1, "b": 2, "c": 3}
+    assert TurnClassifier().classify("ok", session, from_event=True).score == base + 2
+
+
+def test_fast_tier_gets_the_reduced_tool_set():
+    names = {t["function"]["name"] for t in tool_declarations(edit_only=True)}
+    assert "ClearContainerCommand" not in names
+    assert "AddTextCommand" in names
+    assert len(names) == len(tool_declarations()) - 1
+
+
+@pytest.mark.fake_llm(script=[{"match": "", "text": "strong"}])
+def test_turns_are_routed_by_tier(handler, make_websocket):
+    handler.llm_client.fast_llm = FakeChatModel(script=[{"match": "", "text": "fast"}], latency=0)
+
+    async def run():
+        ws = make_websocket()
+        session = await handler.sessions.open()
+        for content in ("help me plan a trip", "make it shorter"):
+            await handler.handle_message(ws, session, {"type": "user_message", "content": content})
+        return [p["chat_message"] for p in ws.sent]
+
+    assert asyncio.run(run()) == ["strong", "fast"]
+
+
+@pytest.mark.fake_llm(script=[{"match": "", "text": "ok"}])
+@pytest.mark.parametrize("fast", [False, True])
+def test_trace_records_the_tier_that_served_the_turn(handler, make_websocket, monkeypatch, tmp_path, fast):
+    log = tmp_path / "trace.jsonl"
+    monkeypatch.setattr(metrics, "METRICS_TRACE_LOG", str(log))
+    if fast:
+        handler.llm_client.fast_llm = FakeChatModel(script=[{"match": "", "text": "ok"}], latency=0)
+
+    async def run():
+        session = await handler.sessions.open()
+        await handler.handle_message(make_websocket(), session, {"type": "user_message", "content": "make it shorter"})
+
+    asyncio.run(run())
+    metrics.TRACE_LOG.flush()
+    record = json.loads(log.read_text().splitlines()[-1])
+    # Without a fast model the turn is not classified and goes to the strong model
+    assert record["tier"] == ("fast" if fast else "strong")
+    assert (record["routing"] is not None) == fast
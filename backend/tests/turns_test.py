@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from app.turns import TurnScheduler
+
+SCRIPT = [{"match": "", "text": "done", "tool_calls": [
+    {"name": "AddButtonCommand", "args": {"button_id": "next", "text": "Next"}},
+]}]
+
+pytestmark = pytest.mark.fake_llm(script=SCRIPT, latency=0.05)
+
+
+def user(content):
+    return {"type": "user_message", "content": content}
+
+
+async def drive(handler, ws, policy, messages, queue_size=8, gap=0.01):
+    session = await handler.sessions.open()
+    scheduler = TurnScheduler(handler, ws, session, policy=policy, queue_size=queue_size)
+    scheduler.start()
+    for message in messages:
+        await scheduler.submit(message)
+        await asyncio.sleep(gap)
+    while scheduler.pending or scheduler.current is not None:
+        await asyncio.sleep(0.01)
+    await scheduler.close()
+    return session, [p.get("type") for p in ws.sent]
+
+
+def test_latest_wins_cancels_superseded_turns(handler, make_websocket):
+    session, sent = asyncio.run(drive(handler, make_websocket(), "latest", [user("a"), user("b"), user("c")]))
+    assert [m["content"] for m in session.history] == ["c", "done"]
+    assert sent == ["turn_cancelled", "turn_cancelled", None]
+
+
+def test_coalesce_answers_all_messages_in_one_turn(handler, make_websocket):
+    session, sent = asyncio.run(drive(handler, make_websocket(), "coalesce", [user("a"), user("b")]))
+    assert [m["content"] for m in session.history] == ["a", "b", "done"]
+    assert sent == ["turn_cancelled", None]
+
+
+def test_coalesce_merges_queued_messages(handler, make_websocket):
+    async def run():
+        ws = make_websocket()
+        session = await handler.sessions.open()
+        scheduler = TurnScheduler(handler, ws, session, policy="coalesce")
+        # Not started yet, so both messages wait in the queue
+        await scheduler.submit(user("a"))
+        await scheduler.submit(user("b"))
+        return [m["content"] for m in scheduler.pending]
+
+    assert asyncio.run(run()) == ["a\nb"]
+
+
+def test_drop_rejects_when_queue_is_full(handler, make_websocket):
+    session, sent = asyncio.run(drive(handler, make_websocket(), "drop", [user("a"), user("b"), user("c")], queue_size=1))
+    assert [m["content"] for m in session.history] == ["a", "done", "b", "done"]
+    assert sent == ["turn_rejected", None, None]
+    assert handler.llm.calls == 2
+
+
+@pytest.mark.parametrize("policy", ["latest", "coalesce"])
+def test_full_queue_reports_the_entry_it_drops(handler, make_websocket, policy):
+    def slider(element_id):
+        return {"type": "ui_event", "event_type": "slider_change", "element_id": element_id, "state": {"value": 1}}
+
+    async def run():
+        ws = make_websocket()
+        session = await handler.sessions.open()
+        scheduler = TurnScheduler(handler, ws, session, policy=policy, queue_size=2)
+        # Not started, so everything waits in the queue
+        for message in (slider("x"), slider("y"), user("hi")):
+            await scheduler.submit(message)
+        return ws.types(), [m.get("element_id", m.get("content")) for m in scheduler.pending]
+
+    assert asyncio.run(run()) == (["turn_rejected"], ["y", "hi"])
+
+
+def test_server_wide_admission_rejects_when_busy(handler, make_websocket, monkeypatch):
+    monkeypatch.setattr("app.orchestrator.LLM_ADMISSION_TIMEOUT", 0.01)
+    handler.llm.latency = 0.2
+
+    async def run():
+        handler.llm_slots = asyncio.Semaphore(1)
+        first, second = make_websocket(), make_websocket()
+        a, b = await handler.sessions.open(), await handler.sessions.open()
+        await asyncio.gather(
+            handler.handle_message(first, a, user("a")),
+            handler.handle_message(second, b, user("b")),
+        )
+        return first.sent, second.sent, b
+
+    first, second, b = asyncio.run(run())
+    assert "ui_commands" in first[0]
+    assert second == [{"type": "turn_rejected", "reason": "busy"}]
+    assert b.history == []
@@ -0,0 +1,152 @@
+from app.models import (
+    AddButtonCommand, AddSliderCommand, AddTextCommand, ClearContainerCommand,
+    MoveElementCommand, RemoveElementCommand, UpdateElementCommand,
+)
+from app.ui_state import UITree
+
+
+def slider(default=1500, slider_id="budget"):
+    return AddSliderCommand(slider_id=slider_id, label="Budget", min_val=500, max_val=5000, default_val=default)
+
+
+def form(default=1500):
+    return [
+        ClearContainerCommand(container_id="main_workspace"),
+        AddTextCommand(text="Tokyo Trip Planner", style="header"),
+        slider(default),
+        AddButtonCommand(button_id="next", text="Next"),
+    ]
+
+
+def simulate_client(schema, commands):
+    """Applies sent commands the way the frontend does, keyed by element_id."""
+    for cmd in commands:
+        data = cmd.model_dump()
+        ids = [el["element_id"] for el in schema]
+        if data["command"] == "UPDATE_ELEMENT":
+            schema[ids.index(data["element_id"])].update(data["changes"])
+        elif data["command"] == "REMOVE_ELEMENT":
+            del schema[ids.index(data["element_id"])]
+        elif data["command"] == "MOVE_ELEMENT":
+            el = schema.pop(ids.index(data["element_id"]))
+            after = data["after_id"]
+            schema.insert(0 if after is None else [e["element_id"] for e in schema].index(after) + 1, el)
+        elif data["command"] == "CLEAR_CONTAINER":
+            schema.clear()
+        else:
+            schema.append(data)
+    return schema
+
+
+def test_first_render_is_sent_as_adds():
+    tree = UITree()
+    sent = tree.patch(form())
+    assert [c.command for c in sent] == ["ADD_TEXT", "ADD_SLIDER", "ADD_BUTTON"]
+    assert [c.element_id for c in sent] == ["text_0", "budget", "next"]
+
+
+def test_clear_and_readd_with_one_change_becomes_single_update():
+    tree = UITree()
+    tree.patch(form())
+    sent = tree.patch(form(default=2000))
+    assert sent == [UpdateElementCommand(element_id="budget", changes={"default_val": 2000.0})]
+
+
+def test_identical_rerender_sends_nothing():
+    tree = UITree()
+    tree.patch(form())
+    assert tree.patch(form()) == []
+
+
+def test_dropped_elements_are_removed_and_order_restored():
+    tree = UITree()
+    client = simulate_client([], tree.patch(form()))
+    turn = [
+        ClearContainerCommand(container_id="main_workspace"),
+        AddButtonCommand(button_id="next", text="Next"),
+        AddTextCommand(text="Tokyo Trip Planner", style="header"),
+    ]
+    sent = tree.patch(turn)
+    assert RemoveElementCommand(element_id="budget") in sent
+    assert sum(c.command == "MOVE_ELEMENT" for c in sent) == 1
+    assert simulate_client(client, sent) == tree.elements()
+
+
+def test_readding_existing_id_without_clear_updates_in_place():
+    tree = UITree()
+    tree.patch(form())
+    sent = tree.patch([AddButtonCommand(button_id="next", text="Continue")])
+    assert sent == [UpdateElementCommand(element_id="next", changes={"text": "Continue"})]
+    assert [el["element_id"] for el in tree.elements()] == ["text_0", "budget", "next"]
+
+
+def test_model_issued_patch_commands_are_applied():
+    tree = UITree()
+    client = simulate_client([], tree.patch(form()))
+    sent = tree.patch([
+        UpdateElementCommand(element_id="budget", changes={"default_val": 900}),
+        MoveElementCommand(element_id="next", after_id=None),
+        RemoveElementCommand(element_id="text_0"),
+        RemoveElementCommand(element_id="missing"),
+    ])
+    assert len(sent) == 3
+    assert simulate_client(client, sent) == tree.elements()
+    assert tree.elements()[1]["default_val"] == 900
+
+
+def test_move_after_itself_is_a_no_op():
+    tree = UITree()
+    client = simulate_client([], tree.patch(form()))
+    sent = tree.patch([MoveElementCommand(element_id="budget", after_id="budget")])
+    assert sent == []
+    assert simulate_client(client, sent) == tree.elements()
+    assert [el["element_id"] for el in tree.elements()] == ["text_0", "budget", "next"]
+
+
+def test_random_reorders_converge():
+    import random
+
+    rng = random.Random(7)
+    ids = [f"b{i}" for i in range(12)]
+    tree = UITree()
+    client = simulate_client([], tree.patch([AddButtonCommand(button_id=i, text=i) for i in ids]))
+    for _ in range(20):
+        rng.shuffle(ids)
+        keep = ids[: rng.randint(1, len(ids))]
+        turn = [ClearContainerCommand(container_id="main_workspace")]
+        turn += [AddButtonCommand(button_id=i, text=i) for i in keep]
+        client = simulate_client(client, tree.patch(turn))
+        assert client == tree.elements()
+        ids = keep + [f"n{rng.randint(0, 10**6)}"]
+
+
+def test_abort_restores_elements_still_on_screen():
+    tree = UITree()
+    client = simulate_client([], tree.patch(form()))
+    patcher = tree.begin_turn()
+    sent = []
+    for cmd in form(default=2000)[:3]:
+        sent.extend(patcher.feed(cmd))
+    patcher.abort()
+    assert simulate_client(client, sent) == tree.elements()
+    assert [el["element_id"] for el in tree.elements()] == ["text_0", "budget", "next"]
+
+
+def test_elements_are_compact_but_read_like_dicts():
+    tree = UITree()
+    tree.patch(form())
+    budget = tree.find("budget")
+    assert budget == {**slider().model_dump(), "element_id": "budget"}
+    assert not hasattr(budget, "__dict__")
+    budget["default_val"] = 900
+    assert tree.to_wire()[1]["default_val"] == 900
+    assert tree.to_wire()[1]["command"] == "ADD_SLIDER"
+
+
+def test_state_roundtrip_keeps_order_and_counters():
+    tree = UITree()
+    tree.patch(form())
+    restored = UITree.from_state(tree.to_state())
+    assert restored.elements() == tree.elements()
+    assert restored.text_counters == tree.text_counters
+    assert restored.patch(form()) == []
@@ -0,0 +1,55 @@
+import asyncio
+
+import orjson
+import pytest
+
+from app.models import AddSliderCommand, AddTextCommand, LLMResponsePacket
+from app.wire import (
+    COMMAND_LAYOUTS, JSONWire, MsgpackWire, ORJSONWire, compact_packet, negotiate_wire, wire_info,
+)
+
+PACKET = LLMResponsePacket(
+    chat_message="Budget?",
+    ui_commands=[
+        AddTextCommand(text="Trip", style="header"),
+        AddSliderCommand(slider_id="budget", label="Budget", min_val=0, max_val=10, default_val=5),
+    ],
+).model_dump()
+
+
+def test_negotiation_defaults_to_json():
+    assert isinstance(negotiate_wire("json"), JSONWire)
+    assert type(negotiate_wire("nonsense")) is JSONWire
+    assert isinstance(negotiate_wire("orjson"), ORJSONWire)
+
+
+def test_msgpack_falls_back_when_not_installed(monkeypatch):
+    monkeypatch.setattr("app.wire.msgpack", None)
+    assert isinstance(negotiate_wire("msgpack"), ORJSONWire)
+
+
+def test_compact_commands_are_positional():
+    code, fields = COMMAND_LAYOUTS["ADD_SLIDER"]
+    compact = compact_packet(PACKET)
+    assert compact["ui_commands"][1] == [code, "main_workspace", None, "budget", "Budget", 0.0, 10.0, 5.0]
+    assert fields == ["container_id", "element_id", "slider_id", "label", "min_val", "max_val", "default_val"]
+
+
+def test_layout_table_is_advertised_for_msgpack():
+    info = wire_info(MsgpackWire())
+    assert info["command_layouts"]["ADD_TEXT"]["fields"] == ["container_id", "element_id", "text", "style"]
+    assert wire_info(JSONWire()) == {"format": "json"}
+
+
+def test_encoders_roundtrip(make_websocket):
+    msgpack = pytest.importorskip("msgpack")
+    assert isinstance(negotiate_wire("msgpack"), MsgpackWire)
+    ws = make_websocket()
+    asyncio.run(ORJSONWire().send(ws, PACKET))
+    asyncio.run(MsgpackWire().send(ws, PACKET))
+    (kind, text), (bkind, blob) = ws.frames
+    assert kind == "text" and orjson.loads(text) == PACKET
+    assert bkind == "bytes"
+    decoded = msgpack.unpackb(blob)
+    assert decoded["chat_message"] == "Budget?"
+    assert len(blob) < len(text)
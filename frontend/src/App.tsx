@@ -39,7 +39,7 @@ function App(){
          return (
           <Background variant="mesh">
           <div className="p-8">
-            <DynamicUI/>
+            <DynamicUI onEvent={send}/>
             <ChatBlob />
           </div>
           </Background>
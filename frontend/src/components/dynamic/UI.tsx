@@ -1,13 +1,14 @@
 import { useStore } from "@/store/useStore";
 import { renderElement } from "@/renderer";
+import type { UIEvent } from "@/store/types";
 
-export function DynamicUI() {
+export function DynamicUI({ onEvent }: { onEvent?: (event: UIEvent) => void }) {
   const uiSchema = useStore((s) => s.uiSchema);
 
   return (
     console.log(uiSchema),
     <div>
-      {uiSchema.map((element, idx) => renderElement(element, idx))}
+      {uiSchema.map((element, idx) => renderElement(element, idx, onEvent))}
     </div>
   );
 }
\ No newline at end of file
@@ -1,7 +1,7 @@
 "use client"
 
 import type React from "react"
-import { forwardRef, useState } from "react"
+import { forwardRef, useEffect, useRef, useState } from "react"
 import { cn } from "@/lib/utils"
 
 interface DynamicSliderProps {
@@ -16,6 +16,8 @@ interface DynamicSliderProps {
 
   // Additional props
   showValue?: boolean
+  // Trailing delay before a change is reported; dragging fires one change per step
+  debounceMs?: number
   variant?: "primary" | "secondary" | "accent"
   className?: string
 
@@ -35,6 +37,7 @@ const DynamicSlider = forwardRef<HTMLInputElement, DynamicSliderProps>(
       min_val = 0,
       slider_id,
       showValue = true,
+      debounceMs = 100,
       variant = "primary",
       onValueChange,
     },
@@ -43,6 +46,26 @@ const DynamicSlider = forwardRef<HTMLInputElement, DynamicSliderProps>(
     // Internal state for the slider value
     const [internalValue, setInternalValue] = useState(default_val)
 
+    // Only the value the user settles on is reported, not every step of a drag
+    const timerRef = useRef<ReturnType<typeof setTimeout> | null>(null)
+    const pendingRef = useRef<number | null>(null)
+    const onValueChangeRef = useRef(onValueChange)
+    onValueChangeRef.current = onValueChange
+
+    const report = () => {
+      timerRef.current = null
+      if (pendingRef.current !== null) {
+        onValueChangeRef.current?.(pendingRef.current)
+        pendingRef.current = null
+      }
+    }
+
+    // A change still waiting when the slider goes away is reported, not lost
+    useEffect(() => () => {
+      if (timerRef.current) clearTimeout(timerRef.current)
+      report()
+    }, [])
+
     const getTrackColor = () => {
       switch (variant) {
         case "secondary":
@@ -68,7 +91,9 @@ const DynamicSlider = forwardRef<HTMLInputElement, DynamicSliderProps>(
     const handleChange = (e: React.ChangeEvent<HTMLInputElement>) => {
       const newValue = Number(e.target.value)
       setInternalValue(newValue)
-      onValueChange?.(newValue)
+      pendingRef.current = newValue
+      if (timerRef.current) clearTimeout(timerRef.current)
+      timerRef.current = setTimeout(report, debounceMs)
     }
 
     const formatValue = (value: number) => {
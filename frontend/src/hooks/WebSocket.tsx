@@ -1,15 +1,23 @@
 import { useEffect, useRef } from "react";
 import { useStore } from "@/store/useStore";
-import type { BackendPacket } from "@/store/types";
+import type { ServerPacket } from "@/store/types";
+
+const SESSION_KEY = "session_id";
 
 export function useWebSocket() {
   const handleBackendPacket = useStore((s) => s.handleBackendPacket);
   const setConnectionStatus = useStore((s) => s.setConnectionStatus);
+  const restoreSession = useStore((s) => s.restoreSession);
+  const handleStreamPacket = useStore((s) => s.handleStreamPacket);
   const wsRef = useRef<WebSocket | null>(null);
 
   useEffect(() => {
     setConnectionStatus("connecting");
-    const ws = new WebSocket("ws://127.0.0.1:8000/ws");
+    const sessionId = sessionStorage.getItem(SESSION_KEY);
+    const params = new URLSearchParams({ stream: "true" });
+    if (sessionId) params.set("session_id", sessionId);
+    const query = `?${params.toString()}`;
+    const ws = new WebSocket(`ws://127.0.0.1:8000/ws${query}`);
     wsRef.current = ws;
 
     ws.onopen = () => {
@@ -26,14 +34,34 @@ export function useWebSocket() {
     };
 
     ws.onmessage = (event) => {
-      const packet: BackendPacket = JSON.parse(event.data);
+      const packet: ServerPacket = JSON.parse(event.data);
+      if (packet.type === "session") {
+        sessionStorage.setItem(SESSION_KEY, packet.session_id);
+        restoreSession(packet);
+        return;
+      }
+      if (packet.type === "ping") {
+        ws.send(JSON.stringify({ type: "pong" }));
+        return;
+      }
+      if (packet.type === "connection_closing") {
+        console.log("Server closing connection:", packet.reason);
+        if (!packet.resumable) {
+          sessionStorage.removeItem(SESSION_KEY);
+        }
+        return;
+      }
+      if (packet.type !== undefined) {
+        handleStreamPacket(packet);
+        return;
+      }
       handleBackendPacket(packet);
     };
 
     return () => {
       ws.close();
     };
-  }, [handleBackendPacket, setConnectionStatus]);
+  }, [handleBackendPacket, setConnectionStatus, restoreSession, handleStreamPacket]);
 
   // Function to send a message to the backend
   const send = (data: object) => {
@@ -5,29 +5,39 @@ import { DynamicDropdown } from "@/components/dynamic/dropdown"
 import { DynamicDatePicker } from "@/components/dynamic/date-picker"
 import { DynamicTextInput } from "@/components/dynamic/text-input"
 
-import type { UICommand } from "./store/types";
+import type { UICommand, UIEvent } from "./store/types";
 
 
-export const renderElement = (element : UICommand, idx: number) => {
+export const renderElement = (element : UICommand, idx: number, onEvent?: (event: UIEvent) => void) => {
+  const emit = (event_type: UIEvent["event_type"], state?: UIEvent["state"]) => {
+    if (onEvent && "element_id" in element && element.element_id) {
+      onEvent({ type: "ui_event", event_type, element_id: element.element_id, container_id: element.container_id, state });
+    }
+  };
   switch (element.command) {
     case 'ADD_BUTTON':
-      return <DynamicButton key={idx}>{element.text}</DynamicButton>;
+      return (
+        <DynamicButton key={element.element_id ?? idx} onClick={() => emit("button_click")}>
+          {element.text}
+        </DynamicButton>
+      );
     case 'ADD_SLIDER':
       return (
         <DynamicSlider
-          key={idx}
+          key={element.element_id ?? idx}
           container_id={element.container_id}
           slider_id={element.slider_id}
           label={element.label}
           min_val={element.min_val}
           max_val={element.max_val}
           default_val={element.default_val}
+          onValueChange={(value) => emit("slider_change", { value })}
         />
       );
     case 'ADD_TEXT':
       return(
         <DynamicText
-          key={idx}
+          key={element.element_id ?? idx}
           container_id={element.container_id}
           style={element.style}
           text={element.text}
@@ -36,7 +46,7 @@ export const renderElement = (element : UICommand, idx: number) => {
     case 'ADD_DROPDOWN':
       return (
         <DynamicDropdown
-          key={idx}
+          key={element.element_id ?? idx}
           container_id={element.container_id}
           dropdown_id={element.dropdown_id}
           label={element.label}
@@ -48,7 +58,7 @@ export const renderElement = (element : UICommand, idx: number) => {
       case 'ADD_DATE_PICKER':
     return (
       <DynamicDatePicker
-        key={idx}
+        key={element.element_id ?? idx}
         container_id={element.container_id}
         date_picker_id={element.date_picker_id}
         label={element.label}
@@ -62,7 +72,7 @@ export const renderElement = (element : UICommand, idx: number) => {
   case 'ADD_TEXT_INPUT':
     return (
       <DynamicTextInput
-        key={idx}
+        key={element.element_id ?? idx}
         container_id={element.container_id}
         input_id={element.input_id}
         label={element.label}
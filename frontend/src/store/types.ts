@@ -5,6 +5,7 @@
 export interface BaseCommand {
   command: string;
   container_id: string;
+  element_id?: string;
 }
 
 export interface AddTextCommand extends BaseCommand {
@@ -71,6 +72,30 @@ export interface ClearContainerCommand {
 
 export type UICommand = AddTextCommand | AddButtonCommand | AddSliderCommand | AddTextCommand | AddDropdownCommand | AddDatePickerCommand | AddTextInputCommand | ClearContainerCommand;
 
+// --- Patch Commands ---
+// Edit an element already on screen, matched by container_id + element_id.
+
+export interface UpdateElementCommand extends BaseCommand {
+  command: "UPDATE_ELEMENT";
+  element_id: string;
+  changes: Record<string, unknown>;
+}
+
+export interface RemoveElementCommand extends BaseCommand {
+  command: "REMOVE_ELEMENT";
+  element_id: string;
+}
+
+export interface MoveElementCommand extends BaseCommand {
+  command: "MOVE_ELEMENT";
+  element_id: string;
+  after_id: string | null; // null moves the element to the front
+}
+
+export type PatchCommand = UpdateElementCommand | RemoveElementCommand | MoveElementCommand;
+
+export type ServerCommand = UICommand | PatchCommand;
+
 
 // --- Other Types ---
 
@@ -79,8 +104,75 @@ export interface ChatMessage {
   content: string;
 }
 
+// Sent when the user interacts with a rendered element; slider changes are
+// applied by the server locally, button clicks start a model turn
+export interface UIEvent {
+  type: "ui_event";
+  event_type: "button_click" | "slider_change";
+  element_id: string;
+  container_id: string;
+  state?: Record<string, unknown>;
+}
+
 // The complete packet received from the backend WebSocket
 export interface BackendPacket {
+  type?: undefined;
   chat_message?: string;
+  ui_commands: ServerCommand[];
+}
+
+// Sent once per connection; carries the token to resume this session later
+export interface SessionPacket {
+  type: "session";
+  session_id: string;
+  resumed: boolean;
   ui_commands: UICommand[];
-}
\ No newline at end of file
+}
+
+// Streaming packets, sent instead of a BackendPacket when connected with ?stream=true
+export interface ChatDeltaPacket {
+  type: "chat_delta";
+  delta: string;
+}
+
+export interface UICommandPacket {
+  type: "ui_command";
+  ui_command: ServerCommand;
+}
+
+export interface TurnCompletePacket {
+  type: "turn_complete";
+  chat_message?: string;
+}
+
+// The turn in flight was superseded by a newer message
+export interface TurnCancelledPacket {
+  type: "turn_cancelled";
+}
+
+// A message was not processed
+export interface TurnRejectedPacket {
+  type: "turn_rejected";
+  reason: "queue_full" | "busy" | "draining";
+}
+
+export type StreamPacket = ChatDeltaPacket | UICommandPacket | TurnCompletePacket | TurnCancelledPacket | TurnRejectedPacket;
+
+// Heartbeat; answered with {"type": "pong"}
+export interface PingPacket {
+  type: "ping";
+}
+
+// Sent right before the server closes the connection
+export interface ConnectionClosingPacket {
+  type: "connection_closing";
+  reason: "idle" | "max_session" | "heartbeat_timeout" | "capacity" | "draining";
+  resumable: boolean;
+}
+
+export type ServerPacket =
+  | BackendPacket
+  | SessionPacket
+  | StreamPacket
+  | PingPacket
+  | ConnectionClosingPacket;
\ No newline at end of file
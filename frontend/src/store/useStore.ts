@@ -1,14 +1,43 @@
 // frontend/src/store/useStore.ts
 import { create } from 'zustand';
-import type { UICommand, ChatMessage, BackendPacket } from './types';
+import type { UICommand, ServerCommand, ChatMessage, BackendPacket, SessionPacket, StreamPacket } from './types';
+
+const sameElement = (el: UICommand, cmd: ServerCommand) =>
+  el.container_id === cmd.container_id && el.element_id === cmd.element_id;
+
+// Applies one command from the server to the rendered schema
+export function applyCommand(schema: UICommand[], cmd: ServerCommand): UICommand[] {
+  switch (cmd.command) {
+    case "CLEAR_CONTAINER":
+      return schema.filter((el) => el.container_id !== cmd.container_id);
+    case "UPDATE_ELEMENT":
+      return schema.map((el) => (sameElement(el, cmd) ? ({ ...el, ...cmd.changes } as UICommand) : el));
+    case "REMOVE_ELEMENT":
+      return schema.filter((el) => !sameElement(el, cmd));
+    case "MOVE_ELEMENT": {
+      const moved = schema.find((el) => sameElement(el, cmd));
+      if (!moved) return schema;
+      const rest = schema.filter((el) => el !== moved);
+      const anchor = !cmd.after_id
+        ? -1
+        : rest.findIndex((el) => el.container_id === cmd.container_id && el.element_id === cmd.after_id);
+      return [...rest.slice(0, anchor + 1), moved, ...rest.slice(anchor + 1)];
+    }
+    default:
+      return [...schema, cmd];
+  }
+}
 
 // Define the shape of our store's state
 interface AppState {
   connectionStatus: "connected" | "disconnected" | "connecting";
   chatHistory: ChatMessage[];
   uiSchema: UICommand[];
+  streaming: boolean;
   setConnectionStatus: (status: AppState['connectionStatus']) => void;
   handleBackendPacket: (packet: BackendPacket) => void;
+  restoreSession: (packet: SessionPacket) => void;
+  handleStreamPacket: (packet: StreamPacket) => void;
   addClientMessage: (content: string) => void;
 }
 
@@ -17,6 +46,7 @@ export const useStore = create<AppState>()((set, get) => ({
   connectionStatus: "disconnected",
   chatHistory: [],
   uiSchema: [],
+  streaming: false,
 
   // --- ACTIONS ---
   setConnectionStatus: (status) => set({ connectionStatus: status }),
@@ -27,6 +57,30 @@ export const useStore = create<AppState>()((set, get) => ({
     set((state) => ({ chatHistory: [...state.chatHistory, userMessage] }));
   },
 
+  restoreSession: (packet) => {
+    // The server replays the rendered UI of a resumed session; a new session starts empty.
+    set({ uiSchema: packet.ui_commands });
+  },
+
+  handleStreamPacket: (packet) => {
+    if (packet.type === "chat_delta") {
+      // Grow the assistant message of the current turn, starting one if needed
+      set((state) => {
+        const last = state.chatHistory[state.chatHistory.length - 1];
+        if (last && last.role === "assistant" && state.streaming) {
+          const updated = { ...last, content: last.content + packet.delta };
+          return { chatHistory: [...state.chatHistory.slice(0, -1), updated] };
+        }
+        const assistantMessage: ChatMessage = { role: "assistant", content: packet.delta };
+        return { chatHistory: [...state.chatHistory, assistantMessage], streaming: true };
+      });
+    } else if (packet.type === "ui_command") {
+      set((state) => ({ uiSchema: applyCommand(state.uiSchema, packet.ui_command) }));
+    } else {
+      set({ streaming: false });
+    }
+  },
+
   handleBackendPacket: (packet) => {
     // This is the core action that updates state based on the LLM's response.
     console.log("Received packet from backend:", packet);
@@ -37,21 +91,8 @@ export const useStore = create<AppState>()((set, get) => ({
       set((state) => ({ chatHistory: [...state.chatHistory, assistantMessage] }));
     }
     
-    // Check for a CLEAR command first and process it separately
-    const clearCommand = packet.ui_commands.find(cmd => cmd.command === 'CLEAR_CONTAINER');
-    let newSchema = get().uiSchema;
-
-    if (clearCommand) {
-        // If the workspace is cleared, start with an empty schema
-        newSchema = []; 
-    }
-    
-    // Filter out the clear command so we don't try to render it
-    const renderableCommands = packet.ui_commands.filter(cmd => cmd.command !== 'CLEAR_CONTAINER');
-
-    // For simplicity, our MVP will append new commands.
-    // A more complex app might replace the schema entirely.
-    newSchema = [...newSchema, ...renderableCommands];
-    set({ uiSchema: newSchema });
+    // The server sends a patch against what is already rendered:
+    // new elements are appended, existing ones are updated, moved or removed by element_id.
+    set({ uiSchema: packet.ui_commands.reduce(applyCommand, get().uiSchema) });
   },
 }));
\ No newline at end of file